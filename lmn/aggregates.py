@@ -0,0 +1,60 @@
+""" Recalculate the note totals stored on each Show. """
+
+from django.db.models import Count, Q, Sum
+
+from lmn.write_queue import WriteQueue
+
+AGGREGATE_FIELDS = ['note_count', 'rating_sum'] + [f'rating_{stars}_count' for stars in range(1, 6)]
+
+
+def rebuild_show_aggregates(show_model, note_model, chunk_size=1000, writes=None, pks=None):
+    """ Recount the notes for every show, or just the shows in pks, a chunk of shows at a time, and save the totals.
+
+    Each chunk is one aggregate query and one bulk update in its own transaction, so a big
+    rebuild doesn't hold a long lock. The updates go through writes, a WriteQueue; pass one with
+    a writer thread to count the next chunk while the last one is saved.
+    Returns the number of shows whose totals were wrong. """
+    writes = writes or WriteQueue(thread=False)
+    fixed = 0
+    for shows in show_chunks(show_model, chunk_size, pks):
+        totals = {
+            row['show']: row
+            for row in note_model.objects.filter(show__in=[show.pk for show in shows]).values('show').annotate(
+                note_count=Count('pk'),
+                rating_sum=Sum('rating'),
+                **{f'rating_{stars}_count': Count('pk', filter=Q(rating=stars)) for stars in range(1, 6)},
+            )
+        }
+
+        changed = []
+        for show in shows:
+            row = totals.get(show.pk, {})
+            values = {field: row.get(field) or 0 for field in AGGREGATE_FIELDS}
+            if any(getattr(show, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(show, field, value)
+                changed.append(show)
+
+        if changed:
+            writes.submit(show_model.objects.bulk_update, changed, AGGREGATE_FIELDS, batch_size=chunk_size)
+        fixed += len(changed)
+    writes.wait()
+    return fixed
+
+
+def show_chunks(show_model, chunk_size, pks=None):
+    """ Lists of every show, or the shows in pks, chunk_size at a time in pk order. """
+    shows = show_model.objects.order_by('pk').only('pk', *AGGREGATE_FIELDS)
+    if pks is not None:
+        pks = sorted(pks)
+        for start in range(0, len(pks), chunk_size):
+            yield list(shows.filter(pk__in=pks[start:start + chunk_size]))
+        return
+
+    last_pk = 0
+    while True:
+        chunk = list(shows.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        last_pk = chunk[-1].pk
+        yield chunk
@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class LmnConfig(AppConfig):
     name = 'lmn'
+
+    def ready(self):
+        # Take deleted notes out of their shows' totals, however they're deleted
+        from . import models
+        models.connect_signals()
+        # Keep the autocomplete name indexes in step with Artist and Venue saves and deletes
+        from .autocomplete import connect_signals
+        connect_signals()
+        # Invalidate the cached pages a saved or deleted row is on
+        from . import response_cache
+        response_cache.connect_signals()
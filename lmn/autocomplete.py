@@ -0,0 +1,194 @@
+""" In-memory prefix indexes of artist and venue names, for the search box autocomplete.
+
+Each index is a sorted list of normalized name keys, searched with bisect, so a keystroke costs
+a few microseconds and no database query. A name is indexed from the start of each of its words,
+so 'beat' finds 'The Beatles' as well as 'Beat Happening'.
+
+An index is loaded from the database the first time it's used (the WSGI app warms them at startup).
+Imports write from another process with bulk upserts, which don't send signals, so every
+REFRESH_SECONDS an index asks the database for rows newer than the newest it has, and every
+REBUILD_SECONDS it reloads everything to pick up renames and deletes made elsewhere.
+Saves and deletes in this process update the index straight away.
+"""
+
+import bisect
+import heapq
+import threading
+import time
+
+from django.db import DatabaseError
+from django.db.models.signals import post_delete, post_save
+
+from .identity import normalize
+from .models import Artist, Venue
+
+REFRESH_SECONDS = 30
+REBUILD_SECONDS = 60 * 60
+
+
+def word_keys(normalized):
+    """ The normalized name from the start of each word, e.g. 'the beatles' and 'beatles'. """
+    keys = [normalized]
+    for position, char in enumerate(normalized):
+        if char == ' ':
+            keys.append(normalized[position + 1:])
+    return keys
+
+
+class PrefixIndex:
+    """ Names of one model's rows, sorted so that the names starting with a prefix are next to each other.
+
+    keys and pks are parallel sorted lists, one entry per word of each name. Changes are merged into
+    them in one pass, so adding a batch of rows costs about the same as adding one. Safe to share
+    between threads. """
+
+    def __init__(self, model, fields=('name',)):
+        self.model = model
+        self.fields = fields
+        self.lock = threading.Lock()
+        # Held by the one thread building or refreshing the index from the database
+        self.loading = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Forget everything, so the next search loads the index again. """
+        with self.lock:
+            self.keys = []
+            self.pks = []
+            self.rows = {}           # pk -> dict of fields
+            self.normalized = {}     # pk -> normalized name
+            self.newest_pk = 0
+            self.built_at = None
+            self.refreshed_at = None
+
+    def build(self):
+        """ Load every row from the database, replacing what's in the index. """
+        started = time.monotonic()
+        rows = self._load(self.model.objects.all())
+        entries = sorted((key, pk) for pk, row in rows.items() for key in word_keys(normalize(row['name'])))
+        with self.lock:
+            self.keys = [key for key, pk in entries]
+            self.pks = [pk for key, pk in entries]
+            self.rows = rows
+            self.normalized = {pk: normalize(row['name']) for pk, row in rows.items()}
+            self.newest_pk = max(rows, default=0)
+            self.built_at = self.refreshed_at = started
+
+    def refresh(self):
+        """ Add the rows created since the index last looked, with one query on the primary key. """
+        started = time.monotonic()
+        rows = self._load(self.model.objects.filter(pk__gt=self.newest_pk))
+        self.add_rows(rows)
+        with self.lock:
+            self.refreshed_at = started
+        return len(rows)
+
+    def add(self, pk, row):
+        """ Index one row, or re-index it under its new name. row is a dict of the index's fields. """
+        self.add_rows({pk: row})
+
+    def add_rows(self, rows):
+        """ Index rows, a dict of pk -> dict of the index's fields, or re-index the ones already there
+        under their new names. """
+        normalized = {pk: normalize(row['name']) for pk, row in rows.items()}
+        with self.lock:
+            changed = {pk for pk, name in normalized.items() if self.normalized.get(pk) != name}
+            self._reindex(changed, sorted((key, pk) for pk in changed for key in word_keys(normalized[pk])))
+            self.rows.update(rows)
+            self.normalized.update(normalized)
+            self.newest_pk = max(self.newest_pk, max(rows, default=0))
+
+    def remove(self, pk):
+        with self.lock:
+            if self.normalized.pop(pk, None) is not None:
+                self._reindex({pk}, [])
+            self.rows.pop(pk, None)
+
+    def _reindex(self, pks, entries):
+        """ Replace the entries for pks with entries, sorted (key, pk) pairs, merging them in with one
+        pass over the index. Call with self.lock held. """
+        if not pks:
+            return
+        kept = ((key, pk) for key, pk in zip(self.keys, self.pks) if pk not in pks)
+        merged = list(heapq.merge(kept, entries))
+        self.keys = [key for key, pk in merged]
+        self.pks = [pk for key, pk in merged]
+
+    def search(self, prefix, limit=10):
+        """ Up to limit (pk, row) pairs for the rows with a word in their name starting with prefix. """
+        self._keep_fresh()
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        with self.lock:
+            position = bisect.bisect_left(self.keys, prefix)
+            while position < len(self.keys) and len(results) < limit:
+                key = self.keys[position]
+                if not key.startswith(prefix):
+                    break
+                pk = self.pks[position]
+                position += 1
+                # A name with the prefix at the start of two words has two entries
+                if pk in seen:
+                    continue
+                seen.add(pk)
+                results.append((pk, self.rows[pk]))
+        return results
+
+    def _keep_fresh(self):
+        # A rebuild is always due later than a refresh, since a build counts as a refresh
+        if self.built_at is not None and time.monotonic() - self.refreshed_at <= REFRESH_SECONDS:
+            return
+        # Only one thread loads from the database. The others search what's there already,
+        # or wait for the first build if there's nothing yet, and then find it's fresh.
+        if not self.loading.acquire(blocking=self.built_at is None):
+            return
+        try:
+            now = time.monotonic()
+            if self.built_at is None or now - self.built_at > REBUILD_SECONDS:
+                self.build()
+            elif now - self.refreshed_at > REFRESH_SECONDS:
+                self.refresh()
+        finally:
+            self.loading.release()
+
+    def _load(self, queryset):
+        return {row['pk']: {field: row[field] for field in self.fields}
+                for row in queryset.values('pk', *self.fields).iterator()}
+
+
+artist_index = PrefixIndex(Artist)
+venue_index = PrefixIndex(Venue, fields=('name', 'city', 'state'))
+
+INDEXES = {Artist: artist_index, Venue: venue_index}
+
+
+def warm_indexes():
+    """ Load the indexes now rather than on the first keystroke.
+    If the database isn't ready, they are left to load when they're first used. """
+    for index in INDEXES.values():
+        try:
+            index.build()
+        except DatabaseError:
+            index.reset()
+
+
+def update_index(sender, instance, raw=False, **kwargs):
+    """ post_save receiver: index a new or renamed Artist or Venue. """
+    if not raw:
+        index = INDEXES[sender]
+        index.add(instance.pk, {field: getattr(instance, field) for field in index.fields})
+
+
+def remove_from_index(sender, instance, **kwargs):
+    """ post_delete receiver: stop suggesting a deleted Artist or Venue. """
+    INDEXES[sender].remove(instance.pk)
+
+
+def connect_signals():
+    for model in INDEXES:
+        post_save.connect(update_index, sender=model, dispatch_uid=f'autocomplete_update_{model.__name__}')
+        post_delete.connect(remove_from_index, sender=model, dispatch_uid=f'autocomplete_remove_{model.__name__}')
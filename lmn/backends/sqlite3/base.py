@@ -0,0 +1,50 @@
+""" The SQLite backend, tuned for serving the site from one database file to several gunicorn workers.
+
+Use it with 'ENGINE': 'lmn.backends.sqlite3'. Every new connection runs the PRAGMAs in PRAGMAS.
+A database's settings can change or add to them with a 'PRAGMAS' dict, e.g. {'mmap_size': 0}.
+
+- journal_mode=WAL: readers read the last committed data while a writer writes, instead of
+  waiting for it, and a writer doesn't wait for readers to finish. It's saved in the database file.
+- synchronous=NORMAL: with WAL, only checkpoints wait for the disk. A power cut can lose the last
+  few commits, but can't corrupt the database.
+- mmap_size: read the database through memory-mapped I/O, up to this many bytes, saving a copy per page read.
+- cache_size: pages kept in memory by each connection. Negative numbers are KiB, so -65536 is 64 MiB.
+- busy_timeout: milliseconds to wait for another connection's write lock before giving up with 'database is locked'.
+
+Transactions start with BEGIN IMMEDIATE, which takes the write lock straight away, waiting up to
+busy_timeout for it. After a plain BEGIN, a transaction that reads and then writes can find that another
+connection wrote in between; SQLite can't wait that out, and fails at once with 'database is locked'.
+"""
+
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 20000,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def pragmas(self):
+        """ The PRAGMAs for this database, PRAGMAS with the ones from its settings on top. """
+        pragmas = {**PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+        for name, value in pragmas.items():
+            if not re.fullmatch(r'\w+', name) or not re.fullmatch(r'-?\w+', str(value)):
+                raise ImproperlyConfigured(f'Bad SQLite PRAGMA setting {name!r}: {value!r}')
+        return pragmas
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas().items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
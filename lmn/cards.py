@@ -0,0 +1,52 @@
+""" Cached HTML for the note and show cards on list pages.
+
+Each card is rendered from its own template and kept in the cache named by settings.CARD_CACHE_ALIAS,
+keyed by the template, the row's pk and its version: the updated_at times of the rows the card shows.
+Saving a note or show gives it a new updated_at, and so do new note totals and renaming the show's
+artist or venue, so a changed card is looked up under a new key and the old one is left to expire.
+
+A list view reads just the pks and versions for its page, then only the cards that aren't cached
+are read in full, with their related rows, in one query, and rendered.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_KEY = 'lmn-card:{}:{}:{}'
+
+# The version fields to read for each card, and how to make a version from them
+NOTE_VERSION_FIELDS = ['updated_at', 'show__updated_at']
+SHOW_VERSION_FIELDS = ['updated_at']
+
+
+def note_version(note):
+    """ A note's card also shows its show, artist and venue, and the show's updated_at covers those two. """
+    return f'{note.updated_at.timestamp()}-{note.show.updated_at.timestamp()}'
+
+
+def show_version(show):
+    return str(show.updated_at.timestamp())
+
+
+def render_cards(rows, template_name, name, queryset, version):
+    """ Set row.card to the HTML of template_name for each of rows, with the full row in the context as name.
+
+    rows only need their pk and what version(row) reads. Cards that aren't cached are rendered from the
+    rows of queryset with their pks, read in one query, so queryset should select_related what the card shows.
+    Cards can't depend on who's looking, since everyone gets the same one. """
+    cache = caches[settings.CARD_CACHE_ALIAS]
+    keys = {row.pk: CARD_KEY.format(template_name, row.pk, version(row)) for row in rows}
+    cards = cache.get_many(list(keys.values()))
+
+    missing = [pk for pk, key in keys.items() if key not in cards]
+    if missing:
+        rendered = {keys[row.pk]: render_to_string(template_name, {name: row})
+                    for row in queryset.filter(pk__in=missing)}
+        cache.set_many(rendered, settings.CARD_CACHE_SECONDS)
+        cards.update(rendered)
+
+    for row in rows:
+        # A row deleted since the page was read has no card
+        row.card = mark_safe(cards.get(keys[row.pk], ''))
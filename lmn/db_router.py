@@ -0,0 +1,89 @@
+""" Send reads to read replicas of the database, and writes to the primary ('default').
+
+Replicas are the database aliases listed in settings.READ_REPLICAS. Only reads made while
+ReplicaReadsMiddleware is handling a safe (GET, HEAD, OPTIONS) request go to a replica; everything else,
+like management commands, shell sessions and form posts, reads and writes the primary.
+
+Replicas lag a little behind the primary, so once a request writes anything, the rest of that
+request reads from the primary, and a cookie pins the same browser to the primary for
+REPLICA_LAG_SECONDS after that. The page a form post redirects to then shows what was just saved.
+"""
+
+import contextvars
+import random
+import time
+
+from django.conf import settings
+
+PIN_COOKIE = 'lmn_primary_until'
+
+# The replica this request reads from, or None to read from the primary
+_state = contextvars.ContextVar('lmn_replica_state', default=None)
+
+
+class RequestState:
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+def replicas():
+    return list(getattr(settings, 'READ_REPLICAS', []))
+
+
+class PrimaryReplicaRouter:
+    """ Database router. Add 'lmn.db_router.PrimaryReplicaRouter' to settings.DATABASE_ROUTERS. """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.wrote or state.replica is None:
+            return 'default'
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every database is the primary or a copy of it, holding the same rows,
+        # so objects from any of them can be related
+        return True
+
+
+class ReplicaReadsMiddleware:
+    """ Lets a request's reads go to a replica, unless it's a form post or the browser wrote something recently.
+
+    Put it near the top of settings.MIDDLEWARE, before the session and authentication middleware,
+    so their reads and writes are routed too. """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        available = replicas()
+        replica = None
+        if available and request.method in ('GET', 'HEAD', 'OPTIONS') and not pinned(request):
+            # One replica for the whole request, so its reads are consistent with each other
+            replica = random.choice(available)
+
+        state = RequestState(replica)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote and available:
+            lag = getattr(settings, 'REPLICA_LAG_SECONDS', 5)
+            response.set_cookie(PIN_COOKIE, str(time.time() + lag), max_age=lag, httponly=True, samesite='Lax')
+        return response
+
+
+def pinned(request):
+    """ True if the browser's pin cookie says it wrote something too recently for the replicas to have it. """
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
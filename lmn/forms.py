@@ -1,4 +1,5 @@
 from django import forms
+from .geo import city_centroid
 from .models import Note
 
 from django.contrib.auth.forms import UserCreationForm
@@ -8,12 +9,21 @@ from PIL import Image  # Used to open image and validate image format
 from io import BytesIO
 
 
+# Text inputs with data-autocomplete get suggestions from the autocomplete view, see static/js/autocomplete.js
+def autocomplete_input(kind):
+    return forms.TextInput(attrs={'data-autocomplete': kind, 'autocomplete': 'off'})
+
+
 class VenueSearchForm(forms.Form):
-    search_name = forms.CharField(label='Venue Name', max_length=200)
+    search_name = forms.CharField(label='Venue Name', max_length=200, widget=autocomplete_input('venue'))
 
 
 class ArtistSearchForm(forms.Form):
-    search_name = forms.CharField(label='Artist Name', max_length=200)
+    search_name = forms.CharField(label='Artist Name', max_length=200, widget=autocomplete_input('artist'))
+
+
+class NoteSearchForm(forms.Form):
+    search_text = forms.CharField(label='Search Notes', max_length=200)
 
 
 class NewNoteForm(forms.ModelForm):
@@ -47,8 +57,34 @@ class NewNoteForm(forms.ModelForm):
 
 class ShowSearchForm(forms.Form):
     # This is the search form which is used in show_list.html
-    search_artist = forms.CharField(label='Artist Name', max_length=200, required=False)
-    search_venue = forms.CharField(label='Venue Name', max_length=200, required=False)
+    search_artist = forms.CharField(label='Artist Name', max_length=200, required=False,
+                                    widget=autocomplete_input('artist'))
+    search_venue = forms.CharField(label='Venue Name', max_length=200, required=False,
+                                   widget=autocomplete_input('venue'))
+
+
+class ShowsNearForm(forms.Form):
+    # Either a city and state, or the browser's own location in the hidden fields (see static/js/near_me.js)
+    city = forms.CharField(label='City', max_length=200, required=False)
+    state = forms.CharField(label='State', max_length=2, required=False)
+    miles = forms.IntegerField(label='Within miles', min_value=1, max_value=500, initial=25)
+    latitude = forms.FloatField(min_value=-90, max_value=90, required=False, widget=forms.HiddenInput)
+    longitude = forms.FloatField(min_value=-180, max_value=180, required=False, widget=forms.HiddenInput)
+
+    def clean(self):
+        """ Find the point to search around, as cleaned_data['point']. """
+        cleaned_data = super().clean()
+        latitude, longitude = cleaned_data.get('latitude'), cleaned_data.get('longitude')
+        if latitude is not None and longitude is not None:
+            cleaned_data['point'] = (latitude, longitude)
+        elif cleaned_data.get('city') and cleaned_data.get('state'):
+            point = city_centroid(cleaned_data['city'], cleaned_data['state'])
+            if point is None:
+                raise ValidationError('Sorry, we don\'t know where that city is. Try a bigger city nearby.')
+            cleaned_data['point'] = point
+        else:
+            raise ValidationError('Please enter a city and state, or use your location')
+        return cleaned_data
 
 
 class UserRegistrationForm(UserCreationForm):
@@ -0,0 +1,154 @@
+""" Venue locations, and finding the venues near a point.
+
+Each venue stores a latitude, a longitude and the geohash of that point. A geohash names a cell of
+a grid over the world, e.g. '9zvxv' is a cell about 3 miles across over Minneapolis; each extra
+character splits a cell into 32 smaller ones. Points in a cell share its geohash as a prefix, so
+the venues in one cell are one range of the geohash index: geohash >= '9zvxv' AND geohash < '9zvxv{'.
+
+To find the venues within some miles of a point, a few cells cover the circle's bounding box. The
+venues in those cells are read from the (geohash, latitude, longitude) index without touching the
+table, and the exact distances drop the ones in the corners of the box.
+
+Venues that don't come with coordinates are put in the middle of their city, from an offline list
+of city centroids in lmn/data/city_centroids.csv (state, city, latitude, longitude). Any gazetteer,
+like the US Census places file, can be converted to those columns to cover more cities.
+"""
+
+import csv
+import math
+import os
+import unicodedata
+
+from django.db.models import Q
+
+GEOHASH_PRECISION = 9  # cells about 15 feet across
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Sorts after every geohash character, so a cell's range ends at its geohash + '{'
+AFTER_BASE32 = '{'
+
+# At most this many cells are read for one search. Fewer, bigger cells read more venues outside the circle.
+MAX_CELLS = 16
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = EARTH_RADIUS_MILES * math.pi / 180
+
+CENTROIDS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'city_centroids.csv')
+_centroids = None
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """ The geohash of a point, precision characters long. """
+    south, north = -90.0, 90.0
+    west, east = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # bits alternate longitude, latitude, starting with longitude
+    while len(chars) < precision:
+        if even:
+            middle = (west + east) / 2
+            value = value * 2 + (longitude >= middle)
+            if longitude >= middle:
+                west = middle
+            else:
+                east = middle
+        else:
+            middle = (south + north) / 2
+            value = value * 2 + (latitude >= middle)
+            if latitude >= middle:
+                south = middle
+            else:
+                north = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """ The (height, width) in degrees of geohash cells with this many characters. """
+    bits = precision * 5
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+
+def bounding_box(latitude, longitude, miles):
+    """ (south, west, north, east) of the box around a circle. Longitude isn't wrapped, so west can be < -180. """
+    height = miles / MILES_PER_DEGREE
+    width = height / max(math.cos(math.radians(latitude)), 0.01)
+    return max(latitude - height, -90.0), longitude - width, min(latitude + height, 90.0), longitude + width
+
+
+def covering_cells(latitude, longitude, miles):
+    """ The geohashes of the smallest cells, at most MAX_CELLS of them, that together cover a circle's bounding box. """
+    south, west, north, east = bounding_box(latitude, longitude, miles)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if (math.ceil((north - south) / height) + 1) * (math.ceil((east - west) / width) + 1) <= MAX_CELLS:
+            break
+
+    # Stepping by the cell size lands in each row and column of cells the box touches
+    cells = set()
+    for row in range(math.ceil((north - south) / height) + 1):
+        for column in range(math.ceil((east - west) / width) + 1):
+            cell_latitude = min(south + row * height, north)
+            cell_longitude = (min(west + column * width, east) + 180) % 360 - 180
+            cells.add(encode_geohash(cell_latitude, cell_longitude, precision))
+    return sorted(cells)
+
+
+def distance_miles(latitude1, longitude1, latitude2, longitude2):
+    """ Great circle distance between two points, with the haversine formula. """
+    latitude1, longitude1, latitude2, longitude2 = map(math.radians, (latitude1, longitude1, latitude2, longitude2))
+    along = math.sin((latitude2 - latitude1) / 2) ** 2
+    across = math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2
+    a = along + across
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def venues_near(venues, latitude, longitude, miles):
+    """ A dict of venue pk -> distance in miles, for the venues in the venues queryset within miles of the point. """
+    south, west, north, east = bounding_box(latitude, longitude, miles)
+    in_cells = Q()
+    for cell in covering_cells(latitude, longitude, miles):
+        in_cells |= Q(geohash__gte=cell, geohash__lt=cell + AFTER_BASE32)
+    candidates = venues.filter(in_cells, latitude__gte=south, latitude__lte=north)
+    if west >= -180 and east <= 180:
+        candidates = candidates.filter(longitude__gte=west, longitude__lte=east)
+
+    distances = {}
+    for pk, venue_latitude, venue_longitude in candidates.values_list('pk', 'latitude', 'longitude'):
+        distance = distance_miles(latitude, longitude, venue_latitude, venue_longitude)
+        if distance <= miles:
+            distances[pk] = distance
+    return distances
+
+
+def city_key(city, state):
+    """ Case, accents, punctuation and 'Saint'/'St.' don't matter when looking a city up. """
+    decomposed = unicodedata.normalize('NFKD', f'{city} {state}'.casefold())
+    letters = ''.join(char if char.isalnum() else ' ' for char in decomposed if not unicodedata.combining(char))
+    return tuple('st' if word == 'saint' else word for word in letters.split())
+
+
+def city_centroid(city, state):
+    """ The (latitude, longitude) of the middle of a city, or None if it isn't in the centroids file. """
+    global _centroids
+    if _centroids is None:
+        with open(CENTROIDS_FILE, newline='', encoding='utf-8') as file:
+            _centroids = {
+                city_key(row['city'], row['state']): (float(row['latitude']), float(row['longitude']))
+                for row in csv.DictReader(file)
+            }
+    return _centroids.get(city_key(city, state))
+
+
+def locate(latitude, longitude, city, state):
+    """ The (latitude, longitude, geohash) to save for a venue: its own coordinates if it has them,
+    otherwise the middle of its city, or all None if the city isn't known either. """
+    if latitude is None or longitude is None:
+        latitude, longitude = city_centroid(city, state) or (None, None)
+    if latitude is None:
+        return None, None, None
+    return latitude, longitude, encode_geohash(latitude, longitude)
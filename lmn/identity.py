@@ -0,0 +1,154 @@
+""" Canonical keys for artists and venues, and merging rows that turn out to be the same artist or venue.
+
+Names are typed by people and by Ticketmaster in slightly different ways, e.g. 'The Weeknd' and
+'the weeknd '. Each Artist and Venue stores a canonical key, its name normalized, in a column with a
+unique index, so the importer and the forms find the existing row instead of adding another one.
+A venue's key also has its city and state, since lots of towns have a 'Legion Hall'.
+
+Imported rows also store Ticketmaster's id for the attraction or venue. Two rows with the same id
+are the same artist or venue under different names, e.g. before and after a rename.
+
+collapse_duplicates() merges rows with the same canonical key or the same Ticketmaster id into the
+oldest one, moving their shows over. The merge_duplicates command runs it; run it again
+after changing how keys are made.
+"""
+
+import unicodedata
+
+from django.core.files.storage import default_storage
+
+from .aggregates import rebuild_show_aggregates
+from .write_queue import WriteQueue
+
+
+def normalize(name):
+    """ Lower case, without accents, and with runs of spaces and punctuation made into single spaces. """
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    letters = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(''.join(char if char.isalnum() else ' ' for char in letters).split())
+
+
+def canonical_artist_key(name):
+    # A name that's all punctuation, like '!!!', keeps its punctuation so it doesn't clash with other ones
+    return normalize(name) or name.strip()
+
+
+def canonical_venue_key(name, city, state):
+    return '|'.join([canonical_artist_key(name), normalize(city), normalize(state)])
+
+
+def artist_key_of(row):
+    return canonical_artist_key(row['name'])
+
+
+def venue_key_of(row):
+    return canonical_venue_key(row['name'], row['city'], row['state'])
+
+
+def collapse_duplicates(artist_model, venue_model, show_model, note_model, source_model, batch_size=1000, writes=None):
+    """ Merge duplicate artists and venues, and set every row's canonical key.
+
+    Each merge is one transaction, through writes, a WriteQueue. Returns (artists merged, venues merged). """
+    writes = writes or WriteQueue(thread=False)
+    merger = Merger(show_model, note_model, source_model, batch_size, writes)
+    merged = []
+    for model, key_of, fields in [(artist_model, artist_key_of, ['name']),
+                                  (venue_model, venue_key_of, ['name', 'city', 'state'])]:
+        rows = list(model.objects.order_by('pk').values('pk', 'canonical_key', 'ticketmaster_id', *fields).iterator())
+        keys = {row['pk']: key_of(row) for row in rows}
+        duplicates = find_duplicates(rows, keys)
+        merger.merge(model, duplicates)
+        merged.append(len(duplicates))
+
+        # Now the duplicates are gone, the keys left are all different
+        stale = [model(pk=row['pk'], canonical_key=keys[row['pk']])
+                 for row in rows if row['pk'] not in duplicates and row['canonical_key'] != keys[row['pk']]]
+        for start in range(0, len(stale), batch_size):
+            writes.submit(model.objects.bulk_update, stale[start:start + batch_size], ['canonical_key'])
+    writes.wait()
+
+    # Merging shows moves notes between them, so recount those shows
+    rebuild_show_aggregates(show_model, note_model, chunk_size=batch_size, writes=writes, pks=merger.merged_shows)
+    return tuple(merged)
+
+
+def find_duplicates(rows, keys):
+    """ Map of pk -> pk of the row to merge it into, for rows whose key or Ticketmaster id matches an older row.
+
+    rows are dicts with pk and ticketmaster_id, sorted by pk; keys maps pk -> canonical key. """
+    parent = {}
+
+    def root(pk):
+        while parent.get(pk, pk) != pk:
+            pk = parent[pk]
+        return pk
+
+    def join(pk, other):
+        # The older row, with the smaller pk, is kept
+        pk, other = root(pk), root(other)
+        if pk != other:
+            parent[max(pk, other)] = min(pk, other)
+
+    first_with_key = {}
+    first_with_id = {}
+    for row in rows:
+        pk = row['pk']
+        join(pk, first_with_key.setdefault(keys[pk], pk))
+        if row['ticketmaster_id']:
+            join(pk, first_with_id.setdefault(row['ticketmaster_id'], pk))
+    return {pk: root(pk) for pk in parent if root(pk) != pk}
+
+
+class Merger:
+    """ Merges artists or venues into other rows of the same model, moving their shows.
+
+    A moved show can clash with a show the kept row already has, on the same date with the same
+    venue (or artist). Then the two shows are merged too: notes and imported event sources move to
+    the kept show, except notes by users who already have one there, which are deleted with the show. """
+
+    def __init__(self, show_model, note_model, source_model, batch_size=1000, writes=None):
+        self.show_model = show_model
+        self.note_model = note_model
+        self.source_model = source_model
+        self.batch_size = batch_size
+        self.writes = writes or WriteQueue(thread=False)
+        # Shows that gained notes from merged shows, whose totals need recounting
+        self.merged_shows = set()
+
+    def merge(self, model, duplicates):
+        """ Merge each row in duplicates, a map of pk -> pk of the row to keep, into the kept row. """
+        field = model._meta.model_name
+        other = 'venue' if field == 'artist' else 'artist'
+        for duplicate, keep in duplicates.items():
+            self.writes.submit(self._merge_one, model, field, other, duplicate, keep)
+        self.writes.wait()
+
+    def _merge_one(self, model, field, other, duplicate, keep):
+        shows = self.show_model.objects
+        kept_shows = {
+            (show_date, other_pk): pk
+            for show_date, other_pk, pk in shows.filter(**{field: keep}).values_list('show_date', f'{other}_id', 'pk')
+        }
+        moving = []
+        for pk, show_date, other_pk in shows.filter(**{field: duplicate}).values_list('pk', 'show_date', f'{other}_id'):
+            same_show = kept_shows.get((show_date, other_pk))
+            if same_show:
+                self._merge_show(pk, same_show)
+            else:
+                moving.append(pk)
+
+        for start in range(0, len(moving), self.batch_size):
+            shows.filter(pk__in=moving[start:start + self.batch_size]).update(**{field: keep})
+        model.objects.filter(pk=duplicate).delete()
+
+    def _merge_show(self, show, keep):
+        users = self.note_model.objects.filter(show=keep).values('user')
+        self.note_model.objects.filter(show=show).exclude(user__in=users).update(show=keep)
+        self.source_model.objects.filter(show=show).update(show=keep)
+        # The notes left are deleted with the show, and a cascade doesn't call Note.delete to remove their photos
+        left = self.note_model.objects.filter(show=show).exclude(photo='').exclude(photo=None)
+        for photo in left.values_list('photo', flat=True):
+            if default_storage.exists(photo):
+                default_storage.delete(photo)
+        self.show_model.objects.filter(pk=show).delete()
+        self.merged_shows.add(keep)
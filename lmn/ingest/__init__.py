@@ -0,0 +1,4 @@
+""" Helpers for importing shows from the Ticketmaster Discovery API.
+
+The management command in lmn/management/commands/ticketmaster.py drives these.
+"""
@@ -0,0 +1,60 @@
+""" Record raw Discovery API pages to gzipped JSON Lines files, and replay them later without a network.
+
+Each line of an archive is one complete API response (one page of events), exactly as it was received.
+"""
+
+import datetime
+import glob
+import gzip
+import os
+import threading
+
+from .fetch import parse_page
+
+
+class PageRecorder:
+    """ Appends raw API pages to one .jsonl.gz file. Safe to share between fetching threads. """
+
+    def __init__(self, directory, name):
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%S')
+        self.path = os.path.join(directory, f'{name}-{stamp}.jsonl.gz')
+        self.file = gzip.open(self.path, 'ab')
+        self.lock = threading.Lock()
+        self.pages = 0
+
+    def tee(self, chunks):
+        """ Yield the chunks unchanged, and record the page once they have all been read. """
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        self.write_page(b''.join(received))
+
+    def write_page(self, body):
+        # Newlines outside strings are just whitespace, and inside strings they are always escaped,
+        # so removing them keeps the JSON the same and the page on one line.
+        line = body.replace(b'\r', b'').replace(b'\n', b'') + b'\n'
+        with self.lock:
+            self.file.write(line)
+            self.pages += 1
+
+    def close(self):
+        self.file.close()
+
+
+def archive_files(path):
+    """ The archive files at path, which can be one file or a directory of .jsonl.gz files. """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*.jsonl.gz')))
+    return [path]
+
+
+def iter_archive(path):
+    """ Yield lists of event records, one list per recorded page, from the archive files at path. """
+    for file_path in archive_files(path):
+        with gzip.open(file_path, 'rb') as file:
+            for line in file:
+                if line.strip():
+                    records, _ = parse_page([line])
+                    yield records
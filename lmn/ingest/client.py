@@ -0,0 +1,103 @@
+""" A shared HTTP client for the Discovery API: pooled keep-alive connections, a rate limit, and retries. """
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# The Discovery API allows 5 requests per second (and 5000 per day) for a standard key
+DEFAULT_RATE = 5
+
+# Responses worth trying again: rate limited, or a temporary server problem
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """ Allows `rate` calls per second on average, with bursts of up to `capacity` calls.
+
+    acquire() blocks until a token is free. Safe to share between threads. """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class TicketmasterClient:
+    """ Makes GET requests through one requests.Session, so connections are reused between pages.
+
+    Every request waits for the rate limiter first. Connection errors, timeouts, 429s and 5xx responses
+    are retried with exponential backoff plus random jitter, so parallel workers don't retry in lockstep.
+    A Retry-After header from the server is respected. Once retries run out the error is raised as usual. """
+
+    def __init__(self, rate=DEFAULT_RATE, pool_size=10, max_retries=5, backoff=0.5, max_backoff=30, timeout=30):
+        self.limiter = TokenBucket(rate) if rate else None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.retries = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, params=None, stream=False):
+        """ GET url, retrying failures. Returns a successful response, or raises a requests exception. """
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if self.limiter:
+                self.limiter.acquire()
+
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_attempt:
+                    raise
+                self._wait(self.delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                delay = retry_after(response)
+                response.close()
+                self._wait(delay if delay is not None else self.delay(attempt))
+                continue
+
+            response.raise_for_status()
+            return response
+
+    def delay(self, attempt):
+        """ Seconds to wait before retry number `attempt`: a random time up to an exponentially growing cap. """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _wait(self, seconds):
+        self.retries += 1
+        time.sleep(seconds)
+
+    def close(self):
+        self.session.close()
+
+
+def retry_after(response):
+    """ The number of seconds in a response's Retry-After header, or None. """
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
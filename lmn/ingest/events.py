@@ -0,0 +1,90 @@
+""" Turn raw Ticketmaster Discovery API events into compact records the writer can save. """
+
+import datetime
+import hashlib
+import json
+
+
+def parse_event(event):
+    """ Return a small dict with just the fields we store for one API event, or None if it can't be used.
+
+    Events with no venue, or with no named attraction (local cover bands, TBA lineups)
+    are skipped, because a Show needs both an Artist and a Venue. """
+
+    embedded = event.get('_embedded', {})
+
+    venues = embedded.get('venues') or []
+    attractions = embedded.get('attractions') or []
+    if not venues or not attractions or not attractions[0].get('name'):
+        return None
+
+    start = event.get('dates', {}).get('start', {})
+    local_date = start.get('localDate')
+    if not local_date:
+        return None
+    # Some shows don't have a local time, so use midnight for unknown/TBD times
+    local_time = start.get('localTime', '00:00:00')
+
+    venue = venues[0]
+    state = venue.get('state', {})
+    location = venue.get('location') or {}
+
+    record = {
+        'event_id': event.get('id'),
+        'show_date': parse_show_date(local_date, local_time),
+        'artist_name': attractions[0]['name'],
+        'artist_ticketmaster_id': attractions[0].get('id'),
+        'venue_name': venue.get('name', ''),
+        'venue_city': venue.get('city', {}).get('name', ''),
+        # Venue.state holds a 2 letter code, so prefer the code over the full state name
+        'venue_state': state.get('stateCode') or state.get('name', ''),
+        'venue_ticketmaster_id': venue.get('id'),
+        'venue_latitude': parse_coordinate(location.get('latitude'), 90),
+        'venue_longitude': parse_coordinate(location.get('longitude'), 180),
+        # Not every source includes a change timestamp; delta syncs treat a missing one as changed
+        'changed_at': parse_timestamp(event.get('updated')),
+    }
+    record['hash'] = content_hash(record)
+    return record
+
+
+def content_hash(record):
+    """ A short, stable hash of the parts of a record that end up in the database.
+
+    Two versions of an event that would be saved the same way get the same hash,
+    even if other parts of the API's JSON (prices, images, links) changed. """
+    saved = {key: value for key, value in record.items() if key not in ('event_id', 'changed_at', 'hash')}
+    canonical = json.dumps(saved, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def parse_show_date(local_date, local_time):
+    """ Combine Ticketmaster's localDate and localTime strings into a UTC datetime.
+
+    The times are stored as UTC, the same way Django treated the old 'date time' strings. """
+    naive = datetime.datetime.strptime(f'{local_date} {local_time}', '%Y-%m-%d %H:%M:%S')
+    return naive.replace(tzinfo=datetime.timezone.utc)
+
+
+def parse_coordinate(value, limit):
+    """ A latitude or longitude string from the API as a float, or None if it's missing or out of range. """
+    try:
+        coordinate = float(value)
+    except (TypeError, ValueError):
+        return None
+    return coordinate if -limit <= coordinate <= limit else None
+
+
+def parse_timestamp(value):
+    """ Parse an ISO 8601 timestamp like '2023-05-01T20:00:00Z' into an aware datetime, or None. """
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def format_timestamp(value):
+    """ Format a datetime the way the Discovery API expects startDateTime and endDateTime. """
+    return value.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
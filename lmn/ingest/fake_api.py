@@ -0,0 +1,205 @@
+""" A local stand-in for the Discovery API's event search, for load testing the importer.
+
+It serves made up events with the same shape the importer reads (dates.start, _embedded.venues,
+_embedded.attractions, page), can add latency and random errors, and applies the same
+stateCode, date range and deep paging rules as the real API.
+
+    with FakeDiscoveryServer(FakeCatalog(size=10000)) as server:
+        call_command('ticketmaster', url=server.url)
+"""
+
+import bisect
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .events import format_timestamp, parse_timestamp
+from .fetch import DEEP_PAGING_LIMIT
+
+STATES = ['MN', 'WI', 'IA', 'IL', 'ND', 'SD']
+
+# Rough middle of each state, so made up venues get plausible coordinates
+STATE_CENTERS = {
+    'MN': (45.0, -93.5), 'WI': (44.5, -89.5), 'IA': (42.0, -93.5),
+    'IL': (40.0, -89.0), 'ND': (47.5, -100.5), 'SD': (44.4, -100.2),
+}
+
+
+class FakeCatalog:
+    """ A fixed, repeatable set of made up events. The same seed always makes the same catalog. """
+
+    def __init__(self, size=1000, artists=None, venues=None, states=None, seed=0,
+                 start=datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc), days=730):
+        self.seed = seed
+        self.states = states or STATES
+        self.artist_count = artists or max(1, size // 5)
+        self.venue_count = venues or max(1, size // 20)
+
+        rng = random.Random(seed)
+        # Only the state and start time of each event are kept, the rest is made when it's served
+        events = {state: [] for state in self.states}
+        for index in range(size):
+            state = rng.choice(self.states)
+            starts_at = start + datetime.timedelta(minutes=rng.randrange(days * 24 * 60 // 30) * 30)
+            events[state].append((starts_at, index))
+        self.events = {state: sorted(state_events) for state, state_events in events.items()}
+
+    def search(self, state=None, start=None, end=None):
+        """ The (start time, index) pairs of events matching a search, sorted by start time. """
+        states = [state] if state else self.states
+        found = []
+        for state in states:
+            events = self.events.get(state, [])
+            low = bisect.bisect_left(events, (start,)) if start else 0
+            high = bisect.bisect_left(events, (end,)) if end else len(events)
+            found.extend((starts_at, index, state) for starts_at, index in events[low:high])
+        found.sort()
+        return found
+
+    def event(self, starts_at, index, state):
+        """ Build the API JSON for one event. """
+        rng = random.Random(f'{self.seed}-{index}')
+        artist = rng.randrange(self.artist_count)
+        venue = rng.randrange(self.venue_count)
+        latitude, longitude = STATE_CENTERS.get(state, (45.0, -93.5))
+        venue_rng = random.Random(f'{self.seed}-venue-{venue}')
+
+        start = {'localDate': starts_at.strftime('%Y-%m-%d'), 'dateTime': format_timestamp(starts_at)}
+        # Some real events have no local time, because the time is still to be announced
+        if index % 10:
+            start['localTime'] = starts_at.strftime('%H:%M:%S')
+
+        return {
+            'name': f'Artist {artist} live',
+            'type': 'event',
+            'id': f'fake{index:08d}',
+            'url': f'https://www.example.com/event/{index}',
+            'dates': {'start': start, 'status': {'code': 'onsale'}},
+            '_links': {'self': {'href': f'/discovery/v2/events/fake{index:08d}'}},
+            '_embedded': {
+                'venues': [{
+                    'name': f'Venue {venue}',
+                    'type': 'venue',
+                    'id': f'fakevenue{venue:06d}',
+                    'city': {'name': f'City {venue % 50}'},
+                    'state': {'name': state, 'stateCode': state},
+                    'country': {'name': 'United States Of America', 'countryCode': 'US'},
+                    'location': {
+                        'latitude': f'{latitude + venue_rng.uniform(-1, 1):.6f}',
+                        'longitude': f'{longitude + venue_rng.uniform(-1, 1):.6f}',
+                    },
+                }],
+                'attractions': [{'name': f'Artist {artist}', 'type': 'attraction', 'id': f'fakeartist{artist:06d}'}],
+            },
+        }
+
+    def page(self, params):
+        """ The response body for an event search with the given query parameters, or None for a bad request. """
+        size = int(params.get('size', 20))
+        page = int(params.get('page', 0))
+        if size < 1 or page < 0 or (page + 1) * size > DEEP_PAGING_LIMIT:
+            return None
+
+        found = self.search(
+            state=params.get('stateCode'),
+            start=parse_timestamp(params.get('startDateTime')),
+            end=parse_timestamp(params.get('endDateTime')),
+        )
+        page_events = found[page * size:(page + 1) * size]
+        body = {
+            '_links': {'self': {'href': f'/discovery/v2/events?page={page}&size={size}'}},
+            'page': {
+                'size': size,
+                'totalElements': len(found),
+                'totalPages': (len(found) + size - 1) // size,
+                'number': page,
+            },
+        }
+        if page_events:
+            body['_embedded'] = {'events': [self.event(*found_event) for found_event in page_events]}
+        return body
+
+
+class FakeDiscoveryServer:
+    """ Serves a FakeCatalog over HTTP on a free local port, from a background thread.
+
+    latency is seconds added to every response, and error_rate is the fraction of requests
+    answered with a 429 or 500 instead of events. """
+
+    def __init__(self, catalog, latency=0.0, error_rate=0.0, host='127.0.0.1', port=0):
+        self.catalog = catalog
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(catalog.seed)
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/discovery/v2/events'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+                with server._lock:
+                    server.requests += 1
+                    fail = server._rng.random() < server.error_rate
+                    if fail:
+                        server.errors += 1
+                        status = server._rng.choice([429, 500])
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if url.path != '/discovery/v2/events':
+                    return self._send(404, {'fault': {'faultstring': 'Not found'}})
+                if fail:
+                    return self._send(status, {'fault': {'faultstring': 'Fake error'}})
+
+                body = server.catalog.page(params)
+                if body is None:
+                    return self._send(400, {'errors': [{'code': 'DIS1035', 'detail': 'API Limits Exceeded'}]})
+                self._send(200, body)
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json;charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output readable
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
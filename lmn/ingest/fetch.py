@@ -0,0 +1,63 @@
+""" Fetch every page of a Discovery API event search, several pages at a time. """
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .events import parse_event
+from .stream import EventStream
+
+TICKETMASTER_URL = 'https://app.ticketmaster.com/discovery/v2/events'
+
+# Bytes read from the response at a time while parsing
+CHUNK_SIZE = 64 * 1024
+
+# The Discovery API refuses requests where page * size reaches 1000
+# https://developer.ticketmaster.com/products-and-docs/apis/discovery-api/v2/#search-events-v2
+DEEP_PAGING_LIMIT = 1000
+
+
+def fetch_page(client, url, params, page, recorder=None):
+    """ Fetch one page of events. Returns (records, page_info) where page_info is the API's 'page' block.
+
+    The response is parsed as it streams in, and each event is cut down to a compact record
+    straight away, so the full page of raw events is never in memory at once.
+    If a PageRecorder is given, the raw page is also saved to its archive. """
+    with client.get(url, params={**params, 'page': page}, stream=True) as response:
+        chunks = response.iter_content(CHUNK_SIZE)
+        if recorder:
+            chunks = recorder.tee(chunks)
+        return parse_page(chunks)
+
+
+def parse_page(chunks):
+    """ Parse one page of events from an iterable of byte chunks. Returns (records, page_info). """
+    events = EventStream(chunks)
+    records = [record for record in map(parse_event, events) if record]
+    return records, events.page
+
+
+def page_count(page_info, size):
+    """ How many pages can be requested for a search, given the first page's 'page' block. """
+    total_pages = page_info.get('totalPages', 1)
+    return min(total_pages, DEEP_PAGING_LIMIT // size)
+
+
+def iter_pages(client, url, params, workers=4, max_pages=None, recorder=None):
+    """ Yield lists of event records, one list per page, until every page has been fetched.
+
+    The first page is fetched on its own to find out how many pages there are,
+    then the rest are fetched by a pool of worker threads and yielded as they finish.
+    The threads share the client, so they share its connection pool and rate limit. """
+    size = int(params.get('size', 20))
+
+    records, page_info = fetch_page(client, url, params, 0, recorder=recorder)
+    yield records
+
+    pages = page_count(page_info, size)
+    if max_pages:
+        pages = min(pages, max_pages)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fetch_page, client, url, params, page, recorder=recorder) for page in range(1, pages)]
+        for future in as_completed(futures):
+            records, _ = future.result()
+            yield records
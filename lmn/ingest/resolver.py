@@ -0,0 +1,54 @@
+""" Resolve natural keys like an artist name to primary keys without a query per lookup. """
+
+from .upsert import upsert
+
+
+class NaturalKeyResolver:
+    """ Maps natural keys to primary keys for one model.
+
+    The existing (key -> pk) map is loaded with one query the first time it's needed.
+    After that, resolving keys is a dictionary lookup, and any keys that don't exist yet
+    are inserted together with one upsert. The fields must have a unique constraint, so that
+    another worker inserting the same key at the same time doesn't make a duplicate.
+
+    Keys are tuples of the values of `fields`, in order, e.g. ('First Avenue', 'Minneapolis', 'MN')
+    for a resolver on Venue with fields ('name', 'city', 'state').
+
+    The map isn't rolled back with a failed transaction, so make a new resolver after a rollback. """
+
+    def __init__(self, model, fields, batch_size=500):
+        self.model = model
+        self.fields = tuple(fields)
+        self.batch_size = batch_size
+        self.created = 0
+        self._pks = None
+
+    @property
+    def pks(self):
+        """ The (key -> pk) map, loaded from the database on first use. """
+        if self._pks is None:
+            self._pks = self._select(self.model.objects.all())
+        return self._pks
+
+    def resolve(self, keys, values=None):
+        """ Return a dict of key -> pk for every key, creating rows for keys that don't exist yet.
+
+        values optionally maps keys to dicts of other fields to save in the rows that get created,
+        e.g. a venue's coordinates. Give the same fields for every key. """
+        pks = self.pks
+        missing = {key for key in keys if key not in pks}
+        if missing:
+            self._insert(missing, values or {})
+        return {key: pks[key] for key in keys}
+
+    def _insert(self, keys, values):
+        rows = [{**dict(zip(self.fields, key)), **values.get(key, {})} for key in keys]
+        self.created += upsert(self.model, rows, self.fields, batch_size=self.batch_size)
+
+        # Look the rows up again to get their primary keys, including any another worker just inserted
+        first_field = self.fields[0]
+        new_rows = self.model.objects.filter(**{f'{first_field}__in': {key[0] for key in keys}})
+        self._pks.update(self._select(new_rows))
+
+    def _select(self, queryset):
+        return {row[:-1]: row[-1] for row in queryset.values_list(*self.fields, 'pk').iterator()}
@@ -0,0 +1,134 @@
+""" Split an import into (state, month) shards and fetch them across a pool of processes.
+
+Only fetching and parsing happens in the worker processes. Each page of records is sent back to the
+main process as soon as it's parsed, so it can be written while the rest of the shard is fetched and
+no process holds a whole shard in memory. The main process is the only one that writes to the database,
+so the workers never fight over database locks. Nothing in this module touches the ORM, so the workers
+don't need Django set up.
+"""
+
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+from .archive import PageRecorder
+from .client import TicketmasterClient
+from .events import format_timestamp
+from .fetch import iter_pages
+
+# One client per worker process, made the first time that process fetches a shard
+_client = None
+
+# Pages waiting in the queue from the worker processes to the main process, per process.
+# Workers wait when it's full, so a slow database holds back fetching instead of filling memory.
+PAGES_IN_FLIGHT = 4
+
+
+def make_shards(states, start, end):
+    """ A list of shards covering every state from start to end, one calendar month per shard.
+
+    `start` can be a datetime, or a dict of state -> datetime when states start at different times. """
+    shards = []
+    for state in states:
+        state_start = start[state] if isinstance(start, dict) else start
+        for month_start, month_end in months(state_start, end):
+            shards.append({
+                'state': state,
+                'start': month_start,
+                'end': month_end,
+                'key': f'{state}-{month_start:%Y-%m}',
+            })
+    return shards
+
+
+def months(start, end):
+    """ Yield (start, end) pairs splitting the time from start to end at the start of each month. """
+    while start < end:
+        if start.month == 12:
+            next_month = start.replace(year=start.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        else:
+            next_month = start.replace(month=start.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        month_end = min(next_month, end)
+        yield start, month_end
+        start = month_end
+
+
+def iter_shard(shard, settings, client=None):
+    """ Fetch every page of one shard, yielding a result dict for each page as it's parsed.
+
+    Each result has the shard, the page's records, the requests retried since the last result, an error
+    (None, except maybe in the last result) and done (True in the last result, which has no records).
+    `settings` holds the url, base params, and client, thread and recording options for the import.
+    Errors are returned rather than raised, since exceptions holding a response don't pickle well. """
+    client = client or _process_client(settings)
+    params = {
+        **settings['params'],
+        'stateCode': shard['state'],
+        'startDateTime': format_timestamp(shard['start']),
+        'endDateTime': format_timestamp(shard['end']),
+    }
+
+    recorder = None
+    if settings.get('record'):
+        recorder = PageRecorder(settings['record'], f"{settings['name']}-{shard['key']}")
+
+    retries_before = client.retries
+    error = None
+    try:
+        for page in iter_pages(client, settings['url'], params, workers=settings['workers'],
+                               max_pages=settings['max_pages'], recorder=recorder):
+            yield {'shard': shard, 'records': page, 'error': None, 'retries': client.retries - retries_before,
+                   'done': False}
+            retries_before = client.retries
+    except (requests.exceptions.RequestException, ValueError) as err:
+        error = f'{type(err).__name__}: {err}'
+    finally:
+        if recorder:
+            recorder.close()
+
+    yield {'shard': shard, 'records': [], 'error': error, 'retries': client.retries - retries_before, 'done': True}
+
+
+def fetch_shard(shard, settings, pages):
+    """ Fetch one shard in a worker process, putting each result from iter_shard on the pages queue. """
+    for result in iter_shard(shard, settings):
+        pages.put(result)
+
+
+def _process_client(settings):
+    global _client
+    if _client is None:
+        _client = TicketmasterClient(rate=settings['rate'], pool_size=settings['workers'],
+                                     max_retries=settings['max_retries'])
+    return _client
+
+
+def run_shards(shards, settings, processes=1, client=None):
+    """ Yield results from iter_shard for every shard, a page at a time, as the pages arrive.
+
+    With one process the shards are fetched here, one after another, using `client`.
+    With more, they are spread over a process pool, and the rate limit is split between the processes
+    so that together they stay inside the API quota. """
+    if processes <= 1:
+        for shard in shards:
+            yield from iter_shard(shard, settings, client=client)
+        return
+
+    settings = {**settings, 'rate': settings['rate'] / processes if settings['rate'] else settings['rate']}
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=processes) as pool:
+        pages = manager.Queue(maxsize=PAGES_IN_FLIGHT * processes)
+        futures = [pool.submit(fetch_shard, shard, settings, pages) for shard in shards]
+        remaining = len(shards)
+        while remaining:
+            try:
+                result = pages.get(timeout=1)
+            except queue.Empty:
+                # A worker that failed outside of fetching never sends its last page, so raise its error
+                for future in futures:
+                    if future.done() and future.exception():
+                        raise future.exception()
+                continue
+            remaining -= result['done']
+            yield result
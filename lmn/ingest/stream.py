@@ -0,0 +1,84 @@
+""" Incremental parsing of Discovery API responses.
+
+A page of events is a large JSON document shaped like
+
+    {"_embedded": {"events": [{...}, {...}, ...]}, "_links": {...}, "page": {...}}
+
+Rather than load the whole thing with json.loads, EventStream reads it a chunk at a time
+and yields each event as soon as its closing brace arrives, so only one event
+(plus one chunk of unread text) is held in memory at once.
+"""
+
+import codecs
+import json
+import re
+
+EVENTS_ARRAY = re.compile(r'"events"\s*:\s*\[')
+SEPARATORS = ' \t\r\n,'
+
+
+class EventStream:
+    """ Iterate over the events in a Discovery API response, given an iterable of byte chunks.
+
+    Once iteration finishes, `page` holds the response's 'page' block
+    (size, totalElements, totalPages, number), which comes after the events in the document. """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.page = {}
+
+    def _read(self):
+        """ Append the next chunk to the buffer. Returns False when there is nothing left to read. """
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer += self.decoder.decode(chunk)
+                return True
+        self.buffer += self.decoder.decode(b'', final=True)
+        return False
+
+    def __iter__(self):
+        # Find the start of the events array, keeping the text before it to rebuild the document later
+        match = EVENTS_ARRAY.search(self.buffer)
+        while not match:
+            if not self._read():
+                # No events in this response, e.g. a search with no results. What's left is small.
+                self.page = json.loads(self.buffer).get('page', {}) if self.buffer.strip() else {}
+                return
+            match = EVENTS_ARRAY.search(self.buffer)
+
+        prefix = self.buffer[:match.end()]
+        self.buffer = self.buffer[match.end():]
+
+        decoder = json.JSONDecoder()
+        while True:
+            position = 0
+            while position < len(self.buffer) and self.buffer[position] in SEPARATORS:
+                position += 1
+            if position == len(self.buffer):
+                if not self._read():
+                    raise ValueError('Response ended inside the events array')
+                continue
+
+            if self.buffer[position] == ']':
+                self.buffer = self.buffer[position + 1:]
+                break
+
+            try:
+                event, end = decoder.raw_decode(self.buffer, position)
+            except json.JSONDecodeError:
+                # Most likely the event isn't all here yet
+                if not self._read():
+                    raise
+                continue
+
+            self.buffer = self.buffer[end:]
+            yield event
+
+        # The rest of the document is just the _links and page blocks
+        while self._read():
+            pass
+        document = json.loads(prefix + ']' + self.buffer)
+        self.page = document.get('page', {})
+        self.buffer = ''
@@ -0,0 +1,87 @@
+""" Set based INSERT ... ON CONFLICT statements, so rows can be written from parallel workers without races.
+
+get_or_create looks a row up and then inserts it, which is two statements per row and lets two workers
+both decide to insert the same row. An upsert sends many rows in one statement and lets the database's
+unique constraint decide which ones are new.
+"""
+
+from django.db import connections, router
+from django.utils import timezone
+
+# SQLite before 3.32 allows at most 999 parameters in one statement
+MAX_PARAMETERS = 999
+
+
+def upsert(model, rows, conflict_fields, update_fields=(), batch_size=500, using=None):
+    """ Insert rows into model's table, skipping or updating rows that clash with a unique constraint.
+
+    rows is a list of dicts of field name -> value. Fields left out get their model default, or the
+    current time for auto_now fields, as they would with save(). conflict_fields names the fields of the unique
+    constraint to check. Rows that clash are left alone, or if update_fields are given, those fields
+    are updated from the new row.
+
+    Works on SQLite (3.24+) and PostgreSQL with ON CONFLICT, and on MySQL with INSERT IGNORE or
+    ON DUPLICATE KEY UPDATE. Returns the number of rows the database reports as inserted or changed. """
+    if not rows:
+        return 0
+
+    using = using or router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    defaults = _defaults(model, fields)
+    fields += [model._meta.get_field(name) for name in defaults]
+    columns = ', '.join(quote(field.column) for field in fields)
+    table = quote(model._meta.db_table)
+
+    batch_size = max(1, min(batch_size, MAX_PARAMETERS // len(fields)))
+    changed = 0
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            placeholders = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(batch))
+            params = [
+                field.get_db_prep_save(row[field.name] if field.name in row else defaults[field.name], connection)
+                for row in batch
+                for field in fields
+            ]
+            sql = _upsert_sql(connection, table, columns, placeholders,
+                              [model._meta.get_field(name).column for name in conflict_fields],
+                              [model._meta.get_field(name).column for name in update_fields])
+            cursor.execute(sql, params)
+            changed += max(cursor.rowcount, 0)
+
+    return changed
+
+
+def _defaults(model, given_fields):
+    """ Values for the fields a row leaves out, since a raw INSERT doesn't apply Django's defaults. """
+    defaults = {}
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field in given_fields:
+            continue
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            defaults[field.name] = timezone.now()
+        elif field.has_default():
+            defaults[field.name] = field.get_default()
+    return defaults
+
+
+def _upsert_sql(connection, table, columns, placeholders, conflict_columns, update_columns):
+    quote = connection.ops.quote_name
+
+    if connection.vendor == 'mysql':
+        if not update_columns:
+            return f'INSERT IGNORE INTO {table} ({columns}) VALUES {placeholders}'
+        updates = ', '.join(f'{quote(column)} = VALUES({quote(column)})' for column in update_columns)
+        return f'INSERT INTO {table} ({columns}) VALUES {placeholders} ON DUPLICATE KEY UPDATE {updates}'
+
+    conflict = ', '.join(quote(column) for column in conflict_columns)
+    if update_columns:
+        updates = ', '.join(f'{quote(column)} = excluded.{quote(column)}' for column in update_columns)
+        action = f'DO UPDATE SET {updates}'
+    else:
+        action = 'DO NOTHING'
+    return f'INSERT INTO {table} ({columns}) VALUES {placeholders} ON CONFLICT ({conflict}) {action}'
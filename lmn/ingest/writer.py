@@ -0,0 +1,156 @@
+""" Save event records as Artists, Venues and Shows using a few bulk queries per chunk. """
+
+from lmn.geo import locate
+from lmn.identity import canonical_artist_key, canonical_venue_key
+from lmn.models import Artist, Venue, Show, ShowSource
+from lmn.response_cache import invalidate
+from lmn.write_queue import WriteQueue
+from .resolver import NaturalKeyResolver
+from .upsert import upsert
+
+
+class ShowWriter:
+    """ Collects event records and writes them in chunks.
+
+    Each chunk costs a handful of queries no matter how many events are in it.
+    Artists and venues are resolved in memory, and only the missing ones are inserted;
+    then the shows are upserted in one statement, which skips shows that already exist.
+
+    Events whose content hash matches the one saved for their event id last time are skipped
+    before any of that happens, so re-syncing unchanged events costs no queries at all.
+
+    Chunks are saved through writes, a WriteQueue. By default that runs them right away; pass one with
+    a writer thread to save a chunk while the next one is being fetched. """
+
+    def __init__(self, chunk_size=500, writes=None):
+        self.chunk_size = chunk_size
+        self.writes = writes or WriteQueue(thread=False)
+        self.artists = NaturalKeyResolver(Artist, ('canonical_key',), batch_size=chunk_size)
+        self.venues = NaturalKeyResolver(Venue, ('canonical_key',), batch_size=chunk_size)
+        self._hashes = None
+        self.pending = []
+        self.events = 0
+        self.unchanged = 0
+        self.shows_created = 0
+
+    @property
+    def hashes(self):
+        """ Map of event id -> content hash saved by earlier imports, loaded on first use. """
+        if self._hashes is None:
+            self._hashes = dict(ShowSource.objects.values_list('event_id', 'content_hash').iterator())
+        return self._hashes
+
+    def add(self, records):
+        """ Queue records, writing a chunk whenever enough have built up. """
+        self.pending.extend(records)
+        while len(self.pending) >= self.chunk_size:
+            chunk, self.pending = self.pending[:self.chunk_size], self.pending[self.chunk_size:]
+            self.write(chunk)
+
+    def flush(self):
+        """ Write whatever is left over, and wait for every chunk to be saved. """
+        if self.pending:
+            chunk, self.pending = self.pending, []
+            self.write(chunk)
+        self.writes.wait()
+        if self.shows_created:
+            # The upserts don't send signals, so the cached show list pages are invalidated here
+            invalidate('shows')
+
+    def write(self, records):
+        """ Queue one chunk of records to be saved inside a single transaction. """
+        changed = [record for record in records if not self._unchanged(record)]
+        self.unchanged += len(records) - len(changed)
+        self.events += len(records)
+        records = changed
+        if not records:
+            return
+
+        self.writes.submit(self._save, records)
+        # A chunk that fails to save stops the queue, so the next write or flush raises the error
+        self.hashes.update((record['event_id'], record['hash']) for record in records if record.get('event_id'))
+
+    def _save(self, records):
+        """ Save a chunk. Runs in the write queue's transaction, maybe on its writer thread. """
+        artist_pks = self.artists.resolve({artist_key(record) for record in records}, new_artists(records))
+        venue_pks = self.venues.resolve({venue_key(record) for record in records}, new_venues(records))
+
+        shows = {
+            (record['show_date'], artist_pks[artist_key(record)], venue_pks[venue_key(record)])
+            for record in records
+        }
+        rows = [{'show_date': date, 'artist': artist, 'venue': venue} for date, artist, venue in shows]
+        self.shows_created += upsert(Show, rows, ('show_date', 'artist', 'venue'), batch_size=self.chunk_size)
+        self._save_sources(records, artist_pks, venue_pks)
+
+    def _unchanged(self, record):
+        event_id = record.get('event_id')
+        return bool(event_id) and self.hashes.get(event_id) == record.get('hash')
+
+    def _save_sources(self, records, artist_pks, venue_pks):
+        """ Remember which show each event was saved as, and its content hash. """
+        records = [record for record in records if record.get('event_id')]
+        if not records:
+            return
+
+        show_pks = {
+            (show_date, artist, venue): pk
+            for show_date, artist, venue, pk in Show.objects.filter(
+                show_date__in={record['show_date'] for record in records},
+                artist_id__in=set(artist_pks.values()),
+                venue_id__in=set(venue_pks.values()),
+            ).values_list('show_date', 'artist_id', 'venue_id', 'pk')
+        }
+        # Keyed by event id, since one statement can't update the same row twice
+        rows = {
+            record['event_id']: {
+                'event_id': record['event_id'],
+                'content_hash': record['hash'],
+                'show': show_pks[(record['show_date'], artist_pks[artist_key(record)], venue_pks[venue_key(record)])],
+            }
+            for record in records
+        }
+        upsert(ShowSource, list(rows.values()), ('event_id',), update_fields=('content_hash', 'show'),
+               batch_size=self.chunk_size)
+
+
+def artist_key(record):
+    """ The natural key of a record's artist, its canonical key. """
+    return (canonical_artist_key(record['artist_name']),)
+
+
+def venue_key(record):
+    """ The natural key of a record's venue, its canonical key. """
+    return (canonical_venue_key(record['venue_name'], record['venue_city'], record['venue_state']),)
+
+
+def new_artists(records):
+    """ Map of artist key -> the fields to save if the artist is new. The first spelling of a name wins. """
+    artists = {}
+    for record in records:
+        artists.setdefault(artist_key(record), {
+            'name': record['artist_name'],
+            'ticketmaster_id': record.get('artist_ticketmaster_id'),
+        })
+    return artists
+
+
+def new_venues(records):
+    """ Map of venue key -> the fields to save if the venue is new. Venues without coordinates
+    in the event get the middle of their city. """
+    venues = {}
+    for record in records:
+        key = venue_key(record)
+        if venues.get(key, {}).get('latitude') is None:
+            latitude, longitude, geohash = locate(record.get('venue_latitude'), record.get('venue_longitude'),
+                                                  record['venue_city'], record['venue_state'])
+            venues[key] = {
+                'name': record['venue_name'],
+                'city': record['venue_city'],
+                'state': record['venue_state'],
+                'ticketmaster_id': record.get('venue_ticketmaster_id'),
+                'latitude': latitude,
+                'longitude': longitude,
+                'geohash': geohash,
+            }
+    return venues
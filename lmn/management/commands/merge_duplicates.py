@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from lmn.identity import collapse_duplicates
+from lmn.models import Artist, Note, Show, ShowSource, Venue
+from lmn import response_cache
+from lmn.write_queue import WriteQueue
+
+
+class Command(BaseCommand):
+    help = ('Merge artists and venues with the same canonical key or Ticketmaster id, moving their shows '
+            'to the oldest one, and set every canonical key')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Shows moved or rows re-keyed per query')
+
+    def handle(self, *args, **options):
+        with WriteQueue() as writes:
+            artists, venues = collapse_duplicates(Artist, Venue, Show, Note, ShowSource,
+                                                  batch_size=options['batch_size'], writes=writes)
+        if artists or venues:
+            # Shows were moved with bulk updates, which don't invalidate the pages they're on
+            response_cache.clear()
+        self.stdout.write(f'Merged {artists} duplicate artists and {venues} duplicate venues')
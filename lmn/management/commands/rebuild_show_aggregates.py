@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from lmn.aggregates import rebuild_show_aggregates
+from lmn.models import Note, Show
+from lmn.response_cache import invalidate
+from lmn.write_queue import WriteQueue
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the note count and rating totals stored on every show'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Shows recounted per query')
+
+    def handle(self, *args, **options):
+        with WriteQueue() as writes:
+            fixed = rebuild_show_aggregates(Show, Note, chunk_size=options['chunk_size'], writes=writes)
+        if fixed:
+            # The show list sorts and shows the note counts
+            invalidate('shows')
+        self.stdout.write(f'Fixed note totals for {fixed} shows')
@@ -1,63 +1,139 @@
-from django.core.management.base import BaseCommand
-import requests
+from django.core.management.base import BaseCommand, CommandError
 import os
-from lmn.models import Artist, Venue, Show
+import time
+
+from lmn.ingest.archive import iter_archive
+from lmn.ingest.client import DEFAULT_RATE, TicketmasterClient
+from lmn.ingest.events import parse_timestamp
+from lmn.ingest.fetch import TICKETMASTER_URL
+from lmn.ingest.shards import make_shards, run_shards
+from lmn.ingest.sync import DeltaSync
+from lmn.ingest.writer import ShowWriter
+from lmn.write_queue import WriteQueue
+
+
+def state_list(value):
+    """ Parse a comma separated list of state codes, like 'MN,WI' """
+    return [state.strip().upper() for state in value.split(',') if state.strip()]
+
 
 class Command(BaseCommand):
-    help = 'my custom'
+    help = 'Import music events from the Ticketmaster Discovery API as Artists, Venues and Shows'
+
+    # What the last run did, for callers like ticketmaster_benchmark: events, shows_created, unchanged
+    stats = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('--states', type=state_list, default=['MN'],
+                            help='Comma separated two letter state codes to import events for, e.g. MN,WI,IA')
+        parser.add_argument('--start', type=parse_timestamp, default=parse_timestamp('2022-01-01T00:00:00Z'),
+                            help='Import shows starting on or after this time, e.g. 2022-01-01T00:00:00Z')
+        parser.add_argument('--end', type=parse_timestamp, default=parse_timestamp('2024-01-01T00:00:00Z'),
+                            help='Import shows starting before this time')
+        parser.add_argument('--delta', action='store_true',
+                            help='Only fetch and save events that are new or changed since the last --delta run')
+        parser.add_argument('--record', metavar='DIRECTORY',
+                            help='Also save the raw API pages to gzipped JSON Lines files in this directory')
+        parser.add_argument('--replay', metavar='PATH',
+                            help='Import from a recorded .jsonl.gz file, or a directory of them, instead of the API')
+        parser.add_argument('--url', default=TICKETMASTER_URL, help='Event search URL, e.g. a local stand-in server')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes fetching (state, month) shards at the same time')
+        parser.add_argument('--workers', type=int, default=4, help='Pages of one shard fetched at the same time')
+        parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                            help='Most API requests per second, shared between all processes')
+        parser.add_argument('--max-retries', type=int, default=5,
+                            help='Times to retry a request that fails with a 429, a 5xx or a connection error')
+        parser.add_argument('--page-size', type=int, default=200, help='Events requested per page (max 200)')
+        parser.add_argument('--max-pages', type=int, default=None, help='Stop after this many pages of each shard')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Events written per database transaction')
 
     def handle(self, *args, **options):
-        ticketmaster_url = 'https://app.ticketmaster.com/discovery/v2/events'
-        api_key = os.environ.get('TICKETMASTER')
-
-        params = {
-            'stateCode': 'MN',
-            'classificationName': 'music',
-            'apikey': api_key,
-            'size': '200',
-            'pageSize': '200',
-            'pageNumber': '200',
-            'startDateTime': '2022-01-01T00:00:00Z',
-            'endDateTime': '2024-01-01T00:00:00Z',
-            # 'sort': 'random',
-        }
+        if options['replay'] and (options['record'] or options['delta']):
+            raise CommandError('--replay can\'t be combined with --record or --delta')
+        if options['start'] is None or options['end'] is None:
+            raise CommandError('--start and --end must look like 2022-01-01T00:00:00Z')
+
+        started = time.monotonic()
 
-        try:
-            response = requests.get(ticketmaster_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        # Chunks are saved on a writer thread, while the next events are fetched or read
+        with WriteQueue() as writes:
+            writer = ShowWriter(chunk_size=options['chunk_size'], writes=writes)
+            if options['replay']:
+                try:
+                    for records in iter_archive(options['replay']):
+                        writer.add(records)
+                except ValueError as err:
+                    self.stderr.write(f'Error decoding JSON: {err}')
+                writer.flush()
+            else:
+                self.fetch(writer, options)
 
-            # Insert data into Django models
-            for event in data["_embedded"]["events"]:
-                show_date = event['dates']['start']['localDate']
-                event_time = event['dates']['start'].get('localTime', '00:00:00')
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stats = {'events': writer.events, 'shows_created': writer.shows_created, 'unchanged': writer.unchanged}
+        self.stdout.write(
+            f'Saved {writer.events} events ({writer.shows_created} new shows, {writer.unchanged} unchanged) '
+            f'in {elapsed:.1f}s, {writer.events / elapsed:.1f} events/sec'
+        )
 
-                # Insert Venue data
-                venues = event["_embedded"]["venues"]
-                for venue in venues:
-                    venue_name = venue['name']
-                    venue_city = venue['city']['name']
-                    venue_state = venue['state']['name']
+    def fetch(self, writer, options):
+        """ Fetch every (state, month) shard from the API and save the events.
+
+        Shards may be fetched in other processes, but all saving happens here, in this process. """
+        classification = 'music'
+        settings = {
+            'url': options['url'],
+            'name': classification,
+            'params': {
+                'classificationName': classification,
+                'apikey': os.environ.get('TICKETMASTER'),
+                'size': options['page_size'],
+            },
+            'workers': options['workers'],
+            'max_pages': options['max_pages'],
+            'rate': options['rate'],
+            'max_retries': options['max_retries'],
+            'record': options['record'],
+        }
 
-                    # Check if Venue already exists
-                    venue_instance, created = Venue.objects.get_or_create(name=venue_name, city=venue_city, state=venue_state)
+        # One watermark per state, so states can be synced on different schedules
+        deltas = {}
+        start = options['start']
+        if options['delta']:
+            deltas = {state: DeltaSync(f'{classification}:{state}') for state in options['states']}
+            start = {state: delta.window_start(options['start']) for state, delta in deltas.items()}
 
-                # Insert Artist data
-                if 'attractions' in event["_embedded"] and event['_embedded']['attractions'][0].get('name'):
-                    artist_name = event['_embedded']['attractions'][0]['name']
+        shards = make_shards(options['states'], start, options['end'])
+        client = TicketmasterClient(rate=options['rate'], pool_size=options['workers'],
+                                    max_retries=options['max_retries'])
 
-                    # Check if Artist already exists
-                    artist_instance, created = Artist.objects.get_or_create(name=artist_name)
+        failed_states = set()
+        retries = 0
+        for result in run_shards(shards, settings, processes=options['processes'], client=client):
+            state = result['shard']['state']
+            retries += result['retries']
+            if result['error']:
+                failed_states.add(state)
+                self.stderr.write(f"Error fetching {result['shard']['key']}: {result['error']}")
 
-                # Insert Show data
-                show_date_time = show_date + ' ' + event_time
+            records = result['records']
+            if state in deltas:
+                records = deltas[state].changed(records)
+            # Save whatever was fetched before an error, too
+            writer.add(records)
 
-                # Check if Show already exists < I assume this is where the constraint is stalling the build
-                show_instance, created = Show.objects.get_or_create(show_date=show_date_time, artist_id=artist_instance.pk, venue_id=venue_instance.pk)
+        writer.flush()
+        client.close()
 
-            print("Data successfully saved to Django models")
+        # Don't move a state's watermark past events that a failed shard never saw
+        for state, delta in deltas.items():
+            if state not in failed_states:
+                delta.save()
 
-        except requests.exceptions.RequestException as err:
-            print(f"Error during API call: {err}")
-        except ValueError as err:
-            print(f"Error decoding JSON: {err}")
\ No newline at end of file
+        if options['record']:
+            self.stdout.write(f"Recorded API pages to {options['record']}")
+        if retries:
+            self.stdout.write(f'Retried {retries} failed requests')
+        if deltas:
+            skipped = sum(delta.skipped for delta in deltas.values())
+            self.stdout.write(f'Delta sync skipped {skipped} unchanged events')
@@ -0,0 +1,93 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+import io
+import resource
+import threading
+import time
+
+from lmn.ingest.fake_api import FakeCatalog, FakeDiscoveryServer
+from lmn.models import Show
+
+from . import ticketmaster
+
+
+class Command(BaseCommand):
+    help = 'Run the ticketmaster import against a local fake Discovery API and report its throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=5000, help='Number of events in the fake catalog')
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds the fake API waits before answering')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail with 429/500')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the fake catalog')
+        parser.add_argument('--keep', action='store_true', help='Keep the imported data instead of rolling it back')
+        parser.add_argument('import_args', nargs='*', metavar='IMPORT_ARG',
+                            help='Extra options for the ticketmaster command, after --, e.g. -- --workers 8')
+
+    def handle(self, *args, **options):
+        catalog = FakeCatalog(size=options['events'], seed=options['seed'])
+
+        with FakeDiscoveryServer(catalog, latency=options['latency'], error_rate=options['error_rate']) as server:
+            self.stdout.write(f'Fake Discovery API with {options["events"]} events at {server.url}')
+
+            output = io.StringIO()
+            with transaction.atomic():
+                shows_before = Show.objects.count()
+                started = time.monotonic()
+                command = ticketmaster.Command()
+                with QueryCounter() as queries:
+                    call_command(command, *options['import_args'], url=server.url, stdout=output, stderr=output)
+                elapsed = time.monotonic() - started
+                shows_created = Show.objects.count() - shows_before
+
+                if not options['keep']:
+                    transaction.set_rollback(True)
+
+        self.stdout.write(output.getvalue().strip())
+
+        # Events the importer saw, so skipped events still count
+        events = command.stats['events']
+        # ru_maxrss is in kilobytes on Linux. For children it's the largest worker process that has exited,
+        # and the process pool has shut down its workers by now.
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        worker_rss_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+        self.stdout.write(f'Requests: {server.requests} ({server.errors} failed)')
+        self.stdout.write(f'Events: {events}, new shows: {shows_created}, time: {elapsed:.2f}s')
+        self.stdout.write(f'Events/sec: {events / max(elapsed, 1e-6):.1f}')
+        self.stdout.write(f'DB queries: {queries.count}, per event: {queries.count / max(events, 1):.3f}')
+        self.stdout.write(f'Peak RSS: {peak_rss_mb:.1f} MB, largest worker process: {worker_rss_mb:.1f} MB')
+
+
+class QueryCounter:
+    """ Counts the queries run on every database connection while it's in use, including connections
+    opened meanwhile by other threads, like a write queue's writer thread. """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+        self.watched = []
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def watch(self, sender, connection, **kwargs):
+        # connection_created is sent again when a watched connection reconnects
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+            self.watched.append(connection)
+
+    def __enter__(self):
+        for connection in connections.all():
+            self.watch(None, connection)
+        connection_created.connect(self.watch)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self.watch)
+        for connection in self.watched:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
@@ -0,0 +1,22 @@
+# Generated by Django 3.1.2 on 2026-10-17 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0005_auto_20231210_1549'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query_key', models.CharField(max_length=200, unique=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_changed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
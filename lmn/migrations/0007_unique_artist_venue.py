@@ -0,0 +1,71 @@
+# Generated by Django 3.1.2 on 2026-10-17 16:17
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def move_shows(Show, Note, duplicate_shows, field, keeper_pk):
+    """ Point shows at the kept artist or venue. A show that would then clash with an
+    existing show is deleted, after moving its notes to the show it clashes with. A user
+    who already has a note for that show keeps it, and their note for the deleted show goes too. """
+    for show in duplicate_shows:
+        clash = Show.objects.filter(
+            show_date=show.show_date,
+            artist_id=keeper_pk if field == 'artist' else show.artist_id,
+            venue_id=keeper_pk if field == 'venue' else show.venue_id,
+        ).first()
+        if clash:
+            users = Note.objects.filter(show=clash).values('user')
+            Note.objects.filter(show=show).exclude(user__in=users).update(show=clash)
+            # The notes left are deleted with the show. Historical models don't have Note.delete to remove
+            # their photos, so they're removed here, as the merge_duplicates command does when it merges shows.
+            for photo in Note.objects.filter(show=show).exclude(photo='').exclude(photo=None).values_list('photo', flat=True):
+                if default_storage.exists(photo):
+                    default_storage.delete(photo)
+            show.delete()
+        else:
+            Show.objects.filter(pk=show.pk).update(**{f'{field}_id': keeper_pk})
+
+
+def merge_duplicates(apps, schema_editor):
+    """ Imports used to create a new Artist and Venue for every event. Keep the oldest of each
+    duplicate, so the unique constraints below can be added. """
+    Artist = apps.get_model('lmn', 'Artist')
+    Venue = apps.get_model('lmn', 'Venue')
+    Show = apps.get_model('lmn', 'Show')
+    Note = apps.get_model('lmn', 'Note')
+
+    duplicates = (Artist.objects.values('name').annotate(count=models.Count('pk'), keep=models.Min('pk'))
+                  .filter(count__gt=1))
+    for duplicate in duplicates:
+        for artist in Artist.objects.filter(name=duplicate['name']).exclude(pk=duplicate['keep']):
+            move_shows(Show, Note, Show.objects.filter(artist=artist), 'artist', duplicate['keep'])
+            artist.delete()
+
+    duplicates = (Venue.objects.values('name', 'city', 'state').annotate(count=models.Count('pk'), keep=models.Min('pk'))
+                  .filter(count__gt=1))
+    for duplicate in duplicates:
+        venues = Venue.objects.filter(name=duplicate['name'], city=duplicate['city'], state=duplicate['state'])
+        for venue in venues.exclude(pk=duplicate['keep']):
+            move_shows(Show, Note, Show.objects.filter(venue=venue), 'venue', duplicate['keep'])
+            venue.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0006_syncstate'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='artist',
+            name='name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='venue',
+            unique_together={('name', 'city', 'state')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.2 on 2026-10-17 16:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0007_unique_artist_venue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShowSource',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=100, unique=True)),
+                ('content_hash', models.CharField(max_length=32)),
+                ('show', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sources', to='lmn.show')),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.2 on 2026-10-17 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0008_showsource'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['show', '-posted_date'], name='note_show_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', '-posted_date'], name='note_user_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['-posted_date'], name='note_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='show',
+            index=models.Index(fields=['artist', '-show_date'], name='show_artist_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='show',
+            index=models.Index(fields=['venue', '-show_date'], name='show_venue_date_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.1.2 on 2026-10-17 16:19
+
+from django.db import migrations, models
+
+AGGREGATE_FIELDS = ['note_count', 'rating_sum'] + [f'rating_{stars}_count' for stars in range(1, 6)]
+
+
+def count_existing_notes(apps, schema_editor):
+    """ Save the totals of the notes saved so far. Every show starts at 0, so only shows with notes change. """
+    Show = apps.get_model('lmn', 'Show')
+    Note = apps.get_model('lmn', 'Note')
+    totals = Note.objects.values('show').annotate(
+        note_count=models.Count('pk'),
+        rating_sum=models.Sum('rating'),
+        **{f'rating_{stars}_count': models.Count('pk', filter=models.Q(rating=stars)) for stars in range(1, 6)},
+    ).order_by()
+    shows = [Show(pk=row['show'], **{field: row[field] or 0 for field in AGGREGATE_FIELDS})
+             for row in totals.iterator()]
+    Show.objects.bulk_update(shows, AGGREGATE_FIELDS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0009_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='show',
+            name='note_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='show',
+            name='rating_1_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='show',
+            name='rating_2_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='show',
+            name='rating_3_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='show',
+            name='rating_4_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='show',
+            name='rating_5_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='show',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='show',
+            index=models.Index(fields=['-note_count', '-show_date'], name='show_popular_idx'),
+        ),
+        migrations.RunPython(count_existing_notes, migrations.RunPython.noop),
+    ]
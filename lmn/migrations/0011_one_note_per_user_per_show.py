@@ -0,0 +1,51 @@
+# Generated by Django 3.1.2 on 2026-10-17 16:21
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+AGGREGATE_FIELDS = ['note_count', 'rating_sum'] + [f'rating_{stars}_count' for stars in range(1, 6)]
+
+
+def keep_one_note_per_show(apps, schema_editor):
+    """ Users could write more than one note for a show before this. Keep each user's latest note for
+    a show, so the constraint below can be added, and recount the shows that lose notes. """
+    Show = apps.get_model('lmn', 'Show')
+    Note = apps.get_model('lmn', 'Note')
+
+    duplicates = (Note.objects.values('user', 'show').annotate(count=models.Count('pk'), keep=models.Max('pk'))
+                  .filter(count__gt=1).order_by())
+    shows = set()
+    for duplicate in duplicates:
+        extra = Note.objects.filter(user=duplicate['user'], show=duplicate['show']).exclude(pk=duplicate['keep'])
+        # Historical models don't have Note.delete to remove their photos
+        for photo in extra.exclude(photo='').exclude(photo=None).values_list('photo', flat=True):
+            if default_storage.exists(photo):
+                default_storage.delete(photo)
+        extra.delete()
+        shows.add(duplicate['show'])
+
+    totals = {
+        row['show']: row
+        for row in Note.objects.filter(show__in=shows).values('show').annotate(
+            note_count=models.Count('pk'),
+            rating_sum=models.Sum('rating'),
+            **{f'rating_{stars}_count': models.Count('pk', filter=models.Q(rating=stars)) for stars in range(1, 6)},
+        ).order_by()
+    }
+    Show.objects.bulk_update([Show(pk=pk, **{field: totals[pk][field] or 0 for field in AGGREGATE_FIELDS})
+                              for pk in shows], AGGREGATE_FIELDS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0010_show_note_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_one_note_per_show, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='note',
+            constraint=models.UniqueConstraint(fields=('user', 'show'), name='one_note_per_user_per_show'),
+        ),
+    ]
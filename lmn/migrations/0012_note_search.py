@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# The SQL is copied here, rather than imported from lmn.search, so this migration keeps doing what it did
+# when it was written whatever later happens to that module.
+SEARCH_TABLE = 'lmn_note_search'
+
+SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON lmn_note BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON lmn_note BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title, text ON lmn_note BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO {SEARCH_TABLE}(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END""",
+]
+
+
+def add_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # External content table: the text stays in lmn_note, the FTS table only holds the index
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            f"title, text, content='lmn_note', content_rowid='id', tokenize='porter unicode61')"
+        )
+        for sql in SQLITE_TRIGGERS:
+            schema_editor.execute(sql)
+        schema_editor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+    elif vendor == 'postgresql':
+        # Generated columns need PostgreSQL 12 or newer
+        schema_editor.execute(
+            "ALTER TABLE lmn_note ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(text, '')), 'B')) STORED"
+        )
+        schema_editor.execute(f'CREATE INDEX {SEARCH_TABLE}_idx ON lmn_note USING GIN (search_vector)')
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for action in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{action}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_TABLE}_idx')
+        schema_editor.execute('ALTER TABLE lmn_note DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0011_one_note_per_user_per_show'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
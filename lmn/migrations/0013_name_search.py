@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# The SQL is copied here, rather than imported from lmn.search, so this migration keeps doing what it did
+# when it was written whatever later happens to that module.
+NAME_SEARCH_TABLES = {
+    'lmn_artist': 'lmn_artist_name_search',
+    'lmn_venue': 'lmn_venue_name_search',
+}
+
+
+def sqlite_triggers(table, search_table):
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {search_table}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {search_table}(rowid, name) VALUES (new.id, new.name);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {search_table}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {search_table}({search_table}, rowid, name) VALUES ('delete', old.id, old.name);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {search_table}_update AFTER UPDATE OF name ON {table} BEGIN
+            INSERT INTO {search_table}({search_table}, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO {search_table}(rowid, name) VALUES (new.id, new.name);
+        END""",
+    ]
+
+
+def add_name_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, search_table in NAME_SEARCH_TABLES.items():
+        if vendor == 'sqlite':
+            # The trigram tokenizer needs SQLite 3.34 or newer
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5("
+                f"name, content='{table}', content_rowid='id', tokenize='trigram')"
+            )
+            schema_editor.execute(f"INSERT INTO {search_table}({search_table}) VALUES ('rebuild')")
+            for sql in sqlite_triggers(table, search_table):
+                schema_editor.execute(sql)
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'CREATE INDEX {search_table}_idx ON {table} USING GIN (name gin_trgm_ops)')
+
+
+def remove_name_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, search_table in NAME_SEARCH_TABLES.items():
+        if vendor == 'sqlite':
+            for action in ('insert', 'delete', 'update'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {search_table}_{action}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {search_table}')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {search_table}_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0012_note_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_name_search_index, remove_name_search_index),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.1.2 on 2026-10-17 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0013_name_search'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='note',
+            name='note_show_posted_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='note',
+            name='note_user_posted_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='note',
+            name='note_posted_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='show',
+            name='show_artist_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='show',
+            name='show_venue_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='show',
+            name='show_popular_idx',
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['show', '-posted_date', '-id'], name='note_show_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', '-posted_date', '-id'], name='note_user_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['-posted_date', '-id'], name='note_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='show',
+            index=models.Index(fields=['-show_date', '-id'], name='show_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='show',
+            index=models.Index(fields=['artist', '-show_date', '-id'], name='show_artist_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='show',
+            index=models.Index(fields=['venue', '-show_date', '-id'], name='show_venue_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='show',
+            index=models.Index(fields=['-note_count', '-show_date', '-id'], name='show_popular_idx'),
+        ),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 3.1.2 on 2026-10-17 17:29
+
+import csv
+import os
+import unicodedata
+
+from django.db import migrations, models
+
+# The geohash and city lookup are copied from lmn.geo, and the trigger SQL from 0013_name_search,
+# so this migration keeps doing what it did when it was written whatever later happens to those.
+GEOHASH_PRECISION = 9
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+CENTROIDS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'city_centroids.csv')
+
+VENUE_NAME_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS lmn_venue_name_search_insert AFTER INSERT ON lmn_venue BEGIN
+        INSERT INTO lmn_venue_name_search(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lmn_venue_name_search_delete AFTER DELETE ON lmn_venue BEGIN
+        INSERT INTO lmn_venue_name_search(lmn_venue_name_search, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lmn_venue_name_search_update AFTER UPDATE OF name ON lmn_venue BEGIN
+        INSERT INTO lmn_venue_name_search(lmn_venue_name_search, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO lmn_venue_name_search(rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+
+def encode_geohash(latitude, longitude):
+    south, north = -90.0, 90.0
+    west, east = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # bits alternate longitude, latitude, starting with longitude
+    while len(chars) < GEOHASH_PRECISION:
+        if even:
+            middle = (west + east) / 2
+            value = value * 2 + (longitude >= middle)
+            if longitude >= middle:
+                west = middle
+            else:
+                east = middle
+        else:
+            middle = (south + north) / 2
+            value = value * 2 + (latitude >= middle)
+            if latitude >= middle:
+                south = middle
+            else:
+                north = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def city_key(city, state):
+    decomposed = unicodedata.normalize('NFKD', f'{city} {state}'.casefold())
+    letters = ''.join(char if char.isalnum() else ' ' for char in decomposed if not unicodedata.combining(char))
+    return tuple('st' if word == 'saint' else word for word in letters.split())
+
+
+def locate_venues(apps, schema_editor):
+    """ Put the venues saved so far in the middle of their cities. """
+    Venue = apps.get_model('lmn', 'Venue')
+    with open(CENTROIDS_FILE, newline='', encoding='utf-8') as file:
+        centroids = {
+            city_key(row['city'], row['state']): (float(row['latitude']), float(row['longitude']))
+            for row in csv.DictReader(file)
+        }
+    venues = []
+    for venue in Venue.objects.only('city', 'state').iterator():
+        centroid = centroids.get(city_key(venue.city, venue.state))
+        if centroid:
+            venue.latitude, venue.longitude = centroid
+            venue.geohash = encode_geohash(*centroid)
+            venues.append(venue)
+    Venue.objects.bulk_update(venues, ['latitude', 'longitude', 'geohash'], batch_size=500)
+
+
+def recreate_name_search_triggers(apps, schema_editor):
+    # Adding or removing columns rebuilds lmn_venue on SQLite, dropping the triggers on it
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in VENUE_NAME_TRIGGERS:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0014_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        # Runs last when migrating backwards, after removing the columns
+        migrations.RunPython(migrations.RunPython.noop, recreate_name_search_triggers),
+        migrations.AddField(
+            model_name='venue',
+            name='geohash',
+            field=models.CharField(blank=True, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='venue',
+            index=models.Index(fields=['geohash', 'latitude', 'longitude'], name='venue_geohash_idx'),
+        ),
+        migrations.RunPython(recreate_name_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(locate_venues, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,185 @@
+# Generated by Django 3.1.2 on 2026-10-17 17:33
+
+import unicodedata
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+# The keys and merging are copied from lmn.identity, and the trigger SQL from 0013_name_search,
+# so this migration keeps doing what it did when it was written whatever later happens to those.
+AGGREGATE_FIELDS = ['note_count', 'rating_sum'] + [f'rating_{stars}_count' for stars in range(1, 6)]
+
+
+def name_triggers(table, search_table):
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {search_table}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {search_table}(rowid, name) VALUES (new.id, new.name);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {search_table}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {search_table}({search_table}, rowid, name) VALUES ('delete', old.id, old.name);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {search_table}_update AFTER UPDATE OF name ON {table} BEGIN
+            INSERT INTO {search_table}({search_table}, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO {search_table}(rowid, name) VALUES (new.id, new.name);
+        END""",
+    ]
+
+
+def normalize(name):
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    letters = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(''.join(char if char.isalnum() else ' ' for char in letters).split())
+
+
+def artist_key(row):
+    return normalize(row['name']) or row['name'].strip()
+
+
+def venue_key(row):
+    return '|'.join([artist_key(row), normalize(row['city']), normalize(row['state'])])
+
+
+def find_duplicates(rows, keys):
+    """ Map of pk -> pk of the oldest row with the same key or Ticketmaster id. """
+    parent = {}
+
+    def root(pk):
+        while parent.get(pk, pk) != pk:
+            pk = parent[pk]
+        return pk
+
+    def join(pk, other):
+        pk, other = root(pk), root(other)
+        if pk != other:
+            parent[max(pk, other)] = min(pk, other)
+
+    first_with_key = {}
+    first_with_id = {}
+    for row in rows:
+        pk = row['pk']
+        join(pk, first_with_key.setdefault(keys[pk], pk))
+        if row['ticketmaster_id']:
+            join(pk, first_with_id.setdefault(row['ticketmaster_id'], pk))
+    return {pk: root(pk) for pk in parent if root(pk) != pk}
+
+
+def merge_show(Show, Note, ShowSource, show, keep):
+    """ Move a show's notes and sources to the same show under the kept artist or venue. A user who
+    already has a note there keeps it, and their note for the merged show goes with the show. """
+    users = Note.objects.filter(show=keep).values('user')
+    Note.objects.filter(show=show).exclude(user__in=users).update(show=keep)
+    ShowSource.objects.filter(show=show).update(show=keep)
+    # Historical models don't have Note.delete to remove the photos of the notes left
+    for photo in Note.objects.filter(show=show).exclude(photo='').exclude(photo=None).values_list('photo', flat=True):
+        if default_storage.exists(photo):
+            default_storage.delete(photo)
+    Show.objects.filter(pk=show).delete()
+
+
+def recount(Show, Note, pks):
+    """ Save the note totals of the shows in pks. """
+    totals = {
+        row['show']: row
+        for row in Note.objects.filter(show__in=pks).values('show').annotate(
+            note_count=models.Count('pk'),
+            rating_sum=models.Sum('rating'),
+            **{f'rating_{stars}_count': models.Count('pk', filter=models.Q(rating=stars)) for stars in range(1, 6)},
+        ).order_by()
+    }
+    shows = [Show(pk=pk, **{field: totals.get(pk, {}).get(field) or 0 for field in AGGREGATE_FIELDS}) for pk in pks]
+    Show.objects.bulk_update(shows, AGGREGATE_FIELDS, batch_size=1000)
+
+
+def merge_duplicates(apps, schema_editor):
+    """ Set the canonical keys, merging the artists and venues that turn out to have the same one
+    into the oldest, and moving their shows over. """
+    Show = apps.get_model('lmn', 'Show')
+    Note = apps.get_model('lmn', 'Note')
+    ShowSource = apps.get_model('lmn', 'ShowSource')
+    merged_shows = set()
+
+    for name, key_of, fields, other in [('Artist', artist_key, ['name'], 'venue'),
+                                        ('Venue', venue_key, ['name', 'city', 'state'], 'artist')]:
+        model = apps.get_model('lmn', name)
+        field = name.lower()
+        rows = list(model.objects.order_by('pk').values('pk', 'canonical_key', 'ticketmaster_id', *fields))
+        keys = {row['pk']: key_of(row) for row in rows}
+        duplicates = find_duplicates(rows, keys)
+
+        for duplicate, keep in duplicates.items():
+            kept_shows = {
+                (show_date, other_pk): pk
+                for show_date, other_pk, pk in Show.objects.filter(**{field: keep}).values_list(
+                    'show_date', f'{other}_id', 'pk')
+            }
+            for pk, show_date, other_pk in Show.objects.filter(**{field: duplicate}).values_list(
+                    'pk', 'show_date', f'{other}_id'):
+                same_show = kept_shows.get((show_date, other_pk))
+                if same_show:
+                    merge_show(Show, Note, ShowSource, pk, same_show)
+                    merged_shows.add(same_show)
+                else:
+                    Show.objects.filter(pk=pk).update(**{field: keep})
+            model.objects.filter(pk=duplicate).delete()
+
+        # Now the duplicates are gone, the keys left are all different
+        stale = [model(pk=row['pk'], canonical_key=keys[row['pk']])
+                 for row in rows if row['pk'] not in duplicates and row['canonical_key'] != keys[row['pk']]]
+        model.objects.bulk_update(stale, ['canonical_key'], batch_size=1000)
+
+    recount(Show, Note, sorted(merged_shows))
+
+
+def recreate_name_search_triggers(apps, schema_editor):
+    # Adding or removing columns rebuilds lmn_artist and lmn_venue on SQLite, dropping the triggers on them
+    if schema_editor.connection.vendor == 'sqlite':
+        for table in ['lmn_artist', 'lmn_venue']:
+            for sql in name_triggers(table, f'{table}_name_search'):
+                schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0015_venue_location'),
+    ]
+
+    operations = [
+        # Runs last when migrating backwards, after removing the columns
+        migrations.RunPython(migrations.RunPython.noop, recreate_name_search_triggers),
+        # The keys are only made unique once the duplicates are merged
+        migrations.AddField(
+            model_name='artist',
+            name='canonical_key',
+            field=models.CharField(editable=False, max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='ticketmaster_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='canonical_key',
+            field=models.CharField(editable=False, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='ticketmaster_id',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, null=True),
+        ),
+        # So the name search indexes forget the merged rows
+        migrations.RunPython(recreate_name_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='artist',
+            name='canonical_key',
+            field=models.CharField(editable=False, max_length=200, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='venue',
+            name='canonical_key',
+            field=models.CharField(editable=False, max_length=500, null=True, unique=True),
+        ),
+        migrations.RunPython(recreate_name_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.1.2 on 2026-10-17 17:43
+
+from django.db import migrations, models
+
+# Copied from 0012_note_search, so this migration doesn't depend on lmn.search staying the same
+SQLITE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS lmn_note_search_insert AFTER INSERT ON lmn_note BEGIN
+        INSERT INTO lmn_note_search(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lmn_note_search_delete AFTER DELETE ON lmn_note BEGIN
+        INSERT INTO lmn_note_search(lmn_note_search, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS lmn_note_search_update AFTER UPDATE OF title, text ON lmn_note BEGIN
+        INSERT INTO lmn_note_search(lmn_note_search, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO lmn_note_search(rowid, title, text) VALUES (new.id, new.title, new.text);
+    END""",
+]
+
+
+def recreate_search_triggers(apps, schema_editor):
+    # Adding or removing a column rebuilds lmn_note on SQLite, dropping the note search triggers on it
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_TRIGGERS:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lmn', '0016_canonical_identity'),
+    ]
+
+    operations = [
+        # Runs last when migrating backwards, after removing the columns
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        # Existing rows get the time of the migration
+        migrations.AddField(
+            model_name='note',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='show',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
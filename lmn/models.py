@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, pre_delete
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.utils import timezone
@@ -7,6 +9,9 @@ from django.core.exceptions import ValidationError
 # Django's storage manager library that helps with retrieving, storing, deleting related media files. This helps with  the details on where to store it
 from django.core.files.storage import default_storage
 
+from .geo import locate
+from .identity import canonical_artist_key, canonical_venue_key
+
 # Remember that every model gets a primary key field by default.
 
 # The User model is provided by Django. The email field is not unique by
@@ -21,11 +26,32 @@ User._meta.get_field('first_name')._blank = False
 
 class Artist(models.Model):
     """ Represents a musician or a band - a music artist """
-    name = models.CharField(max_length=200, blank=False)
+    name = models.CharField(max_length=200, blank=False, unique=True)
+    # The name normalized, so 'The Weeknd' and 'the weeknd ' are one artist, see lmn/identity.py.
+    # Set by save(); the merge_duplicates command fills it in for rows made other ways.
+    canonical_key = models.CharField(max_length=200, unique=True, null=True, editable=False)
+    # Ticketmaster's attraction id, for artists that were imported
+    ticketmaster_id = models.CharField(max_length=100, null=True, blank=True, db_index=True, editable=False)
 
     def __str__(self):
         return f'Name: {self.name}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        artist = super().from_db(db, field_names, values)
+        artist._saved_name = artist.__dict__.get('name')
+        return artist
+
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude)
+        if not exclude or 'name' not in exclude:
+            check_canonical_key(self, canonical_artist_key(self.name), 'There is already an artist called {}.')
+
+    def save(self, *args, **kwargs):
+        self.canonical_key = canonical_artist_key(self.name)
+        super().save(*args, **kwargs)
+        touch_renamed(self, Show.objects.filter(artist=self))
+
 
 class Venue(models.Model):
     """ Represents a place that Shows take place at. """
@@ -33,22 +59,127 @@ class Venue(models.Model):
     city = models.CharField(max_length=200, blank=False)
     state = models.CharField(max_length=2, blank=False)
 
+    # Where the venue is, from the importer or else the middle of its city; None if that's unknown too.
+    # The geohash of the point finds nearby venues with an index range scan, see lmn/geo.py
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, null=True, blank=True)
+
+    # The name, city and state normalized, like Artist.canonical_key
+    canonical_key = models.CharField(max_length=500, unique=True, null=True, editable=False)
+    # Ticketmaster's venue id, for venues that were imported
+    ticketmaster_id = models.CharField(max_length=100, null=True, blank=True, db_index=True, editable=False)
+
+    class Meta:
+        # One venue per name and location, so imports can upsert venues safely
+        unique_together = ('name', 'city', 'state')
+        indexes = [
+            # Covers the nearby venue search, which reads geohash ranges and checks the coordinates
+            models.Index(fields=['geohash', 'latitude', 'longitude'], name='venue_geohash_idx'),
+        ]
+
     def __str__(self):
         return f'Name: {self.name} Location: {self.city}, {self.state}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        venue = super().from_db(db, field_names, values)
+        venue._saved_name = venue.__dict__.get('name')
+        return venue
+
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude)
+        if not exclude or not {'name', 'city', 'state'} & set(exclude):
+            check_canonical_key(self, canonical_venue_key(self.name, self.city, self.state),
+                                'There is already a venue called {} in this city.')
+
+    def save(self, *args, **kwargs):
+        self.canonical_key = canonical_venue_key(self.name, self.city, self.state)
+        self.latitude, self.longitude, self.geohash = locate(self.latitude, self.longitude, self.city, self.state)
+        super().save(*args, **kwargs)
+        touch_renamed(self, Show.objects.filter(venue=self))
+
+
+def check_canonical_key(instance, key, message):
+    """ Raise a ValidationError on the name field if another row already has this canonical key.
+    canonical_key isn't editable, so model forms leave it out of their own unique checks, and a name
+    that only differs in case or spacing would otherwise get as far as the database's unique index. """
+    other = type(instance).objects.filter(canonical_key=key).exclude(pk=instance.pk).first()
+    if other:
+        raise ValidationError({'name': ValidationError(message.format(other.name), code='unique')})
+
+
+def touch_renamed(instance, shows):
+    """ After an artist or venue loaded from the database is saved with a new name, mark its shows as
+    updated, so the cached cards with the old name aren't used again, see lmn/cards.py. """
+    saved_name = getattr(instance, '_saved_name', None)
+    if saved_name is not None and saved_name != instance.name:
+        shows.update(updated_at=timezone.now())
+    instance._saved_name = instance.name
+
 
 class Show(models.Model):
     """ One Artist playing at one Venue at a particular date and time. """
     show_date = models.DateTimeField(blank=False)
     artist = models.ForeignKey(Artist, on_delete=models.CASCADE)
     venue = models.ForeignKey(Venue, on_delete=models.CASCADE)
+
+    # Totals of this show's notes, kept up to date by Note.save and note_deleted so pages
+    # don't need to count notes. The rebuild_show_aggregates command recalculates them.
+    note_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    # How many notes gave each star rating
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+
+    # When this show, its note totals, or its artist's or venue's name last changed. Cached cards
+    # showing the show are kept under this, so a change makes new ones, see lmn/cards.py.
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         # This is a constraint that prevents duplicate shows
         unique_together = ('show_date', 'artist', 'venue')
+        # Each index ends with id, so keyset pagination can seek on (..., show_date, id) and read in index order
+        indexes = [
+            # All shows, an artist's shows and a venue's shows, most recent first
+            models.Index(fields=['-show_date', '-id'], name='show_date_idx'),
+            models.Index(fields=['artist', '-show_date', '-id'], name='show_artist_date_idx'),
+            models.Index(fields=['venue', '-show_date', '-id'], name='show_venue_date_idx'),
+            # Shows with the most notes first
+            models.Index(fields=['-note_count', '-show_date', '-id'], name='show_popular_idx'),
+        ]
+
+    @property
+    def average_rating(self):
+        """ The average star rating of this show's notes, or None if it has no notes. """
+        if not self.note_count:
+            return None
+        return self.rating_sum / self.note_count
+
+    @property
+    def rating_histogram(self):
+        """ List of (stars, number of notes) for 1 to 5 stars. """
+        return [(stars, getattr(self, f'rating_{stars}_count')) for stars in range(1, 6)]
+
     def __str__(self):
         return f'Artist: {self.artist} At: {self.venue} On: {self.show_date}'
 
 
+class ShowSource(models.Model):
+    """ The Ticketmaster event a Show was imported from, and a hash of what the event said last time.
+
+    Imports compare hashes to skip events that haven't changed since the last sync. """
+    event_id = models.CharField(max_length=100, unique=True)
+    content_hash = models.CharField(max_length=32)
+    show = models.ForeignKey(Show, on_delete=models.CASCADE, related_name='sources')
+
+    def __str__(self):
+        return f'Event: {self.event_id} Show: {self.show_id} Hash: {self.content_hash}'
+
+
 class Note(models.Model):
     """ One User's opinion of one Show. """
 
@@ -73,17 +204,71 @@ class Note(models.Model):
     # Image upload is optional and can be null
     photo = models.ImageField(upload_to='user_images/', blank=True, null=True)
 
+    # When this note was last edited, the version of its cached cards
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Each user can write one note per show. Checked by the database so two notes
+            # submitted at the same time can't both get in.
+            models.UniqueConstraint(fields=['user', 'show'], name='one_note_per_user_per_show'),
+        ]
+        indexes = [
+            # Notes for a show, notes by a user, and the latest notes, all most recent first.
+            # Ending with id lets keyset pagination seek on (posted_date, id).
+            models.Index(fields=['show', '-posted_date', '-id'], name='note_show_posted_idx'),
+            models.Index(fields=['user', '-posted_date', '-id'], name='note_user_posted_idx'),
+            models.Index(fields=['-posted_date', '-id'], name='note_posted_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        note = super().from_db(db, field_names, values)
+        # Remember what was counted in the show's totals, to adjust them if the note changes.
+        # If .only() or .defer() left either out, save() reads them when it needs them.
+        if 'show_id' in note.__dict__ and 'rating' in note.__dict__:
+            note._counted = (note.show_id, note.rating)
+        return note
+
     def save(self, *args, **kwargs):
-        """Create only one note for each user and show, unless updating an existing note."""
-        if not self.pk: # if the note is new, create a new note 
-            # check if the note already exists for the user and show
-            if Note.objects.filter(user=self.user, show=self.show).exists(): 
-                raise ValidationError('You can only create one note per show')
-        
+        """Create only one note for each user and show, unless updating an existing note.
+
+        The one_note_per_user_per_show constraint catches duplicates, so there's no need to look for
+        an existing note first. Set note.show to a Show you already have, to save a query here."""
+
         # Check if the show date is in the future
         if self.show.show_date > timezone.now():
             raise ValidationError("Cannot add notes to future shows.")
-        super().save(*args, **kwargs)
+
+        try:
+            with transaction.atomic():
+                counted = getattr(self, '_counted', None)
+                if counted is None and not self._state.adding:
+                    counted = Note.objects.filter(pk=self.pk).values_list('show_id', 'rating').first()
+                super().save(*args, **kwargs)
+                # Move this note's rating from the totals it was counted in, to the show it's for now
+                if counted != (self.show_id, self.rating):
+                    if counted and counted[0]:
+                        Note.count_in_show(*counted, -1)
+                    Note.count_in_show(self.show_id, self.rating, 1)
+        except IntegrityError:
+            # Only a clash with the user's other note for this show means it's a duplicate; other errors,
+            # like a missing title, aren't the user's to fix, so they're raised as they are
+            if not Note.objects.filter(user_id=self.user_id, show_id=self.show_id).exclude(pk=self.pk).exists():
+                raise
+            raise ValidationError('You can only create one note per show', code='duplicate_note')
+        self._counted = (self.show_id, self.rating)
+
+    @staticmethod
+    def count_in_show(show_id, rating, change):
+        """ Add (change=1) or remove (change=-1) one note with this rating from a show's totals,
+        with a single UPDATE so notes saved at the same time don't overwrite each other's counts. """
+        Show.objects.filter(pk=show_id).update(**{
+            'updated_at': timezone.now(),
+            'note_count': F('note_count') + change,
+            'rating_sum': F('rating_sum') + rating * change,
+            f'rating_{rating}_count': F(f'rating_{rating}_count') + change,
+        })
 
     def delete_photo(self, photo):
         # check if that photo exists first before deleting it
@@ -99,7 +284,10 @@ class Note(models.Model):
             self.delete_photo(self.photo)
 
         # Calls the delete super class which handles the deletion off the instance from the database. 'args' and 'kwargs' are arguments for the delete super method. 
-        super().delete(*args, **kwargs)
+        # The note_deleted receiver takes it out of the show's totals
+        result = super().delete(*args, **kwargs)
+        self._counted = None
+        return result
 
     def __str__(self):
         # Photo Url will be generated if there is a photo uploaded, else it will display no photo
@@ -110,3 +298,35 @@ class Note(models.Model):
 
         return (f'User: {self.user} Show: {self.show} Note title: {self.title} \ '
                 f'Text: {self.text} Posted on: {self.posted_date} Rating: {self.rating} Photo: {photo_str}')
+
+
+def note_deleting(sender, instance, **kwargs):
+    """ pre_delete receiver: load the show and rating of a note read with .only() or .defer(),
+    while it can still be read, so note_deleted knows what to take out of the totals. """
+    deferred = {'show_id', 'rating'} - instance.__dict__.keys()
+    if deferred:
+        instance.refresh_from_db(fields=[name.replace('_id', '') for name in deferred])
+
+
+def note_deleted(sender, instance, **kwargs):
+    """ post_delete receiver: take a deleted note out of its show's totals. Deletes of a queryset, and
+    deletes that cascade from a user or show, send this for each note too, but don't call Note.delete. """
+    Note.count_in_show(instance.show_id, instance.rating, -1)
+
+
+def connect_signals():
+    pre_delete.connect(note_deleting, sender=Note, dispatch_uid='note_deleting')
+    post_delete.connect(note_deleted, sender=Note, dispatch_uid='note_deleted')
+
+
+class SyncState(models.Model):
+    """ Remembers how far an import query has got, so the next run only fetches what's new or changed. """
+    # Identifies the query, e.g. 'music:MN' for music events in Minnesota
+    query_key = models.CharField(max_length=200, unique=True)
+    # When the last successful run started
+    last_synced_at = models.DateTimeField(blank=True, null=True)
+    # The newest change timestamp seen on any event in the last successful run
+    last_changed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'Query: {self.query_key} Synced at: {self.last_synced_at} Last change: {self.last_changed_at}'
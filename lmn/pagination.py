@@ -0,0 +1,148 @@
+""" Keyset pagination for the list pages.
+
+A page is found by seeking past the sort keys of the last row on the page before, e.g.
+WHERE (name, id) > ('REM', 1) ORDER BY name, id LIMIT 21, instead of with an OFFSET. With an index
+on the sort keys the database starts reading right where the page begins, so the 1000th page
+costs the same as the first.
+
+The position is passed in the query string as an opaque cursor: after=... for the next page,
+before=... for the previous one. Other query parameters, like a search, are kept in the links.
+A page with two lists paginates each with its own prefix, e.g. upcoming_after=... and after=...
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PER_PAGE = 20
+
+# The integers a database column can hold, signed 64 bit. A query with a number outside them fails.
+INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+class KeysetPage(Sequence):
+    """ The rows on one page, plus the query strings for the next and previous pages (None if there isn't one).
+
+    Works like a list of the rows, so templates and tests can loop over it, index it and take its len(). """
+
+    def __init__(self, object_list, next_query=None, previous_query=None, prefix=''):
+        self.object_list = object_list
+        self.next_query = next_query
+        self.previous_query = previous_query
+        self.prefix = prefix
+
+    @property
+    def has_next(self):
+        return self.next_query is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_query is not None
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self)} rows>'
+
+
+def paginate(request, queryset, ordering, per_page=PER_PAGE, prefix=''):
+    """ One page of queryset, sorted by ordering, starting from the after or before cursor in request.GET.
+
+    ordering is a list of field names as order_by takes them, e.g. ['name', 'pk'] or ['-show_date', '-pk'].
+    Together the fields must be unique, e.g. by ending with 'pk', and should match an index so seeking is fast.
+    A cursor that can't be read is ignored, giving the first page. prefix names the cursors,
+    {prefix}after and {prefix}before, so the other lists on the page keep their place. """
+    keys = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    fields = [_field(queryset.model, name) for name, descending in keys]
+    after = _decode(request.GET.get(f'{prefix}after'), fields)
+    before = _decode(request.GET.get(f'{prefix}before'), fields)
+
+    if before is not None:
+        # Read backwards from the cursor, then put the rows back in order
+        reverse_keys = [(name, not descending) for name, descending in keys]
+        rows = list(queryset.filter(_seek(reverse_keys, before))
+                    .order_by(*_order_by(reverse_keys))[:per_page + 1])
+        more_before = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        more_after = True
+    else:
+        if after is not None:
+            queryset = queryset.filter(_seek(keys, after))
+        rows = list(queryset.order_by(*_order_by(keys))[:per_page + 1])
+        more_after = len(rows) > per_page
+        rows = rows[:per_page]
+        more_before = after is not None
+
+    next_query = previous_query = None
+    if rows and more_after:
+        next_query = _query_string(request, prefix, 'after', _encode(rows[-1], keys))
+    if rows and more_before:
+        previous_query = _query_string(request, prefix, 'before', _encode(rows[0], keys))
+    return KeysetPage(rows, next_query, previous_query, prefix)
+
+
+def _seek(keys, values):
+    """ A Q matching the rows that come after values when sorted by keys.
+
+    For (a, b) that's a >= x AND (a > x OR (a = x AND b > y)). The first part, on the leading key alone,
+    lets the database jump into the index instead of checking the OR on every row. """
+    condition = None
+    for (name, descending), value in reversed(list(zip(keys, values))):
+        beyond = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+        if condition is not None:
+            beyond |= Q(**{name: value}) & condition
+        condition = beyond
+    name, descending = keys[0]
+    return Q(**{f'{name}__{"lte" if descending else "gte"}': values[0]}) & condition
+
+
+def _order_by(keys):
+    return [('-' if descending else '') + name for name, descending in keys]
+
+
+def _field(model, name):
+    return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+
+def _encode(row, keys):
+    values = []
+    for name, descending in keys:
+        value = getattr(row, name)
+        # isoformat keeps the microseconds, so the next page starts exactly after this row
+        values.append(value.isoformat() if isinstance(value, (datetime.date, datetime.time)) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _decode(cursor, fields):
+    """ The sort key values in a cursor made by _encode, or None if there isn't a valid one. """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(fields):
+            return None
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None
+    # No row has an id or count too big to store, so a cursor with one wasn't made by _encode
+    if any(isinstance(value, int) and value not in INTEGER_RANGE for value in values):
+        return None
+    return values
+
+
+def _query_string(request, prefix, direction, cursor):
+    """ The request's query string with the cursor for another page in place of the current one. """
+    params = request.GET.copy()
+    params.pop(f'{prefix}after', None)
+    params.pop(f'{prefix}before', None)
+    params[prefix + direction] = cursor
+    return params.urlencode()
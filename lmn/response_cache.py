@@ -0,0 +1,151 @@
+""" A cache of whole pages for visitors who aren't logged in.
+
+Pages like the latest notes or a show's notes only change when a Note, Show, Artist or Venue is saved,
+so a rendered page is kept in the cache named by settings.RESPONSE_CACHE_ALIAS, keyed by its URL and
+query string, and sent again as it is until something on it changes. A hit is two cache reads and no
+database queries.
+
+Each cached page belongs to some groups, like 'notes' for the latest notes or 'show:12' for show 12's
+pages. A group has a version in the cache, the time it last changed, and a page is kept with the
+versions of its groups when it was rendered. post_save and post_delete receivers give the groups a
+saved or deleted row appears in a new version, so the pages in them are rendered again next time,
+whatever their query string, and every other page stays cached.
+
+Bulk writes, like imports, don't send signals; the code making them calls invalidate() or clear().
+Pages also expire after settings.RESPONSE_CACHE_SECONDS in case anything is missed.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .db_router import replicas
+from .models import Artist, Note, Show, Venue
+
+GROUP_KEY = 'lmn-response-group:{}'
+PAGE_KEY = 'lmn-response:{}'
+
+
+def response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def cache_response(*groups):
+    """ View decorator: send anonymous visitors the cached page for this URL while its groups are unchanged.
+
+    groups are format strings filled in with the view's keyword arguments, e.g. 'show:{show_pk}'.
+    The view can add groups that depend on what it reads with depends_on(). Only 200 responses
+    that don't set cookies are cached. """
+    def decorator(view):
+        @wraps(view)
+        def cached_view(request, *args, **kwargs):
+            if not cacheable(request):
+                return view(request, *args, **kwargs)
+
+            cache = response_cache()
+            key = PAGE_KEY.format(hashlib.md5(request.build_absolute_uri().encode()).hexdigest())
+            cached = cache.get(key)
+            if cached is not None:
+                versions, response = cached
+                if cache.get_many([GROUP_KEY.format(group) for group in versions]) == versions_by_key(versions):
+                    return response
+
+            # Versions from before the view reads anything, so a change made while it renders isn't missed
+            request.response_cache_groups = {group.format(**kwargs) for group in groups}
+            versions = group_versions(cache, request.response_cache_groups)
+            response = view(request, *args, **kwargs)
+            versions.update(group_versions(cache, request.response_cache_groups - set(versions)))
+
+            complete = len(versions) == len(request.response_cache_groups)
+            if response.status_code == 200 and not response.cookies and complete and not lagging(versions):
+                cache.set(key, (versions, response), settings.RESPONSE_CACHE_SECONDS)
+            return response
+        return cached_view
+    return decorator
+
+
+def depends_on(request, *groups):
+    """ Add groups to the page a cache_response view is rendering, e.g. the artist of the show it's about. """
+    if hasattr(request, 'response_cache_groups'):
+        request.response_cache_groups.update(groups)
+
+
+def cacheable(request):
+    # Logged in visitors see their own name on every page, and a message is only shown once
+    if request.method != 'GET' or request.user.is_authenticated:
+        return False
+    return not len(messages.get_messages(request))
+
+
+def versions_by_key(versions):
+    return {GROUP_KEY.format(group): version for group, version in versions.items()}
+
+
+def group_versions(cache, groups):
+    """ Map of group -> its version, starting the groups that haven't got one yet. """
+    keys = {GROUP_KEY.format(group): group for group in groups}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # A new or evicted group starts at a new version, so pages kept from before don't match it
+        cache.add(key, time.time_ns(), None)
+    if len(found) < len(keys):
+        found = cache.get_many(keys)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def lagging(versions):
+    """ True if a group changed so recently that a read replica might not have the change yet. """
+    if not replicas():
+        return False
+    changed_since = time.time_ns() - settings.REPLICA_LAG_SECONDS * 10 ** 9
+    return any(version > changed_since for version in versions.values())
+
+
+def invalidate(*groups):
+    """ Start new versions of groups, so their cached pages are rendered again. """
+    version = time.time_ns()
+    response_cache().set_many({GROUP_KEY.format(group): version for group in groups}, None)
+
+
+def clear():
+    """ Forget every cached page, after a bulk change that could be on any of them. """
+    response_cache().clear()
+
+
+def changed(using, *groups):
+    """ Invalidate groups for a row saved or deleted on the database using. Inside a transaction that's done
+    again when it commits, in case another request cached a page from before the change in the meantime. """
+    invalidate(*groups)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: invalidate(*groups), using=using)
+
+
+def note_changed(sender, instance, using, **kwargs):
+    changed(using, 'notes', 'shows', f'show:{instance.show_id}')
+
+
+def show_changed(sender, instance, using, **kwargs):
+    changed(using, 'notes', 'shows', f'show:{instance.pk}')
+
+
+def artist_changed(sender, instance, using, **kwargs):
+    changed(using, 'notes', 'shows', f'artist:{instance.pk}')
+
+
+def venue_changed(sender, instance, using, **kwargs):
+    changed(using, 'notes', 'shows', f'venue:{instance.pk}')
+
+
+RECEIVERS = {Note: note_changed, Show: show_changed, Artist: artist_changed, Venue: venue_changed}
+
+
+def connect_signals():
+    for model, receiver in RECEIVERS.items():
+        post_save.connect(receiver, sender=model, dispatch_uid=f'response_cache_save_{model.__name__}')
+        post_delete.connect(receiver, sender=model, dispatch_uid=f'response_cache_delete_{model.__name__}')
@@ -0,0 +1,212 @@
+""" Full-text search over notes, and name search for artists and venues, using the database's own text indexes.
+
+On SQLite the notes are indexed in an FTS5 table, lmn_note_search, kept up to date by triggers on lmn_note.
+On PostgreSQL they are indexed in a generated tsvector column, lmn_note.search_vector, with a GIN index.
+Either way the database updates the index itself whenever a note is saved or deleted, including by
+bulk updates and deletes that never call Note.save(). The indexes are made by migrations 0012 and 0013,
+and SQLite drops a table's triggers when a migration rebuilds it, so those migrations make them again.
+
+Results come best match first. Pages are found with a (score, id) cursor rather than an OFFSET,
+so later pages cost the same as the first one.
+
+Artist and venue names are indexed by trigram, and name_matches finds the names containing some text
+for the artist, venue and show lists.
+"""
+
+import html
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.safestring import mark_safe
+
+from .pagination import INTEGER_RANGE
+
+SEARCH_TABLE = 'lmn_note_search'
+
+# Matches in a title count for more than matches in the text
+TITLE_WEIGHT = 4.0
+TEXT_WEIGHT = 1.0
+
+# Characters that don't appear in note text, used to mark matching words in a snippet before it's
+# escaped. They are swapped for <mark> tags afterwards, so note text can't inject HTML.
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_WORDS = 16
+
+WORD = re.compile(r'\w+')
+
+
+def search_notes(query, after=None, limit=20):
+    """ Notes whose title or text contain every word in query, best match first.
+
+    Returns (notes, next_cursor). Each note gets a .snippet, a piece of its text as safe HTML with
+    the matching words in <mark> tags. Pass next_cursor back as `after` for the next page;
+    it's None on the last page. """
+    from .models import Note
+
+    words = WORD.findall(query or '')
+    if not words:
+        return [], None
+
+    position = parse_cursor(after)
+    connection = connections[router.db_for_read(Note)]
+
+    if connection.vendor == 'sqlite':
+        matches, snippets = _search_sqlite(connection, words, position, limit + 1)
+    elif connection.vendor == 'postgresql':
+        matches, snippets = _search_postgresql(connection, words, position, limit + 1)
+    else:
+        matches, snippets = _search_other(Note, words, position, limit + 1)
+
+    # One extra row was fetched to find out if there's another page
+    next_cursor = None
+    if len(matches) > limit:
+        matches = matches[:limit]
+        next_cursor = make_cursor(*matches[-1])
+
+    ids = [note_id for score, note_id in matches]
+    notes = Note.objects.select_related('show__artist', 'show__venue', 'user').in_bulk(ids)
+    results = []
+    for score, note_id in matches:
+        note = notes.get(note_id)
+        if note is None:
+            continue  # deleted since the search ran
+        note.search_score = score
+        note.snippet = highlight(snippets.get(note_id) or note.text[:200])
+        results.append(note)
+
+    return results, next_cursor
+
+
+def _search_sqlite(connection, words, position, limit):
+    # Quoting each word stops FTS5 reading words like AND, OR, NOT or NEAR as operators
+    match = ' '.join('"' + word + '"' for word in words)
+    # bm25() is lower for better matches, so ordering by it ascending gives the best first
+    sql = (f'SELECT score, id FROM ('
+           f'SELECT rowid AS id, bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {TEXT_WEIGHT}) AS score '
+           f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s)')
+    params = [match]
+    if position:
+        sql += ' WHERE (score, id) > (%s, %s)'
+        params += list(position)
+    sql += ' ORDER BY score, id LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        matches = cursor.fetchall()
+        if not matches:
+            return [], {}
+
+        # Snippets are made for this page only, not every match
+        ids = [note_id for score, note_id in matches]
+        cursor.execute(
+            f'SELECT rowid, snippet({SEARCH_TABLE}, 1, %s, %s, %s, %s) FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND rowid IN ({", ".join(["%s"] * len(ids))})',
+            [MARK_START, MARK_END, '…', SNIPPET_WORDS, match, *ids]
+        )
+        return matches, dict(cursor.fetchall())
+
+
+def _search_postgresql(connection, words, position, limit):
+    query = ' '.join(words)
+    # ts_rank_cd is higher for better matches, so it's negated to sort the same way as SQLite
+    sql = ('SELECT score, id FROM ('
+           'SELECT id, -ts_rank_cd(search_vector, query)::float8 AS score '
+           'FROM lmn_note, plainto_tsquery(\'english\', %s) query WHERE search_vector @@ query) matches')
+    params = [query]
+    if position:
+        sql += ' WHERE (score, id) > (%s, %s)'
+        params += list(position)
+    sql += ' ORDER BY score, id LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        matches = cursor.fetchall()
+        if not matches:
+            return [], {}
+
+        ids = [note_id for score, note_id in matches]
+        cursor.execute(
+            "SELECT id, ts_headline('english', text, plainto_tsquery('english', %s), %s) "
+            "FROM lmn_note WHERE id = ANY(%s)",
+            [query, f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_WORDS}, MinWords=5', ids]
+        )
+        return matches, dict(cursor.fetchall())
+
+
+def _search_other(Note, words, position, limit):
+    """ Databases without a text index we use: filter with LIKE and keep id order. Slow on big tables. """
+    notes = Note.objects.all()
+    for word in words:
+        notes = notes.filter(Q(title__icontains=word) | Q(text__icontains=word))
+    if position:
+        notes = notes.filter(pk__gt=position[1])
+    ids = notes.order_by('pk').values_list('pk', flat=True)[:limit]
+    return [(0.0, note_id) for note_id in ids], {}
+
+
+def highlight(snippet):
+    """ Escape a snippet and turn its match markers into <mark> tags. """
+    escaped = html.escape(snippet)
+    return mark_safe(escaped.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def make_cursor(score, note_id):
+    # repr() keeps every digit of the score, so the next page starts exactly after this row
+    return f'{score!r}_{note_id}'
+
+
+def parse_cursor(cursor):
+    """ (score, id) from a cursor made by make_cursor, or None if there isn't a valid one. """
+    try:
+        score, note_id = cursor.rsplit('_', 1)
+        score, note_id = float(score), int(note_id)
+    except (AttributeError, ValueError):
+        return None
+    # An id too big for the database would make the search query fail
+    if note_id not in INTEGER_RANGE:
+        return None
+    return score, note_id
+
+
+# Artist and venue names are indexed by trigram - every run of three characters - so a search finds names
+# containing the text anywhere, as icontains does, without reading every name. SQLite keeps them in FTS5
+# tables with the trigram tokenizer (SQLite 3.34 or newer), PostgreSQL in pg_trgm GIN indexes.
+NAME_SEARCH_TABLES = {
+    'lmn_artist': 'lmn_artist_name_search',
+    'lmn_venue': 'lmn_venue_name_search',
+}
+
+# A trigram index can't find text shorter than one trigram
+MIN_INDEXED_LENGTH = 3
+
+
+def name_matches(model, text):
+    """ The ids of the Artists or Venues whose name contains text, ignoring case.
+
+    Returns a subquery to filter with, e.g. Artist.objects.filter(pk__in=name_matches(Artist, 'rem'))
+    or Show.objects.filter(venue__in=name_matches(Venue, 'first')), so the database runs it
+    as part of the one query. """
+    table = model._meta.db_table
+    search_table = NAME_SEARCH_TABLES[table]
+    connection = connections[router.db_for_read(model)]
+
+    if len(text) >= MIN_INDEXED_LENGTH:
+        if connection.vendor == 'sqlite':
+            # A quoted phrase matches the text anywhere in a name. Doubled quotes keep quotes in text literal.
+            phrase = '"' + text.replace('"', '""') + '"'
+            return RawSQL(f'SELECT rowid FROM {search_table} WHERE {search_table} MATCH %s', [phrase])
+        if connection.vendor == 'postgresql':
+            return RawSQL(f'SELECT id FROM {table} WHERE name ILIKE %s', ['%' + escape_like(text) + '%'])
+
+    # Too short for the index, or a database without one: check every name
+    return model.objects.filter(name__icontains=text).values('pk')
+
+
+def escape_like(text):
+    """ text with LIKE's wildcards escaped, so they match themselves. """
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
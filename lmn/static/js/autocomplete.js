@@ -0,0 +1,35 @@
+// Suggest artist and venue names in search boxes marked with data-autocomplete="artist" or "venue".
+// Suggestions come from the autocomplete view, whose URL is in this script tag's data-url.
+(function () {
+  var url = document.currentScript.dataset.url;
+
+  document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+    var kind = input.dataset.autocomplete;
+    var list = document.createElement('datalist');
+    list.id = input.id + '-suggestions';
+    input.setAttribute('list', list.id);
+    input.after(list);
+
+    var latest = 0;
+    input.addEventListener('input', function () {
+      var request = ++latest;
+      var query = input.value.trim();
+      if (!query) {
+        list.replaceChildren();
+        return;
+      }
+      fetch(url + '?kind=' + kind + '&q=' + encodeURIComponent(query))
+        .then(function (response) { return response.json(); })
+        .then(function (suggestions) {
+          if (request !== latest) {
+            return;  // a newer keystroke has been sent since
+          }
+          list.replaceChildren.apply(list, suggestions[kind + 's'].map(function (suggestion) {
+            var option = document.createElement('option');
+            option.value = suggestion.name;
+            return option;
+          }));
+        });
+    });
+  });
+})();
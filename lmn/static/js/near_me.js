@@ -0,0 +1,26 @@
+// The "Use my location" button on the shows near me page. It asks the browser where it is,
+// puts that in the form's hidden latitude and longitude fields, and searches.
+(function () {
+  var button = document.getElementById('use-my-location');
+  var form = document.getElementById('near-form');
+  if (!button || !form || !navigator.geolocation) {
+    return;
+  }
+  button.hidden = false;
+
+  button.addEventListener('click', function () {
+    navigator.geolocation.getCurrentPosition(function (position) {
+      form.elements.latitude.value = position.coords.latitude.toFixed(4);
+      form.elements.longitude.value = position.coords.longitude.toFixed(4);
+      form.submit();
+    });
+  });
+
+  // Typing a city means searching there instead of wherever the browser was last time
+  [form.elements.city, form.elements.state].forEach(function (input) {
+    input.addEventListener('input', function () {
+      form.elements.latitude.value = '';
+      form.elements.longitude.value = '';
+    });
+  });
+})();
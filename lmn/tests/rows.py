@@ -0,0 +1,30 @@
+""" Rows added to the test fixtures by the tests that need more than a page of everything. """
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+import datetime
+
+from lmn.models import Artist, Note, Show, Venue
+
+
+def add_rows():
+    """ For each of 25 days, an artist, a venue and a fan, a past show by the first artist at the first venue
+    with a note by the first user, a past and a future show by the new artist at the new venue, and a note
+    by the fan on the first show. Enough to fill more than a page of every list. """
+    artist = Artist.objects.get(pk=1)
+    venue = Venue.objects.get(pk=1)
+    user = User.objects.get(pk=1)
+    first_show = Show.objects.get(pk=1)
+    for day in range(1, 26):
+        other_artist = Artist.objects.create(name=f'Band {day}')
+        other_venue = Venue.objects.create(name=f'Club {day}', city='Duluth', state='MN')
+        show = Show.objects.create(show_date=datetime.datetime(2019, 1, day, tzinfo=datetime.timezone.utc),
+                                   artist=artist, venue=venue)
+        Show.objects.create(show_date=datetime.datetime(2019, 2, day, tzinfo=datetime.timezone.utc),
+                            artist=other_artist, venue=other_venue)
+        Show.objects.create(show_date=timezone.now() + datetime.timedelta(days=day),
+                            artist=other_artist, venue=other_venue)
+        Note.objects.create(show=show, user=user, title='ok', text='ok')
+        fan = User.objects.create_user(f'fan{day}')
+        Note.objects.create(show=first_show, user=fan, title='ok', text='ok')
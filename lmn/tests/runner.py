@@ -0,0 +1,32 @@
+""" The test runner, TEST_RUNNER in settings. It sets up what the tests need that the site doesn't have. """
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# A second SQLite database standing in for a read replica, for lmn/tests/test_db_router.py. It's added
+# before the test databases are made, so it gets its own test database rather than mirroring the default
+# one. Tests that list it in their databases start it with the same fixtures as the primary, as if
+# replication had caught up; rows saved during a test only go to the primary, like a replica that hasn't.
+REPLICA = 'replica_stand_in'
+
+# The caches of pages and cards are switched off, since test cases roll back their transactions
+# without the signals that would invalidate them. The tests of the caches turn them on again.
+NO_CACHE = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches_off = override_settings(CACHES=dict(settings.CACHES, responses=NO_CACHE, cards=NO_CACHE))
+        self.caches_off.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_off.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        connections.databases.setdefault(REPLICA, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'})
+        return super().setup_databases(**kwargs)
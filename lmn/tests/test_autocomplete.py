@@ -0,0 +1,161 @@
+from django.test import TestCase
+from django.urls import reverse
+
+import threading
+import time
+
+from lmn.autocomplete import PrefixIndex, artist_index, normalize, venue_index
+from lmn.ingest.upsert import upsert
+from lmn.models import Artist, Venue
+
+
+class TestPrefixIndex(TestCase):
+
+    fixtures = ['testing_artists', 'testing_venues']
+
+    def setUp(self):
+        self.index = PrefixIndex(Artist)
+        self.index.build()
+
+    def names(self, prefix, limit=10):
+        return [row['name'] for pk, row in self.index.search(prefix, limit)]
+
+    def test_normalize_ignores_case_accents_and_punctuation(self):
+        self.assertEqual(normalize('  Beyoncé & The  B-52s '), 'beyonce the b 52s')
+
+    def test_matches_start_of_any_word(self):
+        Artist.objects.create(name='The Beatles')
+        Artist.objects.create(name='Beat Happening')
+        self.index.build()
+        self.assertEqual(self.names('beat'), ['Beat Happening', 'The Beatles'])
+        self.assertEqual(self.names('THE BEA'), ['The Beatles'])
+        self.assertEqual(self.names('eatles'), [])
+
+    def test_each_row_suggested_once(self):
+        Artist.objects.create(name='Rem Rem Rem')
+        self.index.build()
+        self.assertEqual(self.names('rem'), ['REM', 'Rem Rem Rem'])
+
+    def test_limit(self):
+        self.assertEqual(len(self.names('', 10)), 0)
+        Artist.objects.bulk_create([Artist(name=f'Band {number}') for number in range(20)])
+        self.index.build()
+        self.assertEqual(len(self.names('band', 5)), 5)
+
+    def test_search_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('ac'), ['ACDC'])
+
+    def test_refresh_adds_rows_written_without_signals(self):
+        upsert(Artist, [{'name': 'Prince'}], ('name',))
+        self.assertEqual(self.names('prin'), [])
+        self.assertEqual(self.index.refresh(), 1)
+        self.assertEqual(self.names('prin'), ['Prince'])
+        self.assertEqual(self.index.refresh(), 0)
+
+    def test_renamed_and_removed_rows(self):
+        artist = Artist.objects.get(name='REM')
+        self.index.add(artist.pk, {'name': 'Automatic REM'})
+        self.assertEqual(self.names('auto'), ['Automatic REM'])
+        self.assertEqual(self.names('rem'), ['Automatic REM'])
+
+        self.index.add(artist.pk, {'name': 'Murmur'})
+        self.assertEqual(self.names('auto'), [])
+        self.assertEqual(self.names('rem'), [])
+
+        self.index.remove(artist.pk)
+        self.assertEqual(self.names('murmur'), [])
+
+    def test_renamed_and_removed_rows_leave_no_keys_behind(self):
+        keys = list(self.index.keys)
+        artist = Artist.objects.get(name='REM')
+        self.index.add(artist.pk, {'name': 'Automatic For The People'})
+        self.assertEqual(len(self.index.keys), len(keys) + 3)
+        self.assertNotIn('rem', self.index.keys)
+
+        self.index.remove(artist.pk)
+        self.assertEqual(len(self.index.keys), len(keys) - 1)
+        self.assertEqual(self.index.keys, sorted(self.index.keys))
+        self.assertNotIn(artist.pk, self.index.pks)
+
+    def test_refresh_merges_many_rows_in_order(self):
+        upsert(Artist, [{'name': f'Band {number}'} for number in range(50, 0, -1)], ('name',))
+        self.assertEqual(self.index.refresh(), 50)
+        self.assertEqual(self.index.keys, sorted(self.index.keys))
+        self.assertEqual(len(self.names('band', 50)), 50)
+
+    def test_one_thread_loads_the_index(self):
+        index = PrefixIndex(Artist)
+        builds = []
+
+        def slow_build():
+            builds.append(threading.get_ident())
+            time.sleep(0.05)
+            index.built_at = index.refreshed_at = time.monotonic()
+
+        index.build = slow_build
+        threads = [threading.Thread(target=index.search, args=('a',)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(builds), 1)
+
+
+class TestAutocompleteView(TestCase):
+
+    fixtures = ['testing_artists', 'testing_venues']
+
+    def setUp(self):
+        artist_index.reset()
+        venue_index.reset()
+
+    def tearDown(self):
+        # Don't leave this test's rows in the shared indexes
+        artist_index.reset()
+        venue_index.reset()
+
+    def get(self, **params):
+        return self.client.get(reverse('autocomplete'), params).json()
+
+    def test_suggests_artists_and_venues(self):
+        venue = Venue.objects.get(name='Target Center')
+        self.assertEqual(self.get(q='t'), {
+            'artists': [],
+            'venues': [
+                {'id': venue.pk, 'name': 'Target Center', 'city': 'Minneapolis', 'state': 'MN',
+                 'url': reverse('venue_detail', kwargs={'venue_pk': venue.pk})},
+                {'id': 2, 'name': 'The Turf Club', 'city': 'St. Paul', 'state': 'MN',
+                 'url': reverse('venue_detail', kwargs={'venue_pk': 2})},
+            ],
+        })
+
+    def test_kind_limits_suggestions(self):
+        self.assertEqual(self.get(q='y', kind='artist'), {
+            'artists': [{'id': 3, 'name': 'Yes', 'url': reverse('artist_detail', kwargs={'artist_pk': 3})}],
+        })
+        self.assertEqual(list(self.get(q='turf', kind='venue')), ['venues'])
+
+    def test_no_queries_once_loaded(self):
+        self.get(q='r')
+        with self.assertNumQueries(0):
+            self.assertEqual([artist['name'] for artist in self.get(q='r')['artists']], ['REM'])
+
+    def test_saves_and_deletes_update_suggestions(self):
+        self.get(q='r')
+        artist = Artist.objects.create(name='Replacements')
+        self.assertEqual([artist['name'] for artist in self.get(q='re')['artists']], ['REM', 'Replacements'])
+
+        artist.name = 'Husker Du'
+        artist.save()
+        self.assertEqual([artist['name'] for artist in self.get(q='re')['artists']], ['REM'])
+        self.assertEqual([artist['name'] for artist in self.get(q='husk')['artists']], ['Husker Du'])
+
+        artist.delete()
+        self.assertEqual(self.get(q='husk')['artists'], [])
+
+    def test_search_forms_are_marked_for_autocomplete(self):
+        response = self.client.get(reverse('show_list'))
+        self.assertContains(response, 'data-autocomplete="artist"')
+        self.assertContains(response, 'data-autocomplete="venue"')
+        self.assertContains(response, 'js/autocomplete.js')
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+import datetime
+
+from lmn import response_cache
+from lmn.cards import SHOW_VERSION_FIELDS, render_cards, show_version
+from lmn.models import Artist, Note, Show, Venue
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'responses': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    'cards': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-cards'},
+})
+class TestCardCache(TestCase):
+
+    fixtures = ['testing_users', 'testing_artists', 'testing_venues', 'testing_shows', 'testing_notes']
+
+    def setUp(self):
+        caches['cards'].clear()
+
+    def test_cached_cards_skip_reading_the_rows_in_full(self):
+        for url, queries in [(reverse('latest_notes'), 1), (reverse('show_list'), 1),
+                             (reverse('user_profile', kwargs={'user_pk': 1}), 2)]:
+            first = self.client.get(url)
+            with self.assertNumQueries(queries):
+                second = self.client.get(url)
+            self.assertEqual(first.content, second.content)
+
+    def test_a_page_of_500_cards_is_mostly_cache_hits(self):
+        artist, venue = Artist.objects.get(pk=1), Venue.objects.get(pk=1)
+        start = datetime.datetime(2019, 1, 1, tzinfo=datetime.timezone.utc)
+        Show.objects.bulk_create(Show(show_date=start + datetime.timedelta(hours=hour), artist=artist, venue=venue)
+                                 for hour in range(500))
+        full = Show.objects.select_related('artist', 'venue')
+
+        def cards():
+            shows = list(Show.objects.only('show_date', 'note_count', *SHOW_VERSION_FIELDS).order_by('pk'))
+            render_cards(shows, 'lmn/shows/show_card.html', 'show', full, show_version)
+            return shows
+
+        cards()
+        Note.objects.create(show=Show.objects.order_by('pk').last(), user=User.objects.get(pk=1), title='ok', text='ok')
+        # The versions, and the one changed show
+        with self.assertNumQueries(2):
+            shows = cards()
+        self.assertEqual(len(shows), 504)
+        self.assertIn('Notes: 1', shows[-1].card)
+
+    def test_changes_make_new_cards(self):
+        url = reverse('latest_notes')
+        self.client.get(url)
+
+        note = Note.objects.get(pk=1)
+        note.text = 'better than I remembered'
+        note.save()
+        self.assertContains(self.client.get(url), 'better than I remembered')
+
+        # Renaming the artist marks its shows as changed, so the cards of their notes are made again
+        artist = note.show.artist
+        artist.name = 'Renamed Band'
+        artist.save()
+        self.assertContains(self.client.get(url), 'Renamed Band')
+        self.assertContains(self.client.get(reverse('show_list')), 'Renamed Band')
+
+
+class TestCardCacheSettings(TestCase):
+
+    def test_cards_have_their_own_store(self):
+        for backend in ['locmem', 'file', 'redis']:
+            self.assertNotEqual(settings.CARD_CACHE_BACKENDS[backend]['LOCATION'],
+                                settings.RESPONSE_CACHE_BACKENDS[backend]['LOCATION'])
+
+        with self.settings(CACHES={'default': settings.CACHES['default'],
+                                   'responses': settings.RESPONSE_CACHE_BACKENDS['locmem'],
+                                   'cards': settings.CARD_CACHE_BACKENDS['locmem']}):
+            caches['cards'].set('card', 'kept')
+            response_cache.clear()
+            self.assertEqual(caches['cards'].get('card'), 'kept')
+            caches['cards'].clear()
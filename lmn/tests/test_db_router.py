@@ -0,0 +1,70 @@
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+import time
+
+from lmn.db_router import PIN_COOKIE, ReplicaReadsMiddleware
+from lmn.models import Note
+from lmn.tests.runner import REPLICA
+
+
+@override_settings(READ_REPLICAS=[REPLICA])
+class TestReadReplicaRouting(TestCase):
+
+    databases = {'default', REPLICA}
+    fixtures = ['testing_users', 'testing_artists', 'testing_venues', 'testing_shows', 'testing_notes']
+
+    def test_page_views_read_from_the_replica(self):
+        Note.objects.using(REPLICA).filter(pk=3).update(title='from the replica')
+        response = self.client.get(reverse('latest_notes'))
+        self.assertContains(response, 'from the replica')
+
+    def test_code_outside_requests_uses_the_primary(self):
+        self.assertEqual(router.db_for_read(Note), 'default')
+        self.assertEqual(router.db_for_write(Note), 'default')
+
+    def test_posts_read_the_primary_and_pin_the_browser(self):
+        self.client.force_login(User.objects.get(pk=1))
+        response = self.client.post(reverse('new_note', kwargs={'show_pk': 3}),
+                                    {'text': 'wow', 'title': 'wow', 'rating': 5})
+        note = Note.objects.get(user=1, show=3)
+        self.assertRedirects(response, reverse('note_detail', kwargs={'note_pk': note.pk}))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # The pin cookie sends the redirect to the primary, which has the new note
+        response = self.client.get(reverse('note_detail', kwargs={'note_pk': note.pk}))
+        self.assertContains(response, 'wow')
+
+        # Without it the replica is read, and it hasn't caught up yet
+        del self.client.cookies[PIN_COOKIE]
+        response = self.client.get(reverse('note_detail', kwargs={'note_pk': note.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_expired_or_bad_pin_cookie_reads_the_replica(self):
+        Note.objects.using(REPLICA).filter(pk=3).update(title='from the replica')
+        for value in [str(time.time() - 1), 'not-a-time']:
+            self.client.cookies[PIN_COOKIE] = value
+            self.assertContains(self.client.get(reverse('latest_notes')), 'from the replica')
+
+    def test_reads_after_a_write_in_the_same_request_use_the_primary(self):
+        read_from = []
+
+        def view(request):
+            read_from.append(router.db_for_read(Note))
+            Note.objects.filter(pk=3).update(title='changed')
+            read_from.append(router.db_for_read(Note))
+            return HttpResponse()
+
+        response = ReplicaReadsMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(read_from, [REPLICA, 'default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    @override_settings(READ_REPLICAS=[])
+    def test_no_replicas_reads_the_primary(self):
+        Note.objects.using(REPLICA).filter(pk=3).update(title='from the replica')
+        response = self.client.get(reverse('latest_notes'))
+        self.assertNotContains(response, 'from the replica')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
@@ -0,0 +1,115 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+import datetime
+
+from lmn.geo import city_centroid, covering_cells, distance_miles, encode_geohash, venues_near
+from lmn.ingest.events import parse_event
+from lmn.ingest.writer import ShowWriter
+from lmn.models import Artist, Show, Venue
+
+from .test_ingest import make_event
+
+MINNEAPOLIS = (44.9778, -93.2650)
+
+
+class TestGeohash(TestCase):
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode_geohash(*MINNEAPOLIS, 5), '9zvxv')
+
+    def test_covering_cells_cover_the_circle(self):
+        cells = covering_cells(*MINNEAPOLIS, 25)
+        self.assertLessEqual(len(cells), 16)
+        # Points 24 miles north, south, east and west are in one of the cells
+        for latitude, longitude in [(45.325, -93.265), (44.630, -93.265), (44.978, -92.775), (44.978, -93.755)]:
+            self.assertLess(distance_miles(*MINNEAPOLIS, latitude, longitude), 25)
+            self.assertTrue(any(encode_geohash(latitude, longitude).startswith(cell) for cell in cells))
+
+    def test_smaller_circles_use_smaller_cells(self):
+        self.assertGreater(len(covering_cells(*MINNEAPOLIS, 1)[0]), len(covering_cells(*MINNEAPOLIS, 100)[0]))
+
+    def test_distance_miles(self):
+        self.assertAlmostEqual(distance_miles(*MINNEAPOLIS, 44.9537, -93.0900), 8.7, places=1)
+        self.assertEqual(distance_miles(*MINNEAPOLIS, *MINNEAPOLIS), 0)
+
+    def test_city_centroid(self):
+        self.assertEqual(city_centroid('Minneapolis', 'MN'), MINNEAPOLIS)
+        self.assertEqual(city_centroid('saint paul', 'mn'), city_centroid('St. Paul', 'MN'))
+        self.assertIsNone(city_centroid('Minneapolis', 'KS'))
+
+
+class TestVenueLocation(TestCase):
+
+    def test_venues_are_put_in_the_middle_of_their_city(self):
+        venue = Venue.objects.create(name='Palace Theatre', city='St. Paul', state='MN')
+        self.assertEqual((venue.latitude, venue.longitude), (44.9537, -93.0900))
+        self.assertEqual(venue.geohash, encode_geohash(44.9537, -93.0900))
+
+        venue = Venue.objects.create(name='Somewhere', city='Nowhere', state='MN')
+        self.assertIsNone(venue.geohash)
+
+    def test_importer_saves_coordinates_from_the_event(self):
+        event = make_event('1', venue='Varsity Theater')
+        event['_embedded']['venues'][0]['location'] = {'latitude': '44.9806', 'longitude': '-93.2363'}
+        no_location = make_event('2', venue='Cedar Cultural Center')
+        ShowWriter().write([parse_event(event), parse_event(no_location)])
+
+        venue = Venue.objects.get(name='Varsity Theater')
+        self.assertEqual((venue.latitude, venue.longitude), (44.9806, -93.2363))
+        self.assertEqual(venue.geohash, encode_geohash(44.9806, -93.2363))
+        venue = Venue.objects.get(name='Cedar Cultural Center')
+        self.assertEqual((venue.latitude, venue.longitude), MINNEAPOLIS)
+
+    def test_venues_near(self):
+        first_avenue = Venue.objects.create(name='First Avenue', city='Minneapolis', state='MN',
+                                            latitude=44.9786, longitude=-93.2760)
+        turf_club = Venue.objects.create(name='Turf Club', city='St. Paul', state='MN',
+                                         latitude=44.9559, longitude=-93.1668)
+        Venue.objects.create(name='Sheldon', city='Red Wing', state='MN', latitude=44.5625, longitude=-92.5338)
+        Venue.objects.create(name='Metro', city='Chicago', state='IL')
+
+        distances = venues_near(Venue.objects.all(), *MINNEAPOLIS, 10)
+        self.assertEqual(set(distances), {first_avenue.pk, turf_club.pk})
+        self.assertLess(distances[first_avenue.pk], 1)
+        self.assertEqual(len(venues_near(Venue.objects.all(), *MINNEAPOLIS, 50)), 3)
+
+
+class TestShowsNear(TestCase):
+
+    def setUp(self):
+        self.artist = Artist.objects.create(name='REM')
+        self.soon = timezone.now() + datetime.timedelta(days=3)
+        self.minneapolis = Venue.objects.create(name='First Avenue', city='Minneapolis', state='MN')
+        self.duluth = Venue.objects.create(name='Sacred Heart', city='Duluth', state='MN')
+
+    def show(self, venue, days):
+        return Show.objects.create(artist=self.artist, venue=venue,
+                                   show_date=timezone.now() + datetime.timedelta(days=days))
+
+    def test_upcoming_shows_near_a_city(self):
+        later = self.show(self.minneapolis, 10)
+        sooner = self.show(self.minneapolis, 2)
+        self.show(self.minneapolis, -2)  # already happened
+        self.show(self.minneapolis, 45)  # too far ahead
+        self.show(self.duluth, 2)  # too far away
+
+        response = self.client.get(reverse('shows_near'), {'city': 'st paul', 'state': 'MN', 'miles': 25})
+        self.assertEqual(list(response.context['shows']), [sooner, later])
+        self.assertContains(response, '8.7 miles away')
+
+    def test_browser_location(self):
+        show = self.show(self.duluth, 2)
+        response = self.client.get(reverse('shows_near'), {'latitude': 46.78, 'longitude': -92.1, 'miles': 5})
+        self.assertEqual(list(response.context['shows']), [show])
+
+    def test_form_errors(self):
+        response = self.client.get(reverse('shows_near'))
+        self.assertIsNone(response.context['shows'])
+        self.assertNotContains(response, 'Shows in the next')
+
+        response = self.client.get(reverse('shows_near'), {'city': 'Atlantis', 'state': 'MN', 'miles': 25})
+        self.assertIsNone(response.context['shows'])
+        self.assertContains(response, 'know where that city is')
@@ -0,0 +1,141 @@
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.forms import modelform_factory
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+
+import datetime
+import tempfile
+from io import StringIO
+
+from lmn.identity import canonical_artist_key, canonical_venue_key, find_duplicates
+from lmn.ingest.events import parse_event
+from lmn.ingest.writer import ShowWriter
+from lmn.models import Artist, Note, Show, ShowSource, Venue
+
+from .test_ingest import make_event
+
+
+class TestCanonicalKeys(TestCase):
+
+    def test_keys_ignore_case_spacing_accents_and_punctuation(self):
+        self.assertEqual(canonical_artist_key('The Weeknd'), canonical_artist_key('the weeknd '))
+        self.assertEqual(canonical_artist_key('Beyoncé'), canonical_artist_key('BEYONCE'))
+        self.assertNotEqual(canonical_artist_key('!!!'), canonical_artist_key('?'))
+        self.assertEqual(canonical_venue_key('The Turf Club', 'St. Paul', 'mn'),
+                         canonical_venue_key('the turf club', 'St Paul', 'MN'))
+        self.assertNotEqual(canonical_venue_key('Legion Hall', 'Duluth', 'MN'),
+                            canonical_venue_key('Legion Hall', 'Winona', 'MN'))
+
+    def test_saved_rows_get_a_unique_key(self):
+        Artist.objects.create(name='The Weeknd')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Artist.objects.create(name='the weeknd ')
+        venue = Venue.objects.create(name='Turf Club', city='St. Paul', state='MN')
+        self.assertEqual(venue.canonical_key, 'turf club|st paul|mn')
+
+    def test_forms_report_a_clashing_key_on_the_name(self):
+        artist = Artist.objects.create(name='The Weeknd')
+        form = modelform_factory(Artist, fields=['name'])({'name': 'the  weeknd'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['name'], ['There is already an artist called The Weeknd.'])
+        # Saving a row under its own key is fine
+        self.assertTrue(modelform_factory(Artist, fields=['name'])({'name': 'THE WEEKND'}, instance=artist).is_valid())
+
+        Venue.objects.create(name='Turf Club', city='St. Paul', state='MN')
+        form = modelform_factory(Venue, fields=['name', 'city', 'state'])(
+            {'name': 'turf club', 'city': 'St Paul', 'state': 'MN'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('name', form.errors)
+        with self.assertRaises(ValidationError):
+            Venue(name='TURF CLUB', city='st. paul', state='MN').full_clean()
+        Venue(name='Turf Club', city='Duluth', state='MN').full_clean()
+
+    def test_importer_finds_the_same_artist_and_venue_under_other_spellings(self):
+        artist = Artist.objects.create(name='The Weeknd')
+        venue = Venue.objects.create(name='First Avenue', city='Minneapolis', state='MN')
+        event = make_event('1', artist='the weeknd ', venue='FIRST AVENUE')
+        new_artist = make_event('2', artist='Yes')
+        new_artist['_embedded']['attractions'][0]['id'] = 'K8vZ9171ob7'
+        ShowWriter().write([parse_event(event), parse_event(new_artist)])
+
+        self.assertEqual(Show.objects.get(sources__event_id='1').artist, artist)
+        self.assertEqual(Show.objects.get(sources__event_id='1').venue, venue)
+        self.assertEqual(Artist.objects.get(name='Yes').ticketmaster_id, 'K8vZ9171ob7')
+        self.assertEqual(Artist.objects.count(), 2)
+
+    def test_find_duplicates_joins_keys_and_ticketmaster_ids(self):
+        rows = [
+            {'pk': 1, 'ticketmaster_id': None},
+            {'pk': 2, 'ticketmaster_id': 'K1'},
+            {'pk': 3, 'ticketmaster_id': 'K1'},
+            {'pk': 4, 'ticketmaster_id': None},
+            {'pk': 5, 'ticketmaster_id': None},
+        ]
+        keys = {1: 'prince', 2: 'the artist', 3: 'prince', 4: 'yes', 5: 'the artist'}
+        self.assertEqual(find_duplicates(rows, keys), {2: 1, 3: 1, 5: 1})
+
+
+class TestMergeDuplicates(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('fan')
+        self.other_user = User.objects.create_user('other fan')
+        self.date = datetime.datetime(2020, 5, 1, tzinfo=datetime.timezone.utc)
+
+    def merge(self):
+        out = StringIO()
+        call_command('merge_duplicates', '--batch-size', '2', stdout=out)
+        return out.getvalue()
+
+    def test_duplicate_artists_are_merged_into_the_oldest(self):
+        # bulk_create skips save(), like rows saved before there were canonical keys
+        Artist.objects.bulk_create([Artist(name='The Weeknd'), Artist(name='the weeknd'), Artist(name=' THE WEEKND')])
+        weeknd, lower, spaced = Artist.objects.order_by('pk')
+        venues = [Venue.objects.create(name=f'Club {number}', city='Duluth', state='MN') for number in range(5)]
+        for venue in venues:
+            Show.objects.create(show_date=self.date, artist=lower, venue=venue)
+        Show.objects.create(show_date=self.date, artist=spaced, venue=venues[0])
+
+        self.assertIn('Merged 2 duplicate artists and 0 duplicate venues', self.merge())
+        self.assertEqual(list(Artist.objects.all()), [weeknd])
+        self.assertEqual(Artist.objects.get().canonical_key, 'the weeknd')
+        self.assertEqual(Show.objects.filter(artist=weeknd).count(), 5)
+
+    def test_clashing_shows_are_merged_with_their_notes(self):
+        first_avenue = Venue.objects.create(name='First Avenue', city='Minneapolis', state='MN')
+        duplicate = Venue.objects.create(name='1st Ave', city='Minneapolis', state='MN', ticketmaster_id='KovZpZAE6eeA')
+        Venue.objects.filter(pk=first_avenue.pk).update(ticketmaster_id='KovZpZAE6eeA')
+        artist = Artist.objects.create(name='REM')
+
+        kept_show = Show.objects.create(show_date=self.date, artist=artist, venue=first_avenue)
+        merged_show = Show.objects.create(show_date=self.date, artist=artist, venue=duplicate)
+        ShowSource.objects.create(event_id='abc', content_hash='x', show=merged_show)
+        Note.objects.create(show=kept_show, user=self.user, title='first', text='great', rating=5)
+        # A second note by the same user can't move, but the other user's note can
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        photo = default_storage.save('user_images/again.jpg', ContentFile(b'photo'))
+        Note.objects.create(show=merged_show, user=self.user, title='again', text='ok', rating=3, photo=photo)
+        Note.objects.create(show=merged_show, user=self.other_user, title='mine', text='loud', rating=1)
+
+        self.assertIn('Merged 0 duplicate artists and 1 duplicate venues', self.merge())
+        self.assertEqual(list(Venue.objects.all()), [first_avenue])
+        self.assertEqual(list(Show.objects.all()), [kept_show])
+        self.assertEqual(ShowSource.objects.get().show, kept_show)
+        self.assertEqual(sorted(Note.objects.filter(show=kept_show).values_list('title', flat=True)), ['first', 'mine'])
+        # The note that couldn't move was deleted with its show, and so was its photo
+        self.assertFalse(default_storage.exists(photo))
+
+        kept_show.refresh_from_db()
+        self.assertEqual((kept_show.note_count, kept_show.rating_sum, kept_show.rating_1_count), (2, 6, 1))
+
+    def test_nothing_to_merge(self):
+        Artist.objects.create(name='REM')
+        self.assertIn('Merged 0 duplicate artists and 0 duplicate venues', self.merge())
@@ -0,0 +1,365 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+import datetime
+import io
+import json
+import shutil
+import tempfile
+import time
+
+import requests
+
+from lmn.ingest.archive import PageRecorder
+from lmn.ingest.client import TicketmasterClient, TokenBucket
+from lmn.ingest.events import parse_event
+from lmn.ingest.fake_api import FakeCatalog, FakeDiscoveryServer
+from lmn.ingest.fetch import fetch_page, parse_page
+from lmn.ingest.resolver import NaturalKeyResolver
+from lmn.ingest.shards import make_shards, run_shards
+from lmn.ingest.stream import EventStream
+from lmn.ingest.sync import DeltaSync, OVERLAP
+from lmn.ingest.upsert import upsert
+from lmn.ingest.writer import ShowWriter
+from lmn.models import Artist, Venue, Show, ShowSource, SyncState
+
+
+def make_event(event_id, artist='REM', venue='First Avenue', city='Minneapolis', state='MN',
+               local_date='2023-05-01', local_time='20:00:00'):
+    """ A cut down Discovery API event with the fields the importer reads """
+    start = {'localDate': local_date}
+    if local_time:
+        start['localTime'] = local_time
+    return {
+        'id': event_id,
+        'name': f'{artist} live',
+        'dates': {'start': start},
+        '_embedded': {
+            'venues': [{'name': venue, 'city': {'name': city}, 'state': {'name': 'Minnesota', 'stateCode': state}}],
+            'attractions': [{'name': artist}],
+        },
+    }
+
+
+class TestParseEvent(TestCase):
+
+    def test_parse_event_returns_compact_record(self):
+        record = parse_event(make_event('abc'))
+        self.assertEqual(record['event_id'], 'abc')
+        self.assertEqual(record['artist_name'], 'REM')
+        self.assertEqual(record['venue_name'], 'First Avenue')
+        self.assertEqual(record['venue_city'], 'Minneapolis')
+        self.assertEqual(record['venue_state'], 'MN')
+        self.assertEqual(record['show_date'], datetime.datetime(2023, 5, 1, 20, 0, tzinfo=datetime.timezone.utc))
+
+    def test_missing_local_time_is_midnight(self):
+        record = parse_event(make_event('abc', local_time=None))
+        self.assertEqual(record['show_date'], datetime.datetime(2023, 5, 1, 0, 0, tzinfo=datetime.timezone.utc))
+
+    def test_event_without_attraction_is_skipped(self):
+        event = make_event('abc')
+        del event['_embedded']['attractions']
+        self.assertIsNone(parse_event(event))
+
+
+class TestShowWriter(TestCase):
+
+    def test_writer_creates_artists_venues_and_shows_once(self):
+        records = [
+            parse_event(make_event('1', artist='REM', local_date='2023-05-01')),
+            parse_event(make_event('2', artist='REM', local_date='2023-05-02')),
+            parse_event(make_event('3', artist='ACDC', venue='Turf Club', city='St. Paul')),
+        ]
+        writer = ShowWriter(chunk_size=2)
+        writer.add(records)
+        writer.flush()
+
+        self.assertEqual(Artist.objects.count(), 2)
+        self.assertEqual(Venue.objects.count(), 2)
+        self.assertEqual(Show.objects.count(), 3)
+        self.assertEqual(writer.events, 3)
+
+        # Writing the same events again doesn't make duplicates
+        writer = ShowWriter()
+        writer.add(records)
+        writer.flush()
+        self.assertEqual(Artist.objects.count(), 2)
+        self.assertEqual(Venue.objects.count(), 2)
+        self.assertEqual(Show.objects.count(), 3)
+        self.assertEqual(writer.shows_created, 0)
+
+    def test_unchanged_events_are_skipped_without_queries(self):
+        records = [parse_event(make_event(str(n), artist=f'Artist {n}')) for n in range(10)]
+        ShowWriter().write(records)
+        self.assertEqual(ShowSource.objects.count(), 10)
+
+        writer = ShowWriter()
+        writer.hashes  # load the saved hashes
+        with self.assertNumQueries(0):
+            writer.write([parse_event(make_event(str(n), artist=f'Artist {n}')) for n in range(10)])
+        self.assertEqual(writer.unchanged, 10)
+
+        # A changed event is written again, and its show and hash are updated
+        moved = parse_event(make_event('3', artist='Artist 3', local_date='2023-06-01'))
+        writer.write([moved])
+        self.assertEqual(writer.unchanged, 10)
+        source = ShowSource.objects.get(event_id='3')
+        self.assertEqual(source.content_hash, moved['hash'])
+        self.assertEqual(source.show.show_date, moved['show_date'])
+
+    def test_writer_uses_same_number_of_queries_for_any_chunk_size(self):
+        records = [parse_event(make_event(str(n), artist=f'Artist {n}', local_date='2023-05-01')) for n in range(50)]
+        writer = ShowWriter(chunk_size=100)
+        writer.add(records)
+        # event hashes, savepoint, artists select + upsert + reselect, venues select + upsert + reselect,
+        # shows upsert + reselect, sources upsert, release
+        with self.assertNumQueries(12):
+            writer.flush()
+        self.assertEqual(Show.objects.count(), 50)
+
+
+class TestDeltaSync(TestCase):
+
+    def test_window_starts_at_last_sync(self):
+        start = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+        delta = DeltaSync('music:MN')
+        self.assertEqual(delta.window_start(start), start)  # first run fetches everything
+
+        delta.save()
+        delta = DeltaSync('music:MN')
+        self.assertEqual(delta.window_start(start), delta.state.last_synced_at - OVERLAP)
+
+    def test_unchanged_events_are_skipped_after_watermark_saved(self):
+        old = make_event('1', local_date='2023-05-01')
+        old['updated'] = '2023-01-01T00:00:00Z'
+        new = make_event('2', local_date='2023-05-02')
+        new['updated'] = '2023-02-01T00:00:00Z'
+        no_timestamp = make_event('3', local_date='2023-05-03')
+
+        delta = DeltaSync('music:MN')
+        records = [parse_event(old), parse_event(no_timestamp)]
+        self.assertEqual(len(delta.changed(records)), 2)
+        delta.save()
+        self.assertEqual(SyncState.objects.get(query_key='music:MN').last_changed_at,
+                         datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc))
+
+        delta = DeltaSync('music:MN')
+        records = [parse_event(old), parse_event(new), parse_event(no_timestamp)]
+        fresh = delta.changed(records)
+        self.assertEqual([r['event_id'] for r in fresh], ['2', '3'])
+        self.assertEqual(delta.skipped, 1)
+
+
+class TestNaturalKeyResolver(TestCase):
+
+    def test_resolver_loads_once_and_creates_missing_keys_in_one_batch(self):
+        existing = Venue.objects.create(name='First Avenue', city='Minneapolis', state='MN')
+        resolver = NaturalKeyResolver(Venue, ('name', 'city', 'state'))
+
+        keys = {('First Avenue', 'Minneapolis', 'MN'), ('Turf Club', 'St. Paul', 'MN'),
+                ('Fine Line', 'Minneapolis', 'MN')}
+        # load existing, upsert missing, look up the new pks
+        with self.assertNumQueries(3):
+            pks = resolver.resolve(keys)
+
+        self.assertEqual(pks[('First Avenue', 'Minneapolis', 'MN')], existing.pk)
+        self.assertEqual(pks[('Turf Club', 'St. Paul', 'MN')], Venue.objects.get(name='Turf Club').pk)
+        self.assertEqual(resolver.created, 2)
+
+        # Everything is known now, so no more queries
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve(keys), pks)
+
+    def test_writer_reuses_resolved_artists_and_venues_between_chunks(self):
+        writer = ShowWriter()
+        writer.write([parse_event(make_event('1', local_date='2023-05-01'))])
+        # savepoint, shows upsert + reselect, sources upsert, release
+        with self.assertNumQueries(5):
+            writer.write([parse_event(make_event('2', local_date='2023-05-02'))])
+        self.assertEqual(Show.objects.count(), 2)
+
+
+class TestEventStream(TestCase):
+
+    def page_json(self, events):
+        return json.dumps({
+            '_embedded': {'events': events},
+            '_links': {'self': {'href': '/discovery/v2/events?page=0'}},
+            'page': {'size': 200, 'totalElements': len(events), 'totalPages': 1, 'number': 0},
+        }).encode('utf-8')
+
+    def test_events_parsed_from_small_chunks(self):
+        events = [make_event(str(n), artist=f'Artist {n} ☃') for n in range(5)]
+        body = self.page_json(events)
+        # Chunks small enough to split events, and the multi-byte snowman, across reads
+        chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+
+        stream = EventStream(chunks)
+        self.assertEqual(list(stream), events)
+        self.assertEqual(stream.page['totalPages'], 1)
+
+    def test_parse_page_returns_records_and_page_info(self):
+        records, page = parse_page([self.page_json([make_event('1'), make_event('2')])])
+        self.assertEqual([r['event_id'] for r in records], ['1', '2'])
+        self.assertEqual(page['totalElements'], 2)
+
+    def test_response_with_no_events(self):
+        stream = EventStream([b'{"_links": {}, "page": {"totalElements": 0, "totalPages": 0}}'])
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.page['totalPages'], 0)
+
+    def test_truncated_response_is_an_error(self):
+        body = self.page_json([make_event('1'), make_event('2')])
+        with self.assertRaises(ValueError):
+            list(EventStream([body[:len(body) // 2]]))
+
+
+class TestRecordAndReplay(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_recorded_pages_replay_into_database(self):
+        page = json.dumps({
+            '_embedded': {'events': [make_event('1'), make_event('2', artist='ACDC')]},
+            'page': {'totalPages': 1},
+        }, indent=2).encode('utf-8')  # indent adds newlines, which must not split the page across lines
+
+        recorder = PageRecorder(self.directory, 'music-MN')
+        records, _ = parse_page(recorder.tee([page[:50], page[50:]]))
+        recorder.close()
+        self.assertEqual(len(records), 2)
+        self.assertEqual(recorder.pages, 1)
+
+        out = io.StringIO()
+        call_command('ticketmaster', replay=self.directory, stdout=out)
+        self.assertIn('Saved 2 events (2 new shows, 0 unchanged)', out.getvalue())
+        self.assertEqual(Show.objects.count(), 2)
+        self.assertTrue(Artist.objects.filter(name='ACDC').exists())
+
+
+class TestFakeDiscoveryServer(TestCase):
+
+    def test_catalog_pages_follow_api_rules(self):
+        catalog = FakeCatalog(size=300, states=['MN'])
+        first = catalog.page({'size': '100', 'page': '0', 'stateCode': 'MN'})
+        self.assertEqual(first['page']['totalElements'], 300)
+        self.assertEqual(first['page']['totalPages'], 3)
+        self.assertEqual(len(first['_embedded']['events']), 100)
+        self.assertIsNotNone(parse_event(first['_embedded']['events'][0]))
+        # page * size must stay under 1000, like the real API
+        self.assertIsNone(catalog.page({'size': '200', 'page': '5'}))
+
+    def test_import_every_page_from_fake_server(self):
+        # Every show in January, so the import is one shard of 5 pages
+        catalog = FakeCatalog(size=250, states=['MN'], days=28)
+        with FakeDiscoveryServer(catalog) as server:
+            out = io.StringIO()
+            call_command('ticketmaster', url=server.url, page_size=50, workers=3, rate=0, stdout=out,
+                         end=datetime.datetime(2022, 2, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(server.requests, 5)
+        self.assertIn('Saved 250 events', out.getvalue())
+        self.assertEqual(Show.objects.count(), len({
+            (record['show_date'], record['artist_name'], record['venue_name'])
+            for record in map(parse_event, catalog.page({'size': '250', 'page': '0'})['_embedded']['events'])
+        }))
+
+
+class TestTicketmasterClient(TestCase):
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        started = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        # The first call is free, the next five wait 1/50th of a second each
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_failed_requests_are_retried(self):
+        catalog = FakeCatalog(size=100, states=['MN'])
+        client = TicketmasterClient(rate=None, max_retries=20, backoff=0.001)
+        with FakeDiscoveryServer(catalog, error_rate=0.5) as server:
+            records, page = fetch_page(client, server.url, {'size': 100}, 0)
+        client.close()
+        self.assertEqual(len(records), 100)
+        self.assertEqual(client.retries, server.errors)
+
+    def test_error_raised_when_retries_run_out(self):
+        catalog = FakeCatalog(size=10)
+        client = TicketmasterClient(rate=None, max_retries=2, backoff=0.001)
+        with FakeDiscoveryServer(catalog, error_rate=1.0) as server:
+            with self.assertRaises(requests.exceptions.HTTPError):
+                fetch_page(client, server.url, {'size': 10}, 0)
+            self.assertEqual(server.requests, 3)
+        client.close()
+
+
+class TestShards(TestCase):
+
+    def test_shards_split_states_by_month(self):
+        start = datetime.datetime(2022, 11, 15, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime(2023, 2, 1, tzinfo=datetime.timezone.utc)
+        shards = make_shards(['MN', 'WI'], start, end)
+        self.assertEqual([s['key'] for s in shards], ['MN-2022-11', 'MN-2022-12', 'MN-2023-01',
+                                                      'WI-2022-11', 'WI-2022-12', 'WI-2023-01'])
+        self.assertEqual(shards[0]['start'], start)
+        self.assertEqual(shards[2]['end'], end)
+
+    def test_shards_arrive_a_page_at_a_time(self):
+        catalog = FakeCatalog(size=250, states=['MN'], days=28)
+        shards = make_shards(['MN'], datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+                             datetime.datetime(2022, 2, 1, tzinfo=datetime.timezone.utc))
+        settings = {'url': None, 'name': 'music', 'params': {'size': 50}, 'workers': 1, 'max_pages': None,
+                    'rate': None, 'max_retries': 0, 'record': None}
+        client = TicketmasterClient(rate=None)
+        with FakeDiscoveryServer(catalog) as server:
+            results = list(run_shards(shards, dict(settings, url=server.url), client=client))
+        client.close()
+        self.assertEqual([len(result['records']) for result in results], [50, 50, 50, 50, 50, 0])
+        self.assertEqual([result['done'] for result in results], [False] * 5 + [True])
+
+    def test_import_several_states_across_processes(self):
+        catalog = FakeCatalog(size=400, states=['MN', 'WI', 'IA'])
+        with FakeDiscoveryServer(catalog) as server:
+            out = io.StringIO()
+            call_command('ticketmaster', url=server.url, states=['MN', 'WI'], processes=2,
+                         start=datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+                         end=datetime.datetime(2022, 7, 1, tzinfo=datetime.timezone.utc),
+                         rate=0, stdout=out)
+
+        expected = catalog.search('MN', end=datetime.datetime(2022, 7, 1, tzinfo=datetime.timezone.utc))
+        expected += catalog.search('WI', end=datetime.datetime(2022, 7, 1, tzinfo=datetime.timezone.utc))
+        self.assertIn(f'Saved {len(expected)} events', out.getvalue())
+        # 6 months in each of 2 states, one page each
+        self.assertEqual(server.requests, 12)
+        self.assertEqual(set(Venue.objects.values_list('state', flat=True)), {'MN', 'WI'})
+
+
+class TestUpsert(TestCase):
+
+    def test_upsert_skips_rows_that_already_exist(self):
+        Artist.objects.create(name='REM')
+        created = upsert(Artist, [{'name': 'REM'}, {'name': 'ACDC'}, {'name': 'ACDC'}], ('name',))
+        self.assertEqual(created, 1)
+        self.assertEqual(sorted(Artist.objects.values_list('name', flat=True)), ['ACDC', 'REM'])
+
+    def test_upsert_can_update_clashing_rows(self):
+        SyncState.objects.create(query_key='music:MN')
+        changed_at = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+        upsert(SyncState, [{'query_key': 'music:MN', 'last_changed_at': changed_at},
+                           {'query_key': 'music:WI', 'last_changed_at': changed_at}],
+               ('query_key',), update_fields=('last_changed_at',))
+        self.assertEqual(SyncState.objects.count(), 2)
+        self.assertEqual(SyncState.objects.get(query_key='music:MN').last_changed_at, changed_at)
+
+    def test_shows_upserted_once(self):
+        artist = Artist.objects.create(name='REM')
+        venue = Venue.objects.create(name='First Avenue', city='Minneapolis', state='MN')
+        show_date = datetime.datetime(2023, 5, 1, 20, tzinfo=datetime.timezone.utc)
+        rows = [{'show_date': show_date, 'artist': artist.pk, 'venue': venue.pk}]
+        self.assertEqual(upsert(Show, rows, ('show_date', 'artist', 'venue')), 1)
+        self.assertEqual(upsert(Show, rows, ('show_date', 'artist', 'venue')), 0)
+        self.assertEqual(Show.objects.get().show_date, show_date)
@@ -1,6 +1,12 @@
 from django.test import TestCase
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.db import IntegrityError
+from django.core.management import call_command
+
+import io
+
+from lmn.models import Note, Show
 
 
 class TestUser(TestCase):
@@ -20,3 +26,103 @@ class TestUser(TestCase):
         user2 = User(username='bob', email='bob@bob.com', first_name='bob', last_name='bob')
         with self.assertRaises(IntegrityError):
             user2.save()
+
+
+class TestShowNoteAggregates(TestCase):
+
+    fixtures = ['testing_users', 'testing_artists', 'testing_venues', 'testing_shows']
+
+    def setUp(self):
+        self.show = Show.objects.get(pk=1)
+        self.user = User.objects.get(pk=1)
+        self.other_user = User.objects.get(pk=2)
+
+    def test_saving_notes_updates_show_totals(self):
+        Note(show=self.show, user=self.user, title='a', text='a', rating=5).save()
+        Note(show=self.show, user=self.other_user, title='b', text='b', rating=2).save()
+
+        self.show.refresh_from_db()
+        self.assertEqual(self.show.note_count, 2)
+        self.assertEqual(self.show.rating_sum, 7)
+        self.assertEqual(self.show.average_rating, 3.5)
+        self.assertEqual(self.show.rating_histogram, [(1, 0), (2, 1), (3, 0), (4, 0), (5, 1)])
+
+    def test_editing_rating_moves_it_in_histogram(self):
+        Note(show=self.show, user=self.user, title='a', text='a', rating=5).save()
+
+        note = Note.objects.get(user=self.user, show=self.show)
+        note.rating = 1
+        note.save()
+        note.title = 'just the title changed'
+        note.save()
+
+        self.show.refresh_from_db()
+        self.assertEqual(self.show.note_count, 1)
+        self.assertEqual(self.show.rating_sum, 1)
+        self.assertEqual(self.show.rating_5_count, 0)
+        self.assertEqual(self.show.rating_1_count, 1)
+
+    def test_second_note_for_a_show_is_a_validation_error(self):
+        Note(show=self.show, user=self.user, title='a', text='a', rating=4).save()
+        with self.assertRaises(ValidationError) as raised:
+            Note(show=self.show, user=self.user, title='b', text='b', rating=2).save()
+        self.assertEqual(raised.exception.code, 'duplicate_note')
+
+        self.show.refresh_from_db()
+        self.assertEqual(self.show.note_count, 1)
+
+    def test_other_integrity_errors_are_not_reported_as_duplicates(self):
+        with self.assertRaises(IntegrityError):
+            Note(show=self.show, user=self.user, title=None, text='a', rating=4).save()
+
+    def test_deleting_note_updates_show_totals(self):
+        Note(show=self.show, user=self.user, title='a', text='a', rating=4).save()
+        Note.objects.get(user=self.user, show=self.show).delete()
+
+        self.show.refresh_from_db()
+        self.assertEqual(self.show.note_count, 0)
+        self.assertEqual(self.show.rating_sum, 0)
+        self.assertEqual(self.show.rating_4_count, 0)
+        self.assertIsNone(self.show.average_rating)
+
+    def test_deleting_a_user_takes_their_notes_out_of_show_totals(self):
+        Note(show=self.show, user=self.user, title='a', text='a', rating=4).save()
+        Note(show=self.show, user=self.other_user, title='b', text='b', rating=2).save()
+        self.user.delete()
+
+        self.show.refresh_from_db()
+        self.assertEqual((self.show.note_count, self.show.rating_sum, self.show.rating_4_count), (1, 2, 0))
+
+    def test_deleting_a_queryset_of_notes_updates_show_totals(self):
+        Note(show=self.show, user=self.user, title='a', text='a', rating=4).save()
+        Note(show=self.show, user=self.other_user, title='b', text='b', rating=2).save()
+        Note.objects.filter(show=self.show).delete()
+
+        self.show.refresh_from_db()
+        self.assertEqual((self.show.note_count, self.show.rating_sum), (0, 0))
+
+    def test_notes_read_without_their_rating_can_be_saved_and_deleted(self):
+        Note(show=self.show, user=self.user, title='a', text='a', rating=4).save()
+
+        note = Note.objects.only('pk', 'show', 'title').get(user=self.user)
+        note.rating = 5
+        note.save()
+        self.show.refresh_from_db()
+        self.assertEqual((self.show.note_count, self.show.rating_sum, self.show.rating_4_count), (1, 5, 0))
+
+        Note.objects.defer('rating').get(user=self.user).delete()
+        self.show.refresh_from_db()
+        self.assertEqual((self.show.note_count, self.show.rating_sum, self.show.rating_5_count), (0, 0, 0))
+
+    def test_rebuild_command_fixes_totals(self):
+        Note(show=self.show, user=self.user, title='a', text='a', rating=4).save()
+        Show.objects.update(note_count=10, rating_sum=0)
+
+        out = io.StringIO()
+        call_command('rebuild_show_aggregates', chunk_size=2, stdout=out)
+        self.assertIn('Fixed note totals for 4 shows', out.getvalue())
+
+        self.show.refresh_from_db()
+        self.assertEqual(self.show.note_count, 1)
+        self.assertEqual(self.show.rating_sum, 4)
+        self.assertEqual(self.show.rating_4_count, 1)
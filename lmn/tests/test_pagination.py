@@ -0,0 +1,117 @@
+from django.test import TestCase, RequestFactory
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+import base64
+import datetime
+import json
+
+from lmn.models import Artist, Note, Show, Venue
+from lmn.pagination import paginate
+from lmn.tests.rows import add_rows
+
+
+class TestPaginate(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        Artist.objects.bulk_create([Artist(name=f'Band {number:02}') for number in range(45)])
+
+    def page(self, **params):
+        return paginate(self.factory.get('/', params), Artist.objects.all(), ['name'])
+
+    def follow(self, page, direction):
+        """ The page a next or previous link goes to. """
+        query = page.next_query if direction == 'next' else page.previous_query
+        request = self.factory.get('/?' + query)
+        return paginate(request, Artist.objects.all(), ['name'])
+
+    def names(self, page):
+        return [artist.name for artist in page]
+
+    def test_pages_forward_through_every_row_once(self):
+        first = self.page()
+        second = self.follow(first, 'next')
+        third = self.follow(second, 'next')
+
+        self.assertEqual([len(first), len(second), len(third)], [20, 20, 5])
+        self.assertEqual(self.names(first) + self.names(second) + self.names(third),
+                         [f'Band {number:02}' for number in range(45)])
+        self.assertFalse(first.has_previous)
+        self.assertTrue(second.has_previous and second.has_next)
+        self.assertFalse(third.has_next)
+
+    def test_previous_page_is_the_same_page(self):
+        first = self.page()
+        second = self.follow(first, 'next')
+        third = self.follow(second, 'next')
+        self.assertEqual(self.names(self.follow(third, 'previous')), self.names(second))
+
+        back_to_first = self.follow(second, 'previous')
+        self.assertEqual(self.names(back_to_first), self.names(first))
+        self.assertFalse(back_to_first.has_previous)
+        self.assertTrue(back_to_first.has_next)
+
+    def test_links_keep_other_parameters(self):
+        page = self.page(search_name='band', after='not-a-cursor')
+        self.assertEqual(self.names(page)[0], 'Band 00')
+        self.assertIn('search_name=band', page.next_query)
+        self.assertNotIn('not-a-cursor', page.next_query)
+
+    def test_cursor_that_cant_be_read_gives_the_first_page(self):
+        for cursor in ['', 'not-a-cursor', 'WzEsIDJd', 'eyJhIjogMX0']:
+            self.assertEqual(self.names(self.page(after=cursor))[0], 'Band 00')
+
+    def test_ties_on_the_sort_key_are_split_by_id(self):
+        artist = Artist.objects.first()
+        date = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        for number in range(30):
+            venue = Venue.objects.create(name=f'Venue {number}', city='Minneapolis', state='MN')
+            Show.objects.create(show_date=date, artist=artist, venue=venue)
+
+        ordering = ['-show_date', '-pk']
+        first = paginate(self.factory.get('/'), Show.objects.all(), ordering)
+        second = paginate(self.factory.get('/?' + first.next_query), Show.objects.all(), ordering)
+        self.assertEqual([show.pk for show in list(first) + list(second)],
+                         list(Show.objects.order_by('-pk').values_list('pk', flat=True)))
+
+
+class TestPaginatedViews(TestCase):
+
+    fixtures = ['testing_users', 'testing_artists', 'testing_venues', 'testing_shows', 'testing_notes']
+
+    def test_venue_list_next_link(self):
+        Venue.objects.bulk_create([Venue(name=f'Club {number:02}', city='Duluth', state='MN') for number in range(25)])
+        response = self.client.get(reverse('venue_list'))
+        self.assertEqual(len(response.context['venues']), 20)
+        self.assertContains(response, 'id="next-page"')
+        self.assertNotContains(response, 'id="previous-page"')
+
+        response = self.client.get(reverse('venue_list') + '?' + response.context['page'].next_query)
+        self.assertEqual([venue.name for venue in response.context['venues']][-3:],
+                         ['First Avenue', 'Target Center', 'The Turf Club'])
+        self.assertContains(response, 'id="previous-page"')
+        self.assertNotContains(response, 'id="next-page"')
+
+    def test_cursor_with_a_number_too_big_to_store_gives_the_first_page(self):
+        date = '2019-01-01T00:00:00+00:00'
+        for url, values in [(reverse('show_list'), [date, 10 ** 30]),
+                            (reverse('show_list') + '?sort=popular', [10 ** 30, date, 1]),
+                            (reverse('latest_notes'), [date, -10 ** 30])]:
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+            separator = '&' if '?' in url else '?'
+            response = self.client.get(url + separator + 'after=' + cursor)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.context['page']), list(self.client.get(url).context['page']))
+
+    def test_user_profile_pages_notes(self):
+        user = User.objects.get(pk=1)
+        add_rows()
+
+        response = self.client.get(reverse('user_profile', kwargs={'user_pk': 1}))
+        first = [note.pk for note in response.context['notes']]
+        next_query = response.context['page'].next_query
+        response = self.client.get(reverse('user_profile', kwargs={'user_pk': 1}) + '?' + next_query)
+        second = [note.pk for note in response.context['notes']]
+        self.assertEqual(first + second, list(Note.objects.filter(user=user).order_by('-posted_date', '-pk')
+                                              .values_list('pk', flat=True)))
@@ -0,0 +1,70 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from lmn.models import Venue
+from lmn.tests.rows import add_rows
+
+
+class TestListQueryCounts(TestCase):
+    """ Each page makes the same number of queries whether it lists a few rows or a full page,
+    so nothing in a template reads a related object one row at a time.
+
+    The tests don't cache cards (see lmn/cards.py), so the pages with cards read the page's versions
+    and then every card in full. """
+
+    fixtures = ['testing_users', 'testing_artists', 'testing_venues', 'testing_shows', 'testing_notes']
+
+    def assert_constant_queries(self, url, queries, login=False, rows='page'):
+        if login:
+            self.client.force_login(User.objects.get(pk=1))
+        with self.assertNumQueries(queries):
+            few = self.client.get(url)
+        self.assertEqual(few.status_code, 200)
+
+        add_rows()
+        with self.assertNumQueries(queries):
+            many = self.client.get(url)
+        self.assertGreater(len(many.context[rows] or []), len(few.context[rows] or []))
+
+    def test_latest_notes(self):
+        self.assert_constant_queries(reverse('latest_notes'), 2)
+
+    def test_latest_notes_logged_in(self):
+        # The session and the user
+        self.assert_constant_queries(reverse('latest_notes'), 4, login=True)
+
+    def test_notes_for_show(self):
+        # The session and the user, then the show, whether the user has written a note for it, and the notes
+        self.assert_constant_queries(reverse('notes_for_show', kwargs={'show_pk': 1}), 5, login=True)
+
+    def test_user_profile(self):
+        self.assert_constant_queries(reverse('user_profile', kwargs={'user_pk': 1}), 3)
+
+    def test_show_list(self):
+        self.assert_constant_queries(reverse('show_list'), 2)
+
+    def test_show_list_most_popular(self):
+        self.assert_constant_queries(reverse('show_list') + '?sort=popular', 2)
+
+    def test_venues_for_artist(self):
+        # The artist, then the upcoming and the past shows
+        self.assert_constant_queries(reverse('venues_for_artist', kwargs={'artist_pk': 1}), 3)
+
+    def test_artists_at_venue(self):
+        self.assert_constant_queries(reverse('artists_at_venue', kwargs={'venue_pk': 1}), 3)
+
+    def test_artist_list(self):
+        self.assert_constant_queries(reverse('artist_list'), 1)
+
+    def test_venue_list(self):
+        self.assert_constant_queries(reverse('venue_list'), 1)
+
+    def test_note_search(self):
+        # The matching ids, their snippets, then the notes
+        self.assert_constant_queries(reverse('note_search') + '?search_text=ok', 3, rows='notes')
+
+    def test_shows_near(self):
+        # The venues nearby, then their shows
+        Venue.objects.create(name='Sacred Heart', city='Duluth', state='MN')
+        self.assert_constant_queries(reverse('shows_near') + '?city=Duluth&state=MN&miles=10', 2)
@@ -0,0 +1,102 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from django.contrib.auth.models import User
+
+from lmn.tests.rows import add_rows
+
+import re
+import unittest
+
+
+# A full scan of one of our tables, e.g. 'SCAN lmn_note', but not 'SCAN lmn_note USING INDEX ...'
+# which walks an index in order and can stop early, or a search table lookup like
+# 'SCAN lmn_artist_name_search VIRTUAL TABLE INDEX 0:M1' where M1 is a MATCH on the FTS index.
+FULL_SCAN = re.compile(r'\bSCAN lmn_\w+\b(?! USING| VIRTUAL TABLE INDEX \d+:\w)')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite\'s EXPLAIN QUERY PLAN')
+class TestListQueryPlans(TestCase):
+    """ Run EXPLAIN QUERY PLAN on every query a page makes, and fail if any of them
+    scans a whole lmn table or sorts in a temporary b-tree instead of using an index. """
+
+    fixtures = ['testing_users', 'testing_artists', 'testing_venues', 'testing_shows', 'testing_notes']
+
+    def assert_index_only(self, url, sorts_matches=False):
+        """ sorts_matches allows a temporary b-tree to sort search results, which only holds the matching rows. """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'lmn_' not in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+
+            self.assertNotRegex(plan, FULL_SCAN, f'Full table scan for {url}:\n{sql}\n{plan}')
+            if not sorts_matches:
+                self.assertNotIn(TEMP_SORT, plan, f'Sort without an index for {url}:\n{sql}\n{plan}')
+
+    def test_latest_notes(self):
+        self.assert_index_only(reverse('latest_notes'))
+
+    def test_notes_for_show(self):
+        self.client.force_login(User.objects.first())
+        self.assert_index_only(reverse('notes_for_show', kwargs={'show_pk': 1}))
+
+    def test_user_profile(self):
+        self.assert_index_only(reverse('user_profile', kwargs={'user_pk': 1}))
+
+    def test_venues_for_artist(self):
+        self.assert_index_only(reverse('venues_for_artist', kwargs={'artist_pk': 1}))
+
+    def test_artists_at_venue(self):
+        self.assert_index_only(reverse('artists_at_venue', kwargs={'venue_pk': 1}))
+
+    def test_show_list(self):
+        self.assert_index_only(reverse('show_list'))
+
+    def test_show_list_most_popular(self):
+        self.assert_index_only(reverse('show_list') + '?sort=popular')
+
+    def test_artist_list(self):
+        self.assert_index_only(reverse('artist_list'))
+
+    def test_venue_list(self):
+        self.assert_index_only(reverse('venue_list'))
+
+    def test_artist_search(self):
+        self.assert_index_only(reverse('artist_list') + '?search_name=acd', sorts_matches=True)
+
+    def test_venue_search(self):
+        self.assert_index_only(reverse('venue_list') + '?search_name=turf', sorts_matches=True)
+
+    def test_show_search(self):
+        self.assert_index_only(reverse('show_list') + '?search_artist=acd&search_venue=first', sorts_matches=True)
+
+    def test_shows_near(self):
+        self.assert_index_only(reverse('shows_near') + '?city=Minneapolis&state=MN&miles=25', sorts_matches=True)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Query plans are checked with SQLite\'s EXPLAIN QUERY PLAN')
+class TestLaterPageQueryPlans(TestListQueryPlans):
+    """ The same checks on the second page of each list, which seeks past the end of the first page. """
+
+    def setUp(self):
+        add_rows()
+
+    def assert_index_only(self, url, sorts_matches=False):
+        response = self.client.get(url)
+        page = response.context['page']
+        if page.has_next:
+            url = url.split('?')[0] + '?' + page.next_query
+        else:
+            # Only searches have too few rows for a second page
+            self.assertTrue(sorts_matches, f'No second page for {url}')
+        super().assert_index_only(url, sorts_matches)
@@ -0,0 +1,101 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from lmn import response_cache
+from lmn.models import Artist, Note, Show, Venue
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-responses'},
+    'cards': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+})
+class TestResponseCache(TestCase):
+
+    fixtures = ['testing_users', 'testing_artists', 'testing_venues', 'testing_shows', 'testing_notes']
+
+    def setUp(self):
+        response_cache.clear()
+
+    def assert_cached(self, url):
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assert_not_cached(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertTrue(queries, f'{url} was served from the cache')
+        return response
+
+    def test_pages_are_cached_for_anonymous_visitors(self):
+        for url in [reverse('latest_notes'), reverse('show_list'), reverse('notes_for_show', kwargs={'show_pk': 1}),
+                    reverse('artist_detail', kwargs={'artist_pk': 1}), reverse('venue_detail', kwargs={'venue_pk': 1})]:
+            first = self.client.get(url)
+            self.assertEqual(self.assert_cached(url).content, first.content)
+
+    def test_query_strings_are_cached_separately(self):
+        url = reverse('show_list')
+        self.client.get(url)
+        self.assertContains(self.client.get(url, {'sort': 'popular'}), 'sort=popular')
+        self.assert_cached(url)
+        self.assert_cached(url + '?sort=popular')
+
+    def test_logged_in_visitors_are_not_cached(self):
+        self.client.force_login(User.objects.get(pk=1))
+        url = reverse('latest_notes')
+        self.client.get(url)
+        self.assertContains(self.client.get(url), 'You are logged in')
+
+    def test_saving_a_note_invalidates_the_pages_it_is_on(self):
+        latest, show_1, show_2 = (reverse('latest_notes'), reverse('notes_for_show', kwargs={'show_pk': 1}),
+                                  reverse('notes_for_show', kwargs={'show_pk': 2}))
+        for url in [latest, latest + '?sort=any', show_1, show_2]:
+            self.client.get(url)
+
+        Note.objects.create(show=Show.objects.get(pk=1), user=User.objects.get(pk=3), title='Encore', text='loud')
+
+        self.assertContains(self.client.get(latest), 'Encore')
+        self.assert_not_cached(latest + '?sort=any')
+        self.assertContains(self.client.get(show_1), 'loud')
+        self.assert_cached(show_2)
+
+        Note.objects.get(title='Encore').delete()
+        self.assertNotContains(self.client.get(latest), 'Encore')
+
+    def test_renaming_an_artist_or_venue_invalidates_pages_with_their_name(self):
+        show = Show.objects.get(pk=1)
+        other_artist = Artist.objects.exclude(pk=show.artist_id).first()
+        notes_url = reverse('notes_for_show', kwargs={'show_pk': 1})
+        artist_url = reverse('artist_detail', kwargs={'artist_pk': show.artist_id})
+        other_url = reverse('artist_detail', kwargs={'artist_pk': other_artist.pk})
+        for url in [notes_url, artist_url, other_url]:
+            self.client.get(url)
+
+        artist = Artist.objects.get(pk=show.artist_id)
+        artist.name = 'Renamed Band'
+        artist.save()
+        self.assertContains(self.client.get(notes_url), 'Renamed Band')
+        self.assertContains(self.client.get(artist_url), 'Renamed Band')
+        self.assert_cached(other_url)
+
+        venue = Venue.objects.get(pk=show.venue_id)
+        venue.name = 'Renamed Club'
+        venue.save()
+        self.assertContains(self.client.get(notes_url), 'Renamed Club')
+
+    def test_new_shows_invalidate_the_show_list(self):
+        url = reverse('show_list')
+        self.client.get(url)
+        Show.objects.create(show_date=Show.objects.get(pk=1).show_date, artist=Artist.objects.get(pk=3),
+                            venue=Venue.objects.get(pk=1))
+        self.assert_not_cached(url)
+
+    def test_missing_pages_are_not_cached(self):
+        url = reverse('artist_detail', kwargs={'artist_pk': 100})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assert_not_cached(url)
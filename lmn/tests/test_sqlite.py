@@ -0,0 +1,151 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+import os
+import sqlite3
+import tempfile
+import threading
+from io import StringIO
+
+from lmn.backends.sqlite3.base import DatabaseWrapper
+from lmn.models import Artist, Show
+from lmn.write_queue import WriteQueue
+
+
+class TestTunedSQLiteBackend(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tuned.sqlite3')
+
+    def connect(self, **pragmas):
+        settings = dict(connection.settings_dict, NAME=self.path, PRAGMAS=pragmas)
+        wrapper = DatabaseWrapper(settings, alias='tuned')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_every_connection_is_tuned(self):
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -65536)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 20000)
+        self.assertEqual(self.pragma(wrapper, 'foreign_keys'), 1)
+
+    def test_settings_change_pragmas(self):
+        wrapper = self.connect(busy_timeout=250, mmap_size=0)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 250)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 0)
+
+        with self.assertRaises(ImproperlyConfigured):
+            self.connect(journal_mode='WAL; DROP TABLE lmn_show').cursor()
+
+    def test_transactions_take_the_write_lock_when_they_start(self):
+        wrapper = self.connect()
+        wrapper.ensure_connection()
+        wrapper._start_transaction_under_autocommit()
+        try:
+            other = sqlite3.connect(self.path, timeout=0)
+            self.addCleanup(other.close)
+            with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+                other.execute('BEGIN IMMEDIATE')
+            # Readers aren't blocked by the writer
+            other.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        finally:
+            wrapper.connection.rollback()
+
+
+class TestWriteQueue(TransactionTestCase):
+
+    def test_writes_run_in_order_on_one_writer_thread(self):
+        threads = set()
+
+        def write(name):
+            threads.add(threading.current_thread())
+            self.assertTrue(connection.in_atomic_block)
+            Artist.objects.create(name=name)
+
+        with WriteQueue(max_pending=2) as writes:
+            for number in range(10):
+                writes.submit(write, f'Band {number}')
+            writes.wait()
+            self.assertEqual(list(Artist.objects.order_by('pk').values_list('name', flat=True)),
+                             [f'Band {number}' for number in range(10)])
+
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual(writes.writes, 10)
+
+    def test_failed_write_stops_the_queue(self):
+        writes = WriteQueue()
+        writes.submit(Artist.objects.create, name='REM')
+        writes.submit(Artist.objects.create, name='REM')  # breaks the unique name constraint
+        writes.submit(Artist.objects.create, name='Yes')
+        with self.assertRaises(Exception):
+            writes.close()
+        with self.assertRaises(Exception):
+            writes.submit(Artist.objects.create, name='ACDC')
+        self.assertEqual(list(Artist.objects.values_list('name', flat=True)), ['REM'])
+
+    def test_locked_database_is_retried(self):
+        attempts = []
+
+        def write():
+            attempts.append(1)
+            Artist.objects.create(name=f'Attempt {len(attempts)}')
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+
+        with WriteQueue() as writes:
+            writes.submit(write)
+        self.assertEqual(list(Artist.objects.values_list('name', flat=True)), ['Attempt 2'])
+
+    def test_writes_join_the_callers_transaction(self):
+        with transaction.atomic():
+            writes = WriteQueue()
+            writes.submit(Artist.objects.create, name='REM')
+            self.assertTrue(Artist.objects.filter(name='REM').exists())
+            writes.close()
+
+    def use_file_database(self):
+        """ Point the default database at a file holding a copy of the test database, for the rest of the test.
+
+        The in-memory test database shares one cache between connections, with table locks that fail at once,
+        so a thread can't read a table another thread is writing. A file in WAL mode lets them, like the site's. """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'test.sqlite3')
+        connection.ensure_connection()
+        copy = sqlite3.connect(path)
+        connection.connection.backup(copy)
+        copy.close()
+
+        # Closing an in-memory database would lose it, so it's put aside and the file is opened instead
+        memory, name = connection.connection, connection.settings_dict['NAME']
+        connection.connection = None
+        connection.settings_dict['NAME'] = path
+
+        def restore():
+            connection.settings_dict['NAME'] = name
+            connection.connection.close()
+            connection.connection = memory
+        self.addCleanup(restore)
+
+    def test_rebuild_show_aggregates_command_saves_through_the_queue(self):
+        call_command('loaddata', 'testing_users', 'testing_artists', 'testing_venues', 'testing_shows',
+                     'testing_notes', verbosity=0)
+        Show.objects.update(note_count=99)
+        self.use_file_database()
+        out = StringIO()
+        # Chunks are counted on this thread while the writer thread saves the last one
+        call_command('rebuild_show_aggregates', '--chunk-size', '2', stdout=out)
+        self.assertIn(f'Fixed note totals for {Show.objects.count()} shows', out.getvalue())
+        self.assertFalse(Show.objects.filter(note_count=99).exists())
@@ -138,50 +138,78 @@ class TestArtistViews(TestCase):
         response = self.client.get(url)
 
         
-        shows = list(response.context['future_shows'])
+        shows = list(response.context['past'])
         show1, show2 = shows[0], shows[1]
         
         self.assertEqual(2, len(shows))
 
-        self.assertEqual(show1['show'].artist.name, 'REM')
-        self.assertEqual(show1['show'].venue.name, 'The Turf Club')
+        self.assertEqual(show1.artist.name, 'REM')
+        self.assertEqual(show1.venue.name, 'The Turf Club')
 
         # From the fixture, show 2's "show_date": "2017-02-02T19:30:00-06:00"
         expected_date = datetime.datetime(2017, 2, 2, 19, 30, 0, tzinfo=timezone.utc)
-        self.assertEqual(show1['show'].show_date, expected_date)
+        self.assertEqual(show1.show_date, expected_date)
         
 
         # from the fixture, show 1's "show_date": "2017-01-02T17:30:00-00:00",
-        self.assertEqual(show2['show'].artist.name, 'REM')
-        self.assertEqual(show2['show'].venue.name, 'The Turf Club')
+        self.assertEqual(show2.artist.name, 'REM')
+        self.assertEqual(show2.venue.name, 'The Turf Club')
         expected_date = datetime.datetime(2017, 1, 2, 17, 30, 0, tzinfo=timezone.utc)
-        self.assertEqual(show2['show'].show_date, expected_date)
+        self.assertEqual(show2.show_date, expected_date)
 
         # Artist 2 (ACDC) has played at venue 1 (First Ave)
 
         url = reverse('venues_for_artist', kwargs={'artist_pk': 2})
         response = self.client.get(url)
-        shows = list(response.context['future_shows'])
+        shows = list(response.context['past'])
         show1, show2 = shows[0], shows[1]
         self.assertEqual(2, len(shows))
 
         # This show has "show_date": "2017-01-21T21:45:00-00:00",
-        self.assertEqual(show1['show'].artist.name, 'ACDC')
-        self.assertEqual(show1['show'].venue.name, 'First Avenue')
+        self.assertEqual(show1.artist.name, 'ACDC')
+        self.assertEqual(show1.venue.name, 'First Avenue')
         
         expected_date = datetime.datetime(2024, 2, 2, 19, 30, tzinfo=timezone.utc)
-        self.assertEqual(show1['show'].show_date, expected_date)
+        self.assertEqual(show1.show_date, expected_date)
         
         expected_date = datetime.datetime(2017, 1, 21, 21, 45, 0, tzinfo=timezone.utc)
-        self.assertEqual(show2['show'].show_date, expected_date)
+        self.assertEqual(show2.show_date, expected_date)
         
         # Artist 3, no shows
 
         url = reverse('venues_for_artist', kwargs={'artist_pk': 3})
         response = self.client.get(url)
-        shows = list(response.context['future_shows'])
+        shows = list(response.context['past'])
         self.assertEqual(0, len(shows))
 
+    def test_venues_for_artist_lists_upcoming_and_past_shows_separately(self):
+        artist = Artist.objects.get(pk=1)
+        venue = Venue.objects.get(pk=1)
+        for days in range(1, 26):
+            Show.objects.create(show_date=timezone.now() + datetime.timedelta(days=days), artist=artist, venue=venue)
+
+        url = reverse('venues_for_artist', kwargs={'artist_pk': 1})
+        response = self.client.get(url)
+        upcoming, past = response.context['upcoming'], response.context['past']
+
+        # Soonest first, flagged by the database, and paged on their own
+        self.assertEqual(20, len(upcoming))
+        self.assertTrue(all(show.future for show in upcoming))
+        self.assertEqual(sorted(show.show_date for show in upcoming), [show.show_date for show in upcoming])
+        self.assertTrue(upcoming.has_next)
+        self.assertEqual(2, len(past))
+        self.assertFalse(any(show.future for show in past))
+        self.assertContains(response, 'id="upcoming_next-page"')
+
+        # The next page of upcoming shows leaves the past shows on their first page
+        response = self.client.get(url + '?' + upcoming.next_query)
+        self.assertEqual(5, len(response.context['upcoming']))
+        self.assertEqual(list(past), list(response.context['past']))
+
+    def test_venues_for_artist_that_does_not_exist_returns_404(self):
+        response = self.client.get(reverse('venues_for_artist', kwargs={'artist_pk': 10}))
+        self.assertEqual(response.status_code, 404)
+
 
 class TestVenues(TestCase):
     fixtures = ['testing_venues', 'testing_artists', 'testing_shows']
@@ -248,52 +276,56 @@ class TestVenues(TestCase):
         response = self.client.get(reverse('venue_detail', kwargs={'venue_pk': 10}))
         self.assertEqual(response.status_code, 404)
 
+    def test_artists_at_venue_that_does_not_exist_returns_404(self):
+        response = self.client.get(reverse('artists_at_venue', kwargs={'venue_pk': 10}))
+        self.assertEqual(response.status_code, 404)
+
     def test_artists_played_at_venue_most_recent_first(self):
         # Artist 1 (REM) has played at venue 2 (Turf Club) on two dates
 
         url = reverse('artists_at_venue', kwargs={'venue_pk': 2})
         response = self.client.get(url)
-        shows = list(response.context['future_shows'])
+        shows = list(response.context['past'])
         show1, show2 = shows[0], shows[1]
         self.assertEqual(2, len(shows))
 
-        self.assertEqual(show1['show'].artist.name, 'REM')
-        self.assertEqual(show1['show'].venue.name, 'The Turf Club')
+        self.assertEqual(show1.artist.name, 'REM')
+        self.assertEqual(show1.venue.name, 'The Turf Club')
 
         expected_date = datetime.datetime(2017, 2, 2, 19, 30, 0, tzinfo=timezone.utc)
-        self.assertEqual(show1['show'].show_date, expected_date)
+        self.assertEqual(show1.show_date, expected_date)
 
-        self.assertEqual(show2['show'].artist.name, 'REM')
-        self.assertEqual(show2['show'].venue.name, 'The Turf Club')
+        self.assertEqual(show2.artist.name, 'REM')
+        self.assertEqual(show2.venue.name, 'The Turf Club')
         expected_date = datetime.datetime(2017, 1, 2, 17, 30, 0, tzinfo=timezone.utc)
-        self.assertEqual(show2['show'].show_date, expected_date)
+        self.assertEqual(show2.show_date, expected_date)
 
         # Artist 2 (ACDC) has played at venue 1 (First Ave)
 
         url = reverse('artists_at_venue', kwargs={'venue_pk': 1})
         response = self.client.get(url)
-        shows = list(response.context['future_shows'])
+        shows = list(response.context['past'])
         show1 , show2= shows[0], shows[1]
         self.assertEqual(2, len(shows))
 
-        self.assertEqual(show1['show'].artist.name, 'ACDC')
-        self.assertEqual(show1['show'].venue.name, 'First Avenue')
+        self.assertEqual(show1.artist.name, 'ACDC')
+        self.assertEqual(show1.venue.name, 'First Avenue')
         
-        self.assertEqual(show1['show'].artist.name, 'ACDC')
-        self.assertEqual(show1['show'].venue.name, 'First Avenue')
+        self.assertEqual(show1.artist.name, 'ACDC')
+        self.assertEqual(show1.venue.name, 'First Avenue')
         
         expected_date = datetime.datetime(2017, 1, 21, 21, 45, 0, tzinfo=timezone.utc)
-        self.assertEqual(show2['show'].show_date, expected_date)
+        self.assertEqual(show2.show_date, expected_date)
         
         expected_date = datetime.datetime(2024, 2, 2, 19, 30, tzinfo=timezone.utc)
-        self.assertEqual(show1['show'].show_date, expected_date)
+        self.assertEqual(show1.show_date, expected_date)
 
 
         # Venue 3 has not had any shows
 
         url = reverse('artists_at_venue', kwargs={'venue_pk': 3})
         response = self.client.get(url)
-        shows = list(response.context['future_shows'])
+        shows = list(response.context['past'])
         self.assertEqual(0, len(shows))
 
     def test_correct_template_used_for_venues(self):
@@ -1005,3 +1037,165 @@ class TestNoteDeletionAndPhotoIsDeletedInMediaAsWell(TestCase):
 
         # Photo should be gone from storage(Media folder/user_images)
         self.assertFalse(default_storage.exists(new_note.photo.name))
+
+
+class TestNewNoteWritePath(TestCase):
+
+    fixtures = ['testing_users', 'testing_artists', 'testing_shows', 'testing_venues', 'testing_notes']
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+        self.client.force_login(self.user)
+
+    def test_new_note_post_does_not_check_for_existing_note_first(self):
+        new_note_url = reverse('new_note', kwargs={'show_pk': 3})
+        show = Show.objects.get(pk=3)
+        # Fetching the show to check its date and showing the new note are fine, but the note and
+        # the show's note totals should be written without looking for an existing note
+        with self.assertNumQueries(7):
+            # session, user, show, savepoint, insert note, update show totals, release savepoint
+            self.client.post(new_note_url, {'text': 'ok', 'title': 'blah blah', 'rating': 5})
+        self.assertEqual(Note.objects.filter(user=self.user, show=show).count(), 1)
+
+    def test_second_note_for_same_show_rejected_by_database(self):
+        new_note_url = reverse('new_note', kwargs={'show_pk': 1})  # user 1 already has a note for show 1
+        response = self.client.post(new_note_url, {'text': 'again', 'title': 'again', 'rating': 5})
+        self.assertContains(response, 'You can only create one note per show')
+        self.assertEqual(Note.objects.filter(user=self.user, show=1).count(), 1)
+
+    def test_note_save_raises_validation_error_for_duplicate(self):
+        from django.core.exceptions import ValidationError
+        note = Note(user=self.user, show=Show.objects.get(pk=1), title='again', text='again')
+        with self.assertRaises(ValidationError):
+            note.save()
+
+
+class TestNoteSearch(TestCase):
+
+    fixtures = ['testing_users', 'testing_artists', 'testing_shows', 'testing_venues', 'testing_notes']
+
+    def search(self, text, after=None):
+        params = {'search_text': text}
+        if after:
+            params['after'] = after
+        return self.client.get(reverse('note_search'), params)
+
+    def test_no_search_text_shows_form_only(self):
+        response = self.search('')
+        self.assertTemplateUsed(response, 'lmn/notes/note_search.html')
+        self.assertEqual(response.context['notes'], [])
+
+    def test_search_finds_notes_by_title_and_text(self):
+        response = self.search('awesome')
+        self.assertEqual([note.pk for note in response.context['notes']], [2])
+        response = self.search('kinda')
+        self.assertEqual([note.pk for note in response.context['notes']], [1])
+
+    def test_search_needs_every_word(self):
+        response = self.search('kinda awesome')
+        self.assertEqual(response.context['notes'], [])
+
+    def test_operators_in_search_text_are_plain_words(self):
+        response = self.search('ok OR "awesome')
+        self.assertEqual([note.pk for note in response.context['notes']], [])
+        response = self.search('ok AND')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cursor_with_an_id_too_big_to_store_gives_the_first_page(self):
+        response = self.search('ok', after='1.0_999999999999999999999999999999')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['notes'], self.search('ok').context['notes'])
+
+    def test_title_match_ranks_above_text_match(self):
+        show = Show.objects.get(pk=2)
+        in_text = Note.objects.create(show=show, user=User.objects.get(pk=1), title='fine',
+                                      text='the drummer was great')
+        in_title = Note.objects.create(show=Show.objects.get(pk=1), user=User.objects.get(pk=3), title='drummer',
+                                       text='loud')
+        response = self.search('drummer')
+        self.assertEqual([note.pk for note in response.context['notes']], [in_title.pk, in_text.pk])
+
+    def test_snippet_highlights_matches_and_escapes_text(self):
+        Note.objects.create(show=Show.objects.get(pk=2), user=User.objects.get(pk=1), title='guitar',
+                            text='<script>alert(1)</script> the guitar solo')
+        response = self.search('guitar')
+        self.assertContains(response, '&lt;script&gt;alert(1)&lt;/script&gt; the <mark>guitar</mark> solo')
+        self.assertNotContains(response, '<script>alert')
+
+    def test_index_follows_note_edits_and_deletes(self):
+        note = Note.objects.get(pk=3)
+        note.text = 'encore'
+        note.save()
+        self.assertEqual([n.pk for n in self.search('encore').context['notes']], [3])
+        self.assertEqual(self.search('woo').context['notes'], [])
+
+        # Bulk updates and deletes don't call save(), but the index still follows them
+        Note.objects.filter(pk=3).update(text='reprise')
+        self.assertEqual([n.pk for n in self.search('reprise').context['notes']], [3])
+        Note.objects.filter(pk=3).delete()
+        self.assertEqual(self.search('reprise').context['notes'], [])
+
+    def test_results_are_paged_with_a_cursor(self):
+        users = [User.objects.create_user(username=f'fan{number}', password='pass') for number in range(25)]
+        show = Show.objects.get(pk=1)
+        for user in users:
+            Note.objects.create(show=show, user=user, title='encore', text='they played an encore')
+
+        first = self.search('encore')
+        self.assertEqual(len(first.context['notes']), 20)
+        cursor = first.context['next_cursor']
+        self.assertIsNotNone(cursor)
+        self.assertContains(first, 'id="next-page"')
+
+        second = self.search('encore', after=cursor)
+        self.assertEqual(len(second.context['notes']), 5)
+        self.assertIsNone(second.context['next_cursor'])
+        pages = [note.pk for note in first.context['notes'] + second.context['notes']]
+        self.assertEqual(sorted(pages), sorted(set(pages)))
+        self.assertEqual(len(pages), 25)
+
+    def test_bad_cursor_starts_from_the_first_page(self):
+        response = self.search('awesome', after='not-a-cursor')
+        self.assertEqual([note.pk for note in response.context['notes']], [2])
+
+
+class TestNameSearch(TestCase):
+
+    fixtures = ['testing_users', 'testing_artists', 'testing_shows', 'testing_venues', 'testing_notes']
+
+    def artist_names(self, text):
+        response = self.client.get(reverse('artist_list'), {'search_name': text})
+        return [artist.name for artist in response.context['artists']]
+
+    def test_search_matches_anywhere_in_name_ignoring_case(self):
+        self.assertEqual(self.artist_names('cdc'), ['ACDC'])
+        response = self.client.get(reverse('venue_list'), {'search_name': 'TURF cl'})
+        self.assertEqual([venue.name for venue in response.context['venues']], ['The Turf Club'])
+
+    def test_short_search_text_still_matches(self):
+        # Too short for the trigram index, so names are checked one by one
+        self.assertEqual(self.artist_names('e'), ['REM', 'Yes'])
+        self.assertEqual(self.artist_names('AC'), ['ACDC'])
+
+    def test_quotes_and_wildcards_are_plain_text(self):
+        Artist.objects.create(name='100% "Live"')
+        self.assertEqual(self.artist_names('0% "L'), ['100% "Live"'])
+        self.assertEqual(self.artist_names('A_DC'), [])
+        self.assertEqual(self.artist_names('"'), ['100% "Live"'])
+
+    def test_index_follows_new_renamed_and_deleted_names(self):
+        artist = Artist.objects.create(name='The Replacements')
+        self.assertEqual(self.artist_names('replace'), ['The Replacements'])
+
+        Artist.objects.filter(pk=artist.pk).update(name='Husker Du')
+        self.assertEqual(self.artist_names('replace'), [])
+        self.assertEqual(self.artist_names('husker'), ['Husker Du'])
+
+        Artist.objects.filter(pk=artist.pk).delete()
+        self.assertEqual(self.artist_names('husker'), [])
+
+    def test_show_search_by_artist_and_venue(self):
+        response = self.client.get(reverse('show_list'), {'search_artist': 'acd', 'search_venue': 'first ave'})
+        self.assertEqual([show.pk for show in response.context['shows']], [4, 3])
+        response = self.client.get(reverse('show_list'), {'search_artist': 'acd', 'search_venue': 'turf'})
+        self.assertEqual(list(response.context['shows']), [])
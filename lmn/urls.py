@@ -1,13 +1,16 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
 
-from .views import views_main, views_artists, views_venues, views_notes, views_users, views_shows
+from .views import views_main, views_artists, views_venues, views_notes, views_users, views_shows, views_autocomplete
 
 
 urlpatterns = [
 
     path('', views_main.homepage, name='homepage'),
 
+    # Search box suggestions
+    path('autocomplete/', views_autocomplete.autocomplete, name='autocomplete'),
+
     # Venue related URLs
     path('venues/list/', views_venues.venue_list, name='venue_list'),
     path('venues/detail/<int:venue_pk>/', views_venues.venue_detail, name='venue_detail'),
@@ -15,6 +18,7 @@ urlpatterns = [
 
     # Note related URLs
     path('notes/latest/', views_notes.latest_notes, name='latest_notes'),
+    path('notes/search/', views_notes.note_search, name='note_search'),
     path('notes/detail/<int:note_pk>/', views_notes.note_detail, name='note_detail'),
     path('notes/for_show/<int:show_pk>/', views_notes.notes_for_show, name='notes_for_show'),
     path('notes/add/<int:show_pk>/', views_notes.new_note, name='new_note'),
@@ -38,6 +42,7 @@ urlpatterns = [
     
     # Shows related URLs
     path('shows/list/', views_shows.show_list, name='show_list'),
+    path('shows/near/', views_shows.shows_near, name='shows_near'),
     path('shows/detail/<int:show_pk>/', views_shows.show_detail, name='show_detail'),
      
 
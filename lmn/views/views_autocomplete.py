@@ -0,0 +1,30 @@
+from django.http import JsonResponse
+from django.urls import reverse
+
+from ..autocomplete import artist_index, venue_index
+
+SUGGESTIONS = 10
+
+
+def autocomplete(request):
+    """ JSON suggestions for the search boxes, answered from the in-memory name indexes without a database query.
+
+    Suggests artists and venues with a word in their name starting with the GET parameter q.
+    kind=artist or kind=venue only suggests that one. """
+    prefix = request.GET.get('q', '')[:200]
+    kind = request.GET.get('kind')
+    suggestions = {}
+
+    if kind in (None, '', 'artist'):
+        suggestions['artists'] = [
+            {'id': pk, 'name': row['name'], 'url': reverse('artist_detail', kwargs={'artist_pk': pk})}
+            for pk, row in artist_index.search(prefix, SUGGESTIONS)
+        ]
+    if kind in (None, '', 'venue'):
+        suggestions['venues'] = [
+            {'id': pk, 'name': row['name'], 'city': row['city'], 'state': row['state'],
+             'url': reverse('venue_detail', kwargs={'venue_pk': pk})}
+            for pk, row in venue_index.search(prefix, SUGGESTIONS)
+        ]
+
+    return JsonResponse(suggestions)
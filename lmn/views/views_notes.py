@@ -5,54 +5,71 @@ from django.http import HttpResponseBadRequest, HttpResponseForbidden
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 
+from ..cards import NOTE_VERSION_FIELDS, note_version, render_cards
 from ..models import Note, Show
-from ..forms import NewNoteForm 
+from ..forms import NewNoteForm, NoteSearchForm
+from ..pagination import paginate
+from ..response_cache import cache_response, depends_on
+from ..search import search_notes
 
 from django.utils import timezone
 
 from django.contrib import messages  # Message to display
 
+# The fields notes/note_card.html shows for each note. Reading anything else from a note, or its show, artist,
+# venue or user, would cost a query per note.
+NOTE_LIST_FIELDS = [
+    'title', 'text', 'rating', 'posted_date', 'show__show_date',
+    'show__artist__name', 'show__venue__name', 'user__username',
+]
+
 
 @login_required
 def new_note(request, show_pk):
     """ Create a new note for a show. """
     show = get_object_or_404(Show, pk=show_pk)
 
-    # checks that a note for this show doesn't already exist
-    if Note.objects.filter(user=request.user, show=show).exists():
-        form = NewNoteForm()  # empty form
-        # if yes then take them render the form and also an error message and hide the button
-        # render the form with an error message and hide the button and show the update button 
-        return render(request, 'lmn/notes/new_note.html', {
-            'form': form, 'show': show, 
-            'error': 'You can only create one note per show', 
-            "hide_button": True
-        })
-        
     if request.method == 'POST':
         form = NewNoteForm(request.POST, request.FILES)
         if form.is_valid():
             note = form.save(commit=False)
             note.user = request.user
-            note.show = show
+            note.show = show  # the show we already have, so saving doesn't fetch it again
             try: 
                 note.save()
                 return redirect('note_detail', note_pk=note.pk)
             # if an error occurs, show the error message 
             except ValidationError as e:
+                # The database won't store a second note for this user and show
+                if e.code == 'duplicate_note':
+                    return one_note_per_show(request, show)
                 # Show error message if the show date is in the future
                 return HttpResponseBadRequest(render(request, 'lmn/notes/new_note.html', {'error': e, 'show': show }))
 
     else:
+        # checks that a note for this show doesn't already exist before showing the form
+        if Note.objects.filter(user=request.user, show=show).exists():
+            return one_note_per_show(request, show)
         form = NewNoteForm()
 
     return render(request, 'lmn/notes/new_note.html', {'form': form, 'show': show})
 
+
+def one_note_per_show(request, show):
+    """ Render the new note form with an error message, and hide the button and show the update button """
+    form = NewNoteForm()  # empty form
+    return render(request, 'lmn/notes/new_note.html', {
+        'form': form, 'show': show, 
+        'error': 'You can only create one note per show', 
+        "hide_button": True
+    })
+
 @login_required
 def edit_note(request, show_pk):
     """ Edit a note for a show. each show should be having only one note instance per user"""
     show = get_object_or_404(Show, pk=show_pk) # get the show
     note = get_object_or_404(Note, show=show, user=request.user) # get the note for the show and user
+    note.show = show  # reuse the show, so saving doesn't fetch it again
     
     if request.method == 'POST': # update post request
         form = NewNoteForm(request.POST, request.FILES, instance=note) # create a form with the data from the request
@@ -70,32 +87,54 @@ def edit_note(request, show_pk):
 
     return render(request, 'lmn/notes/edit_note.html', {'form': form, 'show': show, 'note': note})
 
-def latest_notes(request):
-    """ Get the 20 most recent notes, ordered with most recent first. """
-    notes = Note.objects.all().order_by('-posted_date')[:20]   # slice of the 20 most recent notes
-    return render(request, 'lmn/notes/note_list.html', {'notes': notes, 'title': 'Latest Notes'})
 
-
-def notes_for_show(request, show_pk): 
-    """ Get notes for one show, most recent first. """
-    show = get_object_or_404(Show, pk=show_pk)  
-    notes = Note.objects.filter(show=show_pk).order_by('-posted_date')
+@cache_response('notes')
+def latest_notes(request):
+    """ Get the most recent notes, 20 at a time, ordered with most recent first. """
+    notes = Note.objects.select_related('show').only('posted_date', *NOTE_VERSION_FIELDS)
+    notes = paginate(request, notes, ['-posted_date', '-pk'])
+    full_notes = Note.objects.select_related('show__artist', 'show__venue', 'user').only(*NOTE_LIST_FIELDS)
+    render_cards(notes, 'lmn/notes/note_card.html', 'note', full_notes, note_version)
+    return render(request, 'lmn/notes/note_list.html', {'notes': notes, 'page': notes, 'title': 'Latest Notes'})
+
+
+def note_search(request):
+    """ Search note titles and text, best matches first, 20 at a time.
+
+    search_text is the words to look for, and after is the cursor for the next page of results. """
+    search_text = request.GET.get('search_text')
+    form = NoteSearchForm(initial={'search_text': search_text})
+    notes, next_cursor = search_notes(search_text, after=request.GET.get('after'))
+    return render(request, 'lmn/notes/note_search.html', {
+        'notes': notes, 'form': form, 'search_term': search_text, 'next_cursor': next_cursor
+    })
+
+
+@cache_response('show:{show_pk}')
+def notes_for_show(request, show_pk):
+    """ Get notes for one show, most recent first, a page at a time. """
+    show = get_object_or_404(Show.objects.select_related('artist', 'venue'), pk=show_pk)
+    depends_on(request, f'artist:{show.artist_id}', f'venue:{show.venue_id}')  # their names are on the page
+    notes = Note.objects.filter(show=show_pk).select_related('user').only(
+        'posted_date', 'text', 'photo', 'user__username')
+    notes = paginate(request, notes, ['-posted_date', '-pk'])
 
     dt = timezone.now()
     
     if request.user.is_authenticated: # we only wanna shows this to user if logged 
          if Note.objects.filter(user=request.user, show=show).exists(): # if the user has already created a note for this show instead of showing '"Add your own notes for this show" show "edit note" button'
-            return render(request, 'lmn/notes/notes_for_show.html', {'show': show, 'notes': notes, 'hide_button': True})
+            return render(request, 'lmn/notes/notes_for_show.html',
+                          {'show': show, 'notes': notes, 'page': notes, 'hide_button': True})
             
     if show.show_date > dt:
         # Show error message if the show date is in the future, we also wanna show the show details but just not the notes
         return HttpResponseForbidden(render(request, 'lmn/notes/notes_for_show.html', {'show': show, 'error': 'You cannot add a note for a show that has not happened yet.'}))
-    return render(request, 'lmn/notes/notes_for_show.html', {'show': show, 'notes': notes})
+    return render(request, 'lmn/notes/notes_for_show.html', {'show': show, 'notes': notes, 'page': notes})
 
 
 def note_detail(request, note_pk):
     """ Display one note. """
-    note = get_object_or_404(Note, pk=note_pk)
+    note = get_object_or_404(Note.objects.select_related('show__artist', 'show__venue', 'user'), pk=note_pk)
 
     return render(request, 'lmn/notes/note_detail.html', {'note': note})
 
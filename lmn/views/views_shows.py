@@ -1,13 +1,26 @@
+from django.db.models import BooleanField, Case, Value, When
 from django.shortcuts import render, get_object_or_404
+from django.utils import timezone
 
-from ..models import Venue, Show
-from ..forms import ShowSearchForm
+import datetime
+
+from ..models import Artist, Venue, Show
+from ..cards import SHOW_VERSION_FIELDS, render_cards, show_version
+from ..forms import ShowSearchForm, ShowsNearForm
+from ..geo import venues_near
+from ..pagination import paginate
+from ..response_cache import cache_response
+from ..search import name_matches
+
+# How far ahead the shows near me page looks
+NEAR_DAYS = 30
 
 
 
 from lmn.models import Show
 
 
+@cache_response('shows')
 def show_list(request ):
     """ gets the list of shows or searches and renders them"""
     
@@ -18,26 +31,75 @@ def show_list(request ):
     search_artist = request.GET.get('search_artist')
     search_venue = request.GET.get('search_venue')
     
-    # filter the shows by date
-    shows = Show.objects.all().order_by('-show_date') 
-    # - meaning descending order and without means ascending order
+    # sort=popular lists the shows with the most notes first, using the note_count kept on each show
+    sort = request.GET.get('sort')
+    if sort == 'popular':
+        ordering = ['-note_count', '-show_date', '-pk']
+    else:
+        # filter the shows by date
+        ordering = ['-show_date', '-pk']
+        # - meaning descending order and without means ascending order
      
+    # Just what sorting and the cards' versions need; the cards that aren't cached are read in full below
+    shows = Show.objects.only('show_date', 'note_count', *SHOW_VERSION_FIELDS)
      
     if search_artist:
         # filter the shows by artist name if it's searched by artist
-        shows = shows.filter(artist__name__icontains=search_artist)
+        shows = shows.filter(artist__in=name_matches(Artist, search_artist))
     
     if search_venue:
-        shows = shows.filter(venue__name__icontains=search_venue)
+        shows = shows.filter(venue__in=name_matches(Venue, search_venue))
         
+    shows = paginate(request, shows, ordering)
+    full_shows = (Show.objects.select_related('artist', 'venue')
+                  .only('show_date', 'note_count', 'artist__name', 'venue__name'))
+    render_cards(shows, 'lmn/shows/show_card.html', 'show', full_shows, show_version)
     
-    return render(request, 'lmn/shows/show_list.html', {'shows': shows, 'form': form})
+    return render(request, 'lmn/shows/show_list.html', {'shows': shows, 'page': shows, 'form': form, 'sort': sort})
+
+
+def shows_near(request):
+    """ Upcoming shows at venues within some miles of a city, or of the browser's location, soonest first """
+    form = ShowsNearForm(request.GET or None)
+    shows = None
+
+    if form.is_valid():
+        latitude, longitude = form.cleaned_data['point']
+        distances = venues_near(Venue.objects.all(), latitude, longitude, form.cleaned_data['miles'])
+        now = timezone.now()
+        shows = Show.objects.filter(
+            venue__in=list(distances),
+            show_date__gte=now,
+            show_date__lt=now + datetime.timedelta(days=NEAR_DAYS),
+        ).select_related('artist', 'venue').only(
+            'show_date', 'artist__name', 'venue__name', 'venue__city', 'venue__state')
+        shows = paginate(request, shows, ['show_date', 'pk'])
+        for show in shows:
+            show.miles = distances[show.venue_id]
+
+    return render(request, 'lmn/shows/shows_near.html',
+                  {'shows': shows, 'page': shows, 'form': form, 'days': NEAR_DAYS})
+
+
+def show_history(request, shows):
+    """ The upcoming shows, soonest first, and the past shows, most recent first, each a page at a time.
+
+    Each show has a future flag worked out by the database. The two lists are paginated separately,
+    with upcoming_after/upcoming_before and after/before cursors, and each reads one page from the
+    show's (artist or venue, show date) index, so an artist with thousands of shows costs the same as one with two. """
+    now = timezone.now()
+    # A show is in the past once it has started, which is when notes can be written for it
+    shows = shows.annotate(future=Case(When(show_date__gt=now, then=Value(True)),
+                                       default=Value(False), output_field=BooleanField()))
+    upcoming = paginate(request, shows.filter(show_date__gt=now), ['show_date', 'pk'], prefix='upcoming_')
+    past = paginate(request, shows.filter(show_date__lte=now), ['-show_date', '-pk'])
+    return upcoming, past
 
 
 def show_detail(request, show_pk):
     """ gets the show details and renders them, also renders the venue details, so we can use the location to give a but more detailed"""
-    show = get_object_or_404(Show, pk=show_pk) # get the show details
-    venue = get_object_or_404(Venue, pk=show.venue.pk) # get the venue details 
+    show = get_object_or_404(Show.objects.select_related('artist', 'venue'), pk=show_pk)  # get the show details
+    venue = show.venue  # the venue details came with the show
     return render(request, 'lmn/shows/show_detail.html', {'show': show, 'venue': venue})
         
     
@@ -4,17 +4,24 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login
 
+from ..cards import NOTE_VERSION_FIELDS, note_version, render_cards
 from ..forms import UserRegistrationForm
 from ..models import Note
+from ..pagination import paginate
 
 
 def user_profile(request, user_pk):
-    """ Get user profile for any user on the site. 
+    """ Get user profile for any user on the site, with their notes a page at a time.
     Any user may view any other user's profile. 
     """
     user = User.objects.get(pk=user_pk)
-    usernotes = Note.objects.filter(user=user.pk).order_by('-posted_date')
-    return render(request, 'lmn/users/user_profile.html', {'user_profile': user, 'notes': usernotes})
+    usernotes = Note.objects.filter(user=user.pk).select_related('show').only('posted_date', *NOTE_VERSION_FIELDS)
+    usernotes = paginate(request, usernotes, ['-posted_date', '-pk'])
+    render_cards(usernotes, 'lmn/users/note_card.html', 'note',
+                 Note.objects.select_related('show__artist', 'show__venue').only(
+                     'title', 'text', 'posted_date', 'show__show_date', 'show__artist__name', 'show__venue__name'),
+                 note_version)
+    return render(request, 'lmn/users/user_profile.html', {'user_profile': user, 'notes': usernotes, 'page': usernotes})
 
 
 @login_required
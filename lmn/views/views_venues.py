@@ -2,11 +2,14 @@ from django.shortcuts import render, get_object_or_404
 
 from ..models import Venue, Show
 from ..forms import VenueSearchForm
-from django.utils import timezone
+from ..pagination import paginate
+from ..response_cache import cache_response
+from ..search import name_matches
+from .views_shows import show_history
 
 
 def venue_list(request):
-    """Get a list of all venues, ordered by name.
+    """Get a list of all venues, ordered by name, a page at a time.
 
     If request contains a GET parameter search_name then
     only include venues with names containing that text."""
@@ -15,40 +18,35 @@ def venue_list(request):
     search_name = request.GET.get("search_name")
 
     if search_name:
-        # search for this venue, display results. Use case-insensitive contains
-        venues = Venue.objects.filter(name__icontains=search_name).order_by("name")
+        # search for this venue, display results. Case-insensitive contains, found with the name index
+        venues = Venue.objects.filter(pk__in=name_matches(Venue, search_name))
     else:
-        venues = Venue.objects.all().order_by("name")  # TODO paginate results
+        venues = Venue.objects.all()
+    # Venues with the same name are told apart by city and state, in the order of the unique (name, city, state) index
+    venues = paginate(request, venues.only("name", "city", "state"), ["name", "city", "state"])
 
     return render(
         request,
         "lmn/venues/venue_list.html",
-        {"venues": venues, "form": form, "search_term": search_name},
+        {"venues": venues, "page": venues, "form": form, "search_term": search_name},
     )
 
 
 def artists_at_venue(request, venue_pk):
-    """Get all of the artists who have played a show at the venue with the pk provided"""
-    shows = Show.objects.filter(venue=venue_pk).order_by("-show_date")
-    venue = Venue.objects.get(pk=venue_pk)
-    dt = timezone.now()
-
-    future_shows = []
-    # loop through the shows
-    for show in shows:
-        # if the show is in the future, added to the future_shows list with a variable named 'future' set to True
-        if show.show_date > dt:
-            future_shows.append({"show": show, "future": True})
-        else:
-            future_shows.append({"show": show, "future": False})
+    """Get the artists who have played or will play a show at the venue with the pk provided,
+    upcoming and past shows a page at a time"""
+    venue = get_object_or_404(Venue, pk=venue_pk)
+    shows = Show.objects.filter(venue=venue).select_related("artist").only("show_date", "artist__name")
+    upcoming, past = show_history(request, shows)
 
     return render(
         request,
         "lmn/artists/artist_list_for_venue.html",
-        {"venue": venue, "future_shows": future_shows},
+        {"venue": venue, "upcoming": upcoming, "past": past, "page": past},
     )
 
 
+@cache_response("venue:{venue_pk}")
 def venue_detail(request, venue_pk):
     """Get details about a venue"""
     venue = get_object_or_404(Venue, pk=venue_pk)
@@ -0,0 +1,106 @@
+""" A queue that runs a background job's database writes one at a time, on a writer thread of their own.
+
+SQLite lets one connection write at a time. The importer and the aggregate rebuild put their writes in
+a WriteQueue, so they always come from the same connection, each in a short transaction of its own,
+while the caller gets on with fetching or reading the next batch. Writes from other processes, like the
+gunicorn workers saving notes, wait their turn for the write lock (see lmn/backends/sqlite3) instead of failing.
+"""
+
+import queue
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+# Times to retry a write that still found the database locked after waiting busy_timeout for it
+RETRIES = 5
+
+
+class WriteQueue:
+    """ Runs the functions given to submit() in order, each inside its own transaction.
+
+    With thread=True they run on a writer thread, with its own connection. At most max_pending
+    writes wait in the queue; submit() blocks when it's full, so a fast producer doesn't pile up work.
+    If the caller is already inside a transaction, like a test case, writes run straight away in
+    the caller's thread instead, since another connection couldn't see the caller's uncommitted rows.
+
+    A write that fails stops the queue: the writes after it are dropped, and the error is raised
+    from the next submit(), wait() or close(). Use it as a context manager, or call close() when done. """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS, max_pending=4, thread=True):
+        self.using = using
+        self.error = None
+        self.writes = 0
+        self._thread = None
+        if thread and not connections[using].in_atomic_block:
+            self._jobs = queue.Queue(max_pending)
+            self._thread = threading.Thread(target=self._run, name=f'lmn-writer-{using}', daemon=True)
+            self._thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        """ Queue a call to function(*args, **kwargs). """
+        self._raise_error()
+        if self._thread is None:
+            self._write(function, args, kwargs)
+        else:
+            self._jobs.put((function, args, kwargs))
+
+    def wait(self):
+        """ Wait until every write submitted so far has finished. """
+        if self._thread is not None:
+            self._jobs.join()
+        self._raise_error()
+
+    def close(self):
+        """ Finish the queued writes and stop the writer thread. """
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't hide the caller's error behind one from the queue
+            try:
+                self.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        try:
+            while True:
+                job = self._jobs.get()
+                try:
+                    if job is None:
+                        return
+                    if self.error is None:
+                        self._write(*job)
+                except Exception as err:
+                    self.error = err
+                finally:
+                    self._jobs.task_done()
+        finally:
+            # Connections belong to the thread that opened them
+            connections[self.using].close()
+
+    def _write(self, function, args, kwargs):
+        for attempt in range(RETRIES + 1):
+            try:
+                with transaction.atomic(using=self.using):
+                    function(*args, **kwargs)
+                self.writes += 1
+                return
+            except OperationalError as err:
+                if 'locked' not in str(err) or attempt == RETRIES or connections[self.using].in_atomic_block:
+                    raise
+                time.sleep(0.1 * 2 ** attempt)
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Before the session and auth middleware, so their queries are routed to replicas or the primary too
+    'lmn.db_router.ReplicaReadsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -92,12 +94,90 @@ DATABASES = {
     # Using environment variables to detect where this app is running, and automatically use 
     # an appropriate DB configuration, is a good idea.
 
+    # SQLite in WAL mode, tuned for several gunicorn workers and a background importer sharing
+    # one file. See lmn/backends/sqlite3/base.py; 'PRAGMAS': {...} here changes its settings.
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'lmn.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
 
+# Read replicas: copies of the default database, kept up to date by the database's own replication.
+# Read-only page views read from them, see lmn/db_router.py. Add them to DATABASES like 'default' and
+# list their aliases in READ_REPLICAS. LMN_READ_REPLICAS can name SQLite files standing in for
+# replicas when trying this out locally, e.g. LMN_READ_REPLICAS=replica1.sqlite3,replica2.sqlite3
+# Run the tests without it; lmn/tests/runner.py sets up their own stand-in replica.
+READ_REPLICAS = []
+
+for number, replica_file in enumerate(filter(None, os.environ.get('LMN_READ_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'lmn.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, replica_file),
+    }
+    READ_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['lmn.db_router.PrimaryReplicaRouter']
+
+TEST_RUNNER = 'lmn.tests.runner.TestRunner'
+
+# How long a browser reads from the primary after it writes something, while the replicas catch up
+REPLICA_LAG_SECONDS = 5
+
+
+# Pages cached for visitors who aren't logged in, see lmn/response_cache.py. LMN_RESPONSE_CACHE picks where:
+# 'locmem' keeps them in each process's memory; 'file' in LMN_RESPONSE_CACHE_DIR, shared by the processes
+# on one machine; 'redis' in the Redis server at LMN_REDIS_URL, which needs the django-redis package.
+# Imports run in their own process, so they can only invalidate the web server's pages with 'file' or 'redis'.
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lmn-responses',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('LMN_RESPONSE_CACHE_DIR', os.path.join(BASE_DIR, 'response_cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('LMN_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    },
+    'off': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+# Rendered note and show cards, see lmn/cards.py, are kept in the same kind of cache as pages but in a store of
+# their own, in LMN_CARD_CACHE_DIR for 'file' or at LMN_CARD_REDIS_URL for 'redis'. Clearing the pages after a
+# bulk change empties their whole store, and the cards are still good.
+CARD_CACHE_BACKENDS = dict(
+    RESPONSE_CACHE_BACKENDS,
+    locmem=dict(RESPONSE_CACHE_BACKENDS['locmem'], LOCATION='lmn-cards'),
+    file=dict(RESPONSE_CACHE_BACKENDS['file'],
+              LOCATION=os.environ.get('LMN_CARD_CACHE_DIR', os.path.join(BASE_DIR, 'card_cache'))),
+    redis=dict(RESPONSE_CACHE_BACKENDS['redis'],
+               LOCATION=os.environ.get('LMN_CARD_REDIS_URL', 'redis://127.0.0.1:6379/2')),
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': RESPONSE_CACHE_BACKENDS[os.environ.get('LMN_RESPONSE_CACHE', 'locmem')],
+    'cards': CARD_CACHE_BACKENDS[os.environ.get('LMN_RESPONSE_CACHE', 'locmem')],
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
+# Cached pages are invalidated when what's on them changes; this is how long they last if a change is missed
+RESPONSE_CACHE_SECONDS = 10 * 60
+
+CARD_CACHE_ALIAS = 'cards'
+
+# A card's key changes when it does, so cards can be kept until the cache needs the room
+CARD_CACHE_SECONDS = 24 * 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
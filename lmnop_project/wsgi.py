@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lmnop_project.settings')
 
 application = get_wsgi_application()
+
+# Load the autocomplete name indexes before the first request
+from lmn.autocomplete import warm_indexes  # noqa: E402
+
+warm_indexes()